@@ -0,0 +1,69 @@
+"""
+Порядок экспирации контрактов: разбор каждого CSV целиком (как
+futures_expire_order до каталога) против каталога контрактов.
+
+Каталог замеряется дважды: «холодный» — каталога ещё нет, таблицы
+описываются по первой и последней строке; «тёплый» — записи действительны,
+файлы не открываются.
+
+Запуск:
+    python benchmarks/bench_catalog.py --contracts 50 --bars 20000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from zrsimacd import catalog
+from zrsimacd.store import list_tables, read_table
+
+
+def legacy_order(directory):
+    closure = []
+    for path in list_tables(directory):
+        df = read_table(path, columns=["time"])
+        if not df.empty:
+            closure.append((path, df["time"].max()))
+    return [os.path.basename(path)[:-4] for path, _ in sorted(closure, key=lambda x: x[1])]
+
+
+def make_contracts(directory, n_contracts, bars):
+    for k in range(n_contracts):
+        rng = np.random.default_rng(k)
+        start = pd.Timestamp("2020-01-01", tz="UTC") + pd.Timedelta(days=int(rng.integers(0, 900)))
+        times = pd.date_range(start, periods=bars, freq="4h")
+        close = np.round(20000 + np.cumsum(rng.normal(0, 50, bars)), 0)
+        pd.DataFrame({"time": times, "open": close, "high": close + 10, "low": close - 10, "close": close,
+                      "volume": rng.integers(0, 5000, bars)}).to_csv(os.path.join(directory, f"C{k}.csv"), index=False)
+
+
+def timed(func, *args):
+    t0 = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Expiry ordering: full CSV scans vs the contract catalog")
+    parser.add_argument("--contracts", type=int, default=50)
+    parser.add_argument("--bars", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        make_contracts(directory, args.contracts, args.bars)
+        expected, legacy = timed(legacy_order, directory)
+        cold_order, cold = timed(catalog.expiry_order, directory)
+        warm_order, warm = timed(catalog.expiry_order, directory)
+        assert [name for name, _ in cold_order] == expected == [name for name, _ in warm_order]
+
+    print(f"Контрактов: {args.contracts}, свечей в каждом: {args.bars:,}")
+    print(f"{'полный разбор CSV':<28} {legacy:8.3f} с")
+    print(f"{'каталог, первый запуск':<28} {cold:8.3f} с  (x{legacy / cold:.0f})")
+    print(f"{'каталог, записи готовы':<28} {warm:8.3f} с  (x{legacy / warm:.0f})")
+
+
+if __name__ == "__main__":
+    main()
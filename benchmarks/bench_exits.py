@@ -0,0 +1,93 @@
+"""
+Бенчмарк расчёта выходов: построчный calculate_trade_profit_smart против
+пакетного zrsimacd.exits.simulate_exits.
+
+Запуск:
+    python benchmarks/bench_exits.py --bars 100000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from bench_signals import make_data
+from zrsimacd.exits import BUY, SELL, simulate_exits
+from zrsimacd.signals import find_signals
+
+
+def legacy_trade_profit(data, signal_index, trade_type, tp_ticks=2, max_wait=6):
+    """Исходная построчная реализация calculate_trade_profit_smart."""
+    entry_price = data.iloc[signal_index]['close']
+    open_macd_diff = data.iloc[signal_index]['MACD_Diff']
+    max_wait = min(max_wait, len(data) - signal_index - 1)
+    exit_index = None
+    tick_count = 0
+
+    for i in range(1, max_wait + 1):
+        idx = signal_index + i
+        prev_close = data.iloc[idx - 1]['close']
+        curr_close = data.iloc[idx]['close']
+        curr_macd_diff = data.iloc[idx]['MACD_Diff']
+
+        if trade_type == 'BUY':
+            tick_count = tick_count + 1 if curr_close > prev_close else 0
+        else:  # SELL
+            tick_count = tick_count + 1 if curr_close < prev_close else 0
+
+        if tick_count >= tp_ticks:
+            exit_index = idx
+            break
+
+        if (trade_type == 'BUY' and curr_macd_diff < open_macd_diff) or \
+           (trade_type == 'SELL' and curr_macd_diff > open_macd_diff):
+            exit_index = idx
+            break
+
+    if exit_index is None:
+        exit_index = signal_index + max_wait
+
+    exit_price = data.iloc[exit_index]['close']
+    profit = (exit_price - entry_price) if trade_type == 'BUY' else (entry_price - exit_price)
+    return profit, exit_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exit simulation benchmark")
+    parser.add_argument("--bars", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tp-ticks", type=int, default=2)
+    parser.add_argument("--max-wait", type=int, default=6)
+    args = parser.parse_args()
+
+    data = make_data(args.bars, args.seed)
+    buy_idx, sell_idx = find_signals(data)
+    # Последний бар тоже проверяем: там ждать уже некуда
+    buy_idx = np.append(buy_idx, len(data) - 1)
+    entry_idx = np.concatenate([buy_idx, sell_idx])
+    direction = np.concatenate([np.full(len(buy_idx), BUY), np.full(len(sell_idx), SELL)])
+
+    t0 = time.perf_counter()
+    legacy = [
+        legacy_trade_profit(data, i, 'BUY' if d == BUY else 'SELL', args.tp_ticks, args.max_wait)
+        for i, d in zip(entry_idx, direction)
+    ]
+    legacy_time = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    _, profit, exit_idx = simulate_exits(
+        data['close'].to_numpy(), data['MACD_Diff'].to_numpy(), entry_idx, direction,
+        max_wait=args.max_wait, tp_ticks=args.tp_ticks,
+    )
+    batch_time = time.perf_counter() - t0
+
+    assert [j for _, j in legacy] == exit_idx.tolist(), "индексы выхода не совпадают"
+    assert [p for p, _ in legacy] == profit.tolist(), "прибыль не совпадает"
+
+    print(f"Сигналов: {len(entry_idx)}")
+    print(f"iloc-цикл: {legacy_time:.3f} с")
+    print(f"пакетно:   {batch_time:.4f} с")
+    print(f"Ускорение: x{legacy_time / batch_time:,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Бенчмарк загрузки свечей против локальной заглушки API (без сети и токена).
+
+Запуск:
+    python benchmarks/bench_fetch.py --tickers 20 --workers 8 --rate 50 --latency 0.05
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from stub_client import StubClient
+from zrsimacd.fetcher import FetchStats, FetchWindow, RateLimiter, candle_windows, fetch_windows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Candle fetch benchmark against a local stub client")
+    parser.add_argument("--tickers", type=int, default=10)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=0, help="Requests per second, 0 = unlimited")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated round-trip latency, s")
+    args = parser.parse_args()
+
+    end = datetime(2025, 1, 1)
+    start = end - timedelta(days=365 * args.years)
+    windows = [
+        FetchWindow(f"T{k}", f"uid-{k}", "4_hour", None, s, e)
+        for k in range(args.tickers)
+        for s, e in candle_windows(start, end)
+    ]
+
+    for workers in (1, args.workers):
+        client = StubClient(latency=args.latency)
+        stats = FetchStats()
+        t0 = time.perf_counter()
+        results = fetch_windows(client, windows, max_workers=workers, limiter=RateLimiter(args.rate), stats=stats)
+        elapsed = time.perf_counter() - t0
+        candles = sum(len(columns["time"]) for _, columns, error in results if error is None)
+        print(f"\n--- потоков: {workers}, окон: {len(windows)}, свечей: {candles}, {elapsed:.2f} с")
+        stats.report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Пиковая память загрузки свечей: исходный список словарей с DataFrame в конце
+против потоковой записи колонок на диск (zrsimacd.store.TableWriter).
+
+Минутные свечи за 90 дней — около 130 тыс. строк на тикер. Сеть не нужна,
+ответы отдаёт локальная заглушка. Отдельно замеряется повторная загрузка
+всей истории (--full): слияние с сохранённой таблицей целиком в памяти против
+слияния по частям (zrsimacd.store.merge_table).
+
+Запуск:
+    python benchmarks/bench_fetch_memory.py --days 90 --minutes 1
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from stub_client import StubClient
+from zrsimacd.fetcher import MSK_SHIFT, FetchWindow, candle_windows, columns_to_frame, iter_windows, quotation
+from zrsimacd.store import TableWriter, merge_table, read_table, table_columns, write_table
+
+
+def legacy_fetch(client, windows, path):
+    """Исходная схема: все свечи словарями в одном списке, запись в конце."""
+    candles = []
+    for window in windows:
+        response = client.market_data.get_candles(instrument_id=window.uid, from_=window.start,
+                                                  to=window.end, interval=window.interval)
+        for candle in response.candles:
+            candles.append({
+                "time": candle.time + MSK_SHIFT,
+                "open": quotation(candle.open),
+                "high": quotation(candle.high),
+                "low": quotation(candle.low),
+                "close": quotation(candle.close),
+                "volume": candle.volume,
+            })
+    pd.DataFrame(candles).to_csv(path, index=False)
+    return len(candles)
+
+
+def streaming_fetch(client, windows, path, workers):
+    with TableWriter(path) as writer:
+        for window, columns, error in iter_windows(client, windows, max_workers=workers):
+            if error is None:
+                writer.append(columns_to_frame(columns))
+    return writer.rows
+
+
+def concat_merge(path, new_path):
+    """Прежнее слияние: обе таблицы целиком в памяти."""
+    merged = pd.concat([read_table(path, mmap=False), read_table(new_path, mmap=False)], ignore_index=True)
+    merged = merged.drop_duplicates("time", keep="last").sort_values("time", kind="stable")
+    write_table(merged, path)
+    return len(merged)
+
+
+def chunked_merge(path, new_path):
+    merge_table(path, new_path)
+    return len(read_table(path)[table_columns(path)[0]])
+
+
+def measure(label, func):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    rows = func()
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<22} строк: {rows:>9,}  пик памяти: {peak / 2**20:8.1f} МБ  время: {elapsed:6.1f} с")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak memory of candle fetching: list of dicts vs streaming writer")
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--minutes", type=int, default=1, help="Candle interval of the stub, minutes")
+    parser.add_argument("--window-days", type=int, default=1, help="Days per request (API limit for 1-minute candles)")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    end = datetime(2025, 1, 1)
+    start = end - timedelta(days=args.days)
+    windows = [FetchWindow("T", "uid", "1_min", None, s, e)
+               for s, e in candle_windows(start, end, days=args.window_days)]
+    step = timedelta(minutes=args.minutes)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        measure("список словарей", lambda: legacy_fetch(StubClient(latency=0, step=step), windows,
+                                                         os.path.join(tmp, "legacy.csv")))
+        measure("поток → CSV", lambda: streaming_fetch(StubClient(latency=0, step=step), windows,
+                                                      os.path.join(tmp, "stream.csv"), args.workers))
+        measure("поток → .npcols", lambda: streaming_fetch(StubClient(latency=0, step=step), windows,
+                                                          os.path.join(tmp, "stream.npcols"), args.workers))
+
+        print("\nПовторная загрузка всей истории и слияние с сохранённой:")
+        for suffix in ("csv", "npcols"):
+            path, new_path = (os.path.join(tmp, f"{name}.{suffix}") for name in ("stream", "part"))
+            streaming_fetch(StubClient(latency=0, step=step), windows, new_path, args.workers)
+            measure(f"целиком → .{suffix}", lambda: concat_merge(path, new_path))
+            expected = read_table(path, mmap=False)
+            measure(f"по частям → .{suffix}", lambda: chunked_merge(path, new_path))
+            pd.testing.assert_frame_equal(read_table(path, mmap=False), expected)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Ядра RSI/MACD на NumPy (zrsimacd.kernels) против pandas_ta.
+
+Запуск:
+    python benchmarks/bench_indicators.py --contracts 50 --bars 5000
+
+Сначала проверяется совпадение с pandas_ta на настройках по умолчанию
+(RSI 20, MACD 15/30/10) и нескольких других периодах: NaN на тех же барах,
+значения — с точностью до округления — и на ценах с шагом сетки (--tick),
+где много баров без изменения цены. Без установленного pandas-ta проверка
+пропускается. На барах без изменения цены RSI ядер точно равен предыдущему
+(у pandas_ta там отличие в последнем бите в ту или иную сторону), это
+проверяется отдельно. Поэтому сигналы на ценах с шагом сетки расходятся:
+печатается, сколько, и проверяется, что все расхождения — на барах с ничьей
+RSI в окне сигнала. Затем замеряется расчёт всех контрактов: по одному через
+pandas_ta, по одному через ядра и одним двумерным вызовом.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from zrsimacd import kernels
+from zrsimacd.indicators import MACD_FAST, MACD_SIGNAL, MACD_SLOW, RSI_PERIOD
+from zrsimacd.signals import LOOKBACK, signal_masks
+
+# Допуск относительно уровня цены: EMA и MACD накапливают ошибку округления
+# порядка eps * цена, и у pandas_ta, и у ядер
+RTOL = 1e-12
+
+
+def make_closes(n_contracts, n_bars, seed=0):
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0, 50, (n_contracts, n_bars))
+    return 20000 + np.cumsum(steps, axis=1)
+
+
+def tick_grid(close, tick):
+    """Цены на сетке шага фьючерса: много баров без изменения цены."""
+    return np.round(close / tick) * tick
+
+
+def _assert_close(name, ours, reference, scale):
+    reference = np.asarray(reference, dtype=np.float64)
+    if not np.array_equal(np.isnan(ours), np.isnan(reference)):
+        raise AssertionError(f"{name}: NaN на разных барах")
+    valid = ~np.isnan(reference)
+    error = np.max(np.abs(ours[valid] - reference[valid]), initial=0.0) / scale
+    if error > RTOL:
+        raise AssertionError(f"{name}: расхождение {error:.3g} больше допуска {RTOL}")
+    return error
+
+
+def check_parity(ta, close):
+    series = pd.Series(close)
+    scale = float(np.max(np.abs(close)))
+    settings = [(RSI_PERIOD, MACD_FAST, MACD_SLOW, MACD_SIGNAL), (14, 12, 26, 9), (2, 30, 15, 3)]
+    for rsi_period, fast, slow, signal in settings:
+        errors = [_assert_close(f"RSI {rsi_period}", kernels.rsi(close, rsi_period),
+                                ta.rsi(series, length=rsi_period), 100.0)]
+        reference = ta.macd(series, fast=fast, slow=slow, signal=signal)
+        suffix = f"_{min(fast, slow)}_{max(fast, slow)}_{signal}"
+        macd_line, signal_line = kernels.macd(close, fast, slow, signal)
+        errors.append(_assert_close(f"MACD{suffix}", macd_line, reference["MACD" + suffix], scale))
+        errors.append(_assert_close(f"MACDs{suffix}", signal_line, reference["MACDs" + suffix], scale))
+        errors.append(_assert_close(f"MACDh{suffix}", macd_line - signal_line, reference["MACDh" + suffix], scale))
+        print(f"  RSI {rsi_period}, MACD {fast}/{slow}/{signal}: совпадает (макс. отн. ошибка {max(errors):.1e})")
+
+    # Короткие ряды: всё NaN, как у pandas_ta (там — None)
+    short = close[:RSI_PERIOD - 1]
+    assert np.isnan(kernels.rsi(short, RSI_PERIOD)).all()
+
+    # Двумерный вызов даёт то же, что построчный
+    batch = kernels.rsi(close, [10, RSI_PERIOD, 30])
+    for row, period in zip(batch, [10, RSI_PERIOD, 30]):
+        np.testing.assert_array_equal(row, kernels.rsi(close, period))
+
+
+def check_signals(ta, close):
+    """
+    Сигналы по RSI/MACD ядер и pandas_ta на настройках по умолчанию.
+    Возвращает число расхождений; все они должны быть на барах, где RSI ядер
+    равен RSI одного из LOOKBACK предыдущих баров (ничья в окне сигнала).
+    """
+    series = pd.Series(close)
+    can_trade = np.ones(len(close), dtype=np.int8)
+    macd_line, signal_line = kernels.macd(close, MACD_FAST, MACD_SLOW, MACD_SIGNAL)
+    rsi = kernels.rsi(close, RSI_PERIOD)
+    ours = signal_masks(rsi, macd_line - signal_line, can_trade)
+    suffix = f"_{MACD_FAST}_{MACD_SLOW}_{MACD_SIGNAL}"
+    theirs = signal_masks(ta.rsi(series, length=RSI_PERIOD).to_numpy(dtype=np.float64),
+                          ta.macd(series, MACD_FAST, MACD_SLOW, MACD_SIGNAL)["MACDh" + suffix].to_numpy(), can_trade)
+
+    differ = np.flatnonzero((ours[0] != theirs[0]) | (ours[1] != theirs[1]))
+    ties = [i for i in differ if (rsi[i - LOOKBACK:i] == rsi[i]).any()]
+    assert len(ties) == len(differ), f"сигналы расходятся не на ничьих RSI: бары {sorted(set(differ) - set(ties))}"
+    print(f"  сигналы BUY/SELL: ядра {ours[0].sum()}/{ours[1].sum()}, pandas_ta {theirs[0].sum()}/{theirs[1].sum()}, "
+          f"расхождений {len(differ)} (все — ничьи RSI)")
+    return len(differ)
+
+
+def check_flat_bars(close):
+    """На барах без изменения цены RSI точно равен предыдущему значению."""
+    close = np.round(close, -2)
+    values = kernels.rsi(close, RSI_PERIOD)
+    flat = np.flatnonzero(np.diff(close) == 0) + 1
+    flat = flat[flat > RSI_PERIOD]
+    assert len(flat) and np.array_equal(values[flat], values[flat - 1])
+    print(f"  бары без изменения цены ({len(flat)}): RSI равен предыдущему")
+
+
+def measure(label, func, repeat=3):
+    best = min(_timed(func) for _ in range(repeat))
+    print(f"{label:<36} {best * 1000:9.1f} мс")
+    return best
+
+
+def _timed(func):
+    t0 = time.perf_counter()
+    func()
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NumPy RSI/MACD kernels vs pandas_ta")
+    parser.add_argument("--contracts", type=int, default=50)
+    parser.add_argument("--bars", type=int, default=5000)
+    parser.add_argument("--tick", type=float, default=10.0, help="Price step of the tick-grid parity check")
+    args = parser.parse_args()
+
+    closes = make_closes(args.contracts, args.bars)
+    t0 = time.perf_counter()
+    try:
+        import pandas_ta as ta
+    except ImportError:
+        ta = None
+    import_time = time.perf_counter() - t0
+
+    check_flat_bars(closes[0])
+    if ta is None:
+        print("pandas-ta не установлен: проверка совпадения и замер pandas_ta пропущены.")
+    else:
+        print(f"Импорт pandas_ta: {import_time * 1000:.0f} мс")
+        print("Проверка совпадения с pandas_ta:")
+        check_parity(ta, closes[0])
+        check_signals(ta, closes[0])
+        grid = tick_grid(closes[0], args.tick)
+        print(f"Цены с шагом {args.tick:g} (баров без изменения цены: {int((np.diff(grid) == 0).sum())}):")
+        check_parity(ta, grid)
+        check_signals(ta, grid)
+
+    print(f"\n{args.contracts} контрактов × {args.bars} баров, "
+          f"RSI {RSI_PERIOD} + MACD {MACD_FAST}/{MACD_SLOW}/{MACD_SIGNAL}:")
+    if ta is not None:
+        measure("pandas_ta, по контрактам", lambda: [
+            (ta.rsi(pd.Series(c), length=RSI_PERIOD), ta.macd(pd.Series(c), MACD_FAST, MACD_SLOW, MACD_SIGNAL))
+            for c in closes
+        ])
+    measure("ядра NumPy, по контрактам", lambda: [
+        (kernels.rsi(c, RSI_PERIOD), kernels.macd(c, MACD_FAST, MACD_SLOW, MACD_SIGNAL)) for c in closes
+    ])
+    measure("ядра NumPy, один 2-D вызов", lambda: (
+        kernels.rsi(closes, RSI_PERIOD), kernels.macd(closes, MACD_FAST, MACD_SLOW, MACD_SIGNAL)
+    ))
+    periods = list(range(10, 31))
+    measure(f"RSI {len(periods)} периодов, один вызов", lambda: kernels.rsi(closes[0], periods))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Монте-Карло по сделкам (zrsimacd.montecarlo): цикл по путям на Python против
+пачек путей на массивах.
+
+Сделки — синтетические из bench_report.make_trades. Сначала на нескольких
+путях проверяется, что метрики совпадают с прямым расчётом по формулам
+generate_report, а пути permute — перестановки всех сделок; затем
+замеряется время N путей каждым методом; время цикла на Python оценивается
+по первым --loop-paths путям.
+
+Запуск:
+    python benchmarks/bench_montecarlo.py --trades 2000 --paths 100000
+"""
+import argparse
+import time
+from math import floor
+
+import numpy as np
+
+from bench_report import make_trades
+from zrsimacd.metrics import INITIAL_CAPITAL, LEVERAGE
+from zrsimacd.montecarlo import _paths, _pick_rows, simulate, trade_arrays
+
+
+def loop_path(entry_price, per_contract, order, initial_capital=INITIAL_CAPITAL, leverage=LEVERAGE):
+    """Один путь по сделкам в порядке order, как в generate_report."""
+    stats = {}
+    for model in ("fixed", "reinvest"):
+        capital = float(initial_capital)
+        equity = []
+        for i in order:
+            base = initial_capital if model == "fixed" else capital
+            capital += floor(base / (entry_price[i] / leverage)) * per_contract[i]
+            equity.append(capital)
+        peak, max_drawdown = equity[0], 0.0
+        for value in equity:
+            peak = max(peak, value)
+            max_drawdown = max(max_drawdown, peak - value)
+        returns = np.diff(equity) / np.array(equity[:-1])
+        std = returns.std(ddof=1)
+        stats[model] = {'final_equity': equity[-1], 'max_drawdown': max_drawdown,
+                        'sharpe': returns.mean() / std if std else np.nan}
+    return stats
+
+
+def check(entry_price, per_contract, n_paths=20, seed=0):
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(entry_price), (len(entry_price), n_paths))
+    collateral = entry_price / LEVERAGE
+    fixed = np.floor(INITIAL_CAPITAL / collateral) * per_contract
+    vectorized = _paths(fixed, collateral, per_contract, picks, n_paths, INITIAL_CAPITAL)
+    for path in range(n_paths):
+        expected = loop_path(entry_price, per_contract, picks[:, path])
+        for model, stats in expected.items():
+            for name, value in stats.items():
+                np.testing.assert_allclose(vectorized[model][name][path], value, rtol=1e-9,
+                                           err_msg=f"{model} {name}, путь {path}")
+
+
+def check_permutations(n_trades, n_paths=500, seed=0):
+    """Каждый путь permute проходит все сделки по разу, и любая сделка бывает первой примерно одинаково часто."""
+    picks = np.array(list(_pick_rows(np.random.default_rng(seed), n_trades, n_paths, "permute")))
+    assert (np.sort(picks, axis=0) == np.arange(n_trades)[:, None]).all(), "путь permute — не перестановка"
+    first = np.bincount(picks[0], minlength=n_trades)
+    assert first.max() < 5 * n_paths / n_trades + 10, "первая сделка путей permute распределена неравномерно"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo over trades: Python loop vs batched arrays")
+    parser.add_argument("--trades", type=int, default=2000)
+    parser.add_argument("--contracts", type=int, default=20)
+    parser.add_argument("--paths", type=int, default=100_000)
+    parser.add_argument("--loop-paths", type=int, default=200)
+    args = parser.parse_args()
+
+    entry_price, per_contract = trade_arrays(make_trades(args.trades, args.contracts))
+    check(entry_price, per_contract)
+    check_permutations(len(entry_price))
+    print("Метрики совпадают с расчётом по generate_report, пути permute — перестановки сделок")
+
+    rng = np.random.default_rng(0)
+    t0 = time.perf_counter()
+    for _ in range(args.loop_paths):
+        loop_path(entry_price, per_contract, rng.integers(0, len(entry_price), len(entry_price)))
+    loop = (time.perf_counter() - t0) / args.loop_paths * args.paths
+
+    for method in ("bootstrap", "permute"):
+        t0 = time.perf_counter()
+        simulate(entry_price, per_contract, args.paths, method, seed=0)
+        elapsed = time.perf_counter() - t0
+        print(f"{method:<10} {args.paths:,} путей × {len(entry_price):,} сделок: {elapsed:8.2f} с "
+              f"(цикл на Python, оценка: {loop:8.1f} с, x{loop / elapsed:.0f})")
+
+
+if __name__ == "__main__":
+    main()
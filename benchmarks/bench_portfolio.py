@@ -0,0 +1,66 @@
+"""
+Портфель с общим капиталом (zrsimacd.portfolio.simulate) на сотнях
+синтетических контрактов: время слияния свечей и пик памяти.
+
+Контракты сдвинуты на 90 дней друг от друга (benchmarks/synthetic.py),
+поэтому позиции по разным контрактам открыты одновременно. Проверяется,
+что итоговая equity равна начальному капиталу плюс прибыль сделок и что
+после последней свечи маржа освобождена.
+
+Запуск:
+    python benchmarks/bench_portfolio.py --contracts 200 --bars 20000
+"""
+import argparse
+import contextlib
+import io
+import math
+import os
+import tempfile
+import time
+import tracemalloc
+
+from synthetic import make_contracts
+from zrsimacd.indicator_files import compute_indicators
+from zrsimacd.metrics import INITIAL_CAPITAL
+from zrsimacd.portfolio import contract_trades, simulate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared-capital portfolio simulation over many contracts")
+    parser.add_argument("--contracts", type=int, default=200)
+    parser.add_argument("--bars", type=int, default=20_000)
+    parser.add_argument("--allocation", type=float, default=0.1)
+    args = parser.parse_args()
+
+    streams, names = [], []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, data in make_contracts(args.contracts, args.bars).items():
+            data = compute_indicators(data, source=name)
+            streams.append(contract_trades(data["timestamp"].to_numpy(dtype="datetime64[ns]").view("int64"),
+                                           data["close"], data["RSI"], data["MACD_Diff"], data["can_trade"]))
+            names.append(name)
+    total = sum(len(s[0]) for s in streams)
+    print(f"Контрактов: {args.contracts}, свечей: {total:,}, сигналов: {sum(len(s[2]) for s in streams):,}")
+
+    def run():
+        with tempfile.TemporaryDirectory() as directory:
+            return simulate(streams, names, allocation=args.allocation,
+                            equity_file=os.path.join(directory, "equity.npcols"))
+
+    t0 = time.perf_counter()
+    trades, stats = run()
+    seconds = time.perf_counter() - t0
+    # Память — отдельным запуском: под tracemalloc цикл по свечам в разы медленнее
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    assert math.isclose(stats["final_equity"], INITIAL_CAPITAL + sum(t[-1] for t in trades), rel_tol=1e-9)
+    print(f"simulate: {seconds:.3f} с, {total / seconds:,.0f} свечей/с, пик памяти {peak / 2 ** 20:.1f} МБ")
+    print(f"сделок: {stats['trades']:,}, пропущено: {stats['skipped']:,}, одновременно — до {stats['max_open']}, "
+          f"точек equity: {stats['points']:,}")
+
+
+if __name__ == "__main__":
+    main()
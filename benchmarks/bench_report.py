@@ -0,0 +1,254 @@
+"""
+Отчёт generate_report: исходные циклы iterrows/groupby против расчёта на
+массивах (zrsimacd.reports).
+
+Сделки синтетические: несколько контрактов с пересекающимися датами, много
+сделок с одинаковым временем выхода. Сначала проверяется, что все CSV и вывод
+в консоль совпадают побайтно, затем замеряется время.
+
+Запуск:
+    python benchmarks/bench_report.py --trades 100000
+"""
+import argparse
+import contextlib
+import filecmp
+import io
+import os
+import tempfile
+import time
+from math import floor
+
+import numpy as np
+import pandas as pd
+
+from zrsimacd.metrics import INITIAL_CAPITAL
+from zrsimacd.reports import (FIXED_FILE, NONDUP_FIXED_FILE, QUARTERLY_FIXED_FILE, REINVEST_FILE,
+                              compute_max_drawdown_from_series, generate_report)
+
+OUTPUT_FILES = (FIXED_FILE, REINVEST_FILE, QUARTERLY_FIXED_FILE)
+
+
+def make_trades(n_trades, n_contracts=20, seed=0):
+    """Сделки на 4-часовых барах; время выхода часто совпадает у разных сделок."""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2019-01-01", tz="UTC")
+    entry_bar = rng.integers(0, 6 * 365 * 6, n_trades)
+    exit_bar = entry_bar + rng.integers(1, 7, n_trades)
+    entry_price = np.round(20000 + rng.normal(0, 2000, n_trades), 0)
+    exit_price = entry_price + np.round(rng.normal(0, 60, n_trades), 0)
+    tickers = rng.integers(1, n_contracts + 1, n_trades).astype(str)
+    directions = np.where(rng.random(n_trades) < 0.5, "BUY", "SELL")
+    return [
+        {
+            "ticker": tickers[i],
+            "direction": directions[i],
+            "entry_time": start + pd.Timedelta(hours=4 * int(entry_bar[i])),
+            "entry_price": entry_price[i],
+            "open_MACD_Diff": 0.0,
+            "exit_time": start + pd.Timedelta(hours=4 * int(exit_bar[i])),
+            "exit_price": exit_price[i],
+            "profit": exit_price[i] - entry_price[i],
+        }
+        for i in range(n_trades)
+    ]
+
+
+def legacy_generate_report(
+        trades,
+        fixed_output_file,
+        reinvest_output_file,
+        nondup_fixed_output_file,
+        quarterly_fixed_file,
+        initial_capital=INITIAL_CAPITAL
+):
+    """Исходная реализация generate_report с циклами iterrows и groupby."""
+    if not trades:
+        print("Сделок не найдено.")
+        return
+
+    # Собираем все сделки в DataFrame и сортируем по entry_time
+    df = pd.DataFrame(trades)
+    df['entry_time'] = pd.to_datetime(df['entry_time'])
+    df['exit_time'] = pd.to_datetime(df['exit_time'])
+    df = df.sort_values('entry_time').reset_index(drop=True)
+
+    # --- 1) Fixed Capital Model ---
+    fixed_profits = []
+    for _, row in df.iterrows():
+        entry_price = row['entry_price']
+        exit_price = row['exit_price']
+        profit_per_contract = (exit_price - entry_price) if row['direction'] == 'BUY' else (entry_price - exit_price)
+        collateral = entry_price / 4.5
+        contracts = floor(initial_capital / collateral)
+        fixed_profits.append(contracts * profit_per_contract)
+    df['fixed_profit'] = fixed_profits
+    df['fixed_cum_profit'] = df['fixed_profit'].cumsum()
+    df['fixed_equity'] = initial_capital + df['fixed_cum_profit']
+    df['fixed_return'] = df['fixed_equity'].pct_change()
+
+    # --- 2) Reinvestment Model ---
+    reinvest_profits = []
+    reinvest_equity_list = []
+    current_capital = initial_capital
+    for _, row in df.iterrows():
+        entry_price = row['entry_price']
+        exit_price = row['exit_price']
+        profit_per_contract = (exit_price - entry_price) if row['direction'] == 'BUY' else (entry_price - exit_price)
+        collateral = entry_price / 4.5
+        contracts = floor(current_capital / collateral)
+        reinvest_profit = contracts * profit_per_contract
+        current_capital += reinvest_profit
+        reinvest_profits.append(reinvest_profit)
+        reinvest_equity_list.append(current_capital)
+    df['reinvest_profit'] = reinvest_profits
+    df['reinvest_equity'] = reinvest_equity_list
+    df['reinvest_return'] = df['reinvest_equity'].pct_change()
+
+    # --- 3) Fixed Capital Model без дубликатов по дате ---
+    df['trade_date'] = df['entry_time'].dt.date
+    df['ticker_numeric'] = pd.to_numeric(df['ticker'], errors='coerce')
+
+    df_sorted = df.sort_values(
+        ['trade_date', 'ticker_numeric', 'ticker'],
+        ascending=[True, False, False]
+    )
+    df_nondup = df_sorted.drop_duplicates(subset='trade_date', keep='first').copy()
+    df_nondup.drop(columns=['ticker_numeric'], inplace=True)
+
+    # Вновь пересчитаем equity для nondup
+    df_nondup['fixed_cum_profit'] = df_nondup['fixed_profit'].cumsum()
+    df_nondup['fixed_equity'] = initial_capital + df_nondup['fixed_cum_profit']
+    df_nondup['fixed_return'] = df_nondup['fixed_equity'].pct_change()
+
+    # Метрики для nondup
+    nondup_valid_returns = df_nondup['fixed_return'].dropna()
+    nondup_sharpe = (
+        nondup_valid_returns.mean() / nondup_valid_returns.std()
+        if nondup_valid_returns.std() != 0 else float('nan')
+    )
+    nondup_rolling_max = df_nondup['fixed_equity'].cummax()
+    nondup_drawdown = nondup_rolling_max - df_nondup['fixed_equity']
+    nondup_max_drawdown = float(nondup_drawdown.max())
+    nondup_total_profit = df_nondup[df_nondup['fixed_profit'] > 0]['fixed_profit'].sum()
+    nondup_total_loss = abs(df_nondup[df_nondup['fixed_profit'] < 0]['fixed_profit'].sum())
+    nondup_profit_factor = (
+        nondup_total_profit / nondup_total_loss
+        if nondup_total_loss != 0 else float('inf')
+    )
+
+    # Годовой обзор для nondup
+    df_nondup['year'] = df_nondup['entry_time'].dt.year
+    nondup_annual = []
+    for year, group in df_nondup.groupby('year'):
+        group_sorted = group.sort_values('entry_time')
+        start_eq = group_sorted.iloc[0]['fixed_equity']
+        group_eq = group_sorted['fixed_equity'] - start_eq
+        rolling_max_year = group_eq.cummax()
+        drawdown_year = rolling_max_year - group_eq
+        max_dd_year = float(drawdown_year.max())
+        nondup_annual.append({
+            'year': year,
+            'num_trades': len(group_sorted),
+            'total_profit': float(group_sorted['fixed_profit'].sum()),
+            'max_drawdown': max_dd_year
+        })
+
+    # --- 4) Quarterly Fixed Capital Model ---
+    # Собираем equity-кривую для Fixed: в df есть столбцы exit_time, fixed_equity, fixed_profit
+    equity_df = df[['exit_time', 'fixed_equity', 'fixed_profit']].copy()
+    equity_df.rename(
+        columns={
+            'exit_time': 'timestamp',
+            'fixed_equity': 'equity',
+            'fixed_profit': 'profit'
+        },
+        inplace=True
+    )
+    equity_df['year'] = equity_df['timestamp'].dt.year
+    equity_df['quarter'] = equity_df['timestamp'].dt.quarter
+
+    quarterly_rows = []
+    for (y, q), group in equity_df.groupby(['year', 'quarter']):
+        num_trades = len(group)  # число сделок (точек equity) в этом квартале
+        balance_end = float(group.sort_values('timestamp').iloc[-1]['equity'])
+        total_profit = float(group['profit'].sum())  # ИТОГОВАЯ прибыль за квартал
+
+        # Для просадки возьмём equity-ряд, отсортированный по времени
+        series_equity = group.sort_values('timestamp')['equity']
+        max_drawdown = compute_max_drawdown_from_series(series_equity)
+
+        quarterly_rows.append({
+            'year': y,
+            'quarter': q,
+            'num_trades': num_trades,
+            'balance_end': balance_end,
+            'profit': total_profit,
+            'max_drawdown': max_drawdown
+        })
+
+    quarterly_df = pd.DataFrame(quarterly_rows)
+    quarterly_df.sort_values(['year', 'quarter'], inplace=True)
+
+    # Сохраняем quarterly_df в отдельный файл
+    quarterly_df.to_csv(quarterly_fixed_file, index=False, float_format='%.2f')
+
+    # ========== ПЕЧАТЬ РЕЗУЛЬТАТОВ В КОНСОЛЬ ==========
+    print("\n=== Fixed Capital Model без дубликатов по дате ===")
+    print(f"Общее число сделок: {len(df_nondup)}")
+    print(f"Суммарная прибыль: {df_nondup['fixed_profit'].sum():,.2f} руб.")
+    print(f"Итоговая equity: {df_nondup['fixed_equity'].iloc[-1]:,.2f} руб.")
+    print(f"Sharpe Ratio: {nondup_sharpe:.4f}")
+    print(f"Max Drawdown: {nondup_max_drawdown:,.2f} руб.")
+    print(f"Profit Factor: {nondup_profit_factor:.4f}")
+    print("Годовой анализ (nondup):")
+    for ann in sorted(nondup_annual, key=lambda x: x['year']):
+        print(
+            f"  {ann['year']}: {ann['num_trades']} сделок, "
+            f"прибыль {ann['total_profit']:,.2f} руб., "
+            f"макс. просадка {ann['max_drawdown']:,.2f} руб."
+        )
+
+    print(f"\nОтчёт nondup сохранён в: {nondup_fixed_output_file}")
+    # Сохраняем три CSV, как было до этого
+    df.to_csv(fixed_output_file, index=False)
+    print(f"Fixed Capital Model сохранён в: {fixed_output_file}")
+    df.to_csv(reinvest_output_file, index=False)
+    print(f"Reinvestment Model сохранён в: {reinvest_output_file}")
+    print(f"Quarterly Fixed Model сохранён в: {quarterly_fixed_file}")
+
+
+
+def run(func, trades, directory):
+    paths = {name: os.path.join(directory, name) for name in (*OUTPUT_FILES, NONDUP_FIXED_FILE)}
+    output = io.StringIO()
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        func(trades, fixed_output_file=paths[FIXED_FILE], reinvest_output_file=paths[REINVEST_FILE],
+             nondup_fixed_output_file=paths[NONDUP_FIXED_FILE], quarterly_fixed_file=paths[QUARTERLY_FIXED_FILE])
+    elapsed = time.perf_counter() - t0
+    return elapsed, output.getvalue().replace(directory, "")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="generate_report: legacy loops vs array implementation")
+    parser.add_argument("--trades", type=int, default=100_000)
+    parser.add_argument("--contracts", type=int, default=20)
+    args = parser.parse_args()
+
+    trades = make_trades(args.trades, args.contracts)
+    with tempfile.TemporaryDirectory() as old_dir, tempfile.TemporaryDirectory() as new_dir:
+        old_time, old_output = run(legacy_generate_report, trades, old_dir)
+        new_time, new_output = run(generate_report, trades, new_dir)
+        for name in OUTPUT_FILES:
+            if not filecmp.cmp(os.path.join(old_dir, name), os.path.join(new_dir, name), shallow=False):
+                raise AssertionError(f"{name} отличается")
+        if old_output != new_output:
+            raise AssertionError("Вывод в консоль отличается")
+
+    print(f"Сделок: {args.trades:,}; CSV и вывод совпадают")
+    print(f"циклы iterrows/groupby: {old_time:8.2f} с")
+    print(f"массивы NumPy:          {new_time:8.2f} с   (x{old_time / new_time:.1f})")
+
+
+if __name__ == "__main__":
+    main()
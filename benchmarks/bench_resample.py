@@ -0,0 +1,68 @@
+"""
+Свечи старшего таймфрейма из часовых: DataFrame.resample(...).agg(...) против
+одного векторного прохода zrsimacd.resample.resample_frame.
+
+Часовые свечи строятся из синтетических 4-часовых (benchmarks/synthetic.py)
+раздроблением каждой на четыре, результаты обоих способов сравниваются.
+
+Запуск:
+    python benchmarks/bench_resample.py --contracts 10 --bars 100000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from synthetic import make_contracts
+from zrsimacd.resample import resample_frame
+
+AGGREGATES = {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}
+TIMEFRAMES = {"4_hour": "4h", "1_day": None}
+
+
+def hourly(data):
+    """Каждая 4-часовая свеча → четыре часовые с теми же ценами и четвертью объёма."""
+    frame = data.loc[data.index.repeat(4)].reset_index(drop=True)
+    frame["time"] += pd.to_timedelta(np.tile(np.arange(4), len(data)), unit="h")
+    frame["volume"] //= 4
+    return frame
+
+
+def legacy_resample(data, timeframe):
+    if TIMEFRAMES[timeframe] is not None:
+        frame = data.set_index("time").resample(TIMEFRAMES[timeframe], origin="epoch", offset="19h").agg(AGGREGATES)
+        return frame.dropna(subset=["open"]).reset_index()
+    # Торговый день с 19:00 накануне, выходные — к понедельнику
+    day = (data["time"] + pd.Timedelta(hours=5)).dt.floor("D")
+    weekday = day.dt.dayofweek
+    day += pd.to_timedelta(np.where(weekday == 5, 2, np.where(weekday == 6, 1, 0)), unit="D")
+    return data.assign(time=day).groupby("time").agg(AGGREGATES).reset_index()
+
+
+def timed(func, frames, timeframe):
+    t0 = time.perf_counter()
+    result = [func(data, timeframe) for data in frames]
+    return result, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resampling: pandas resample/groupby vs one vectorized pass")
+    parser.add_argument("--contracts", type=int, default=10)
+    parser.add_argument("--bars", type=int, default=100_000, help="4-hour bars per contract (x4 hourly)")
+    args = parser.parse_args()
+
+    frames = [hourly(data) for data in make_contracts(args.contracts, args.bars).values()]
+    total = sum(len(data) for data in frames)
+    print(f"Контрактов: {args.contracts}, часовых свечей: {total:,}")
+    for timeframe in TIMEFRAMES:
+        expected, legacy = timed(legacy_resample, frames, timeframe)
+        result, seconds = timed(resample_frame, frames, timeframe)
+        for a, b in zip(result, expected):
+            pd.testing.assert_frame_equal(a, b, check_dtype=False)
+        print(f"{timeframe:>7}: pandas {legacy:7.3f} с, resample_frame {seconds:7.3f} с  (x{legacy / seconds:.1f}), "
+              f"{total / seconds:,.0f} свечей/с")
+
+
+if __name__ == "__main__":
+    main()
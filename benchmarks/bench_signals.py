@@ -0,0 +1,90 @@
+"""
+Бенчмарк поиска сигналов: построчный цикл через iloc против векторных масок.
+
+Запуск:
+    python benchmarks/bench_signals.py --bars 100000
+
+Данные синтетические (случайное блуждание цены, RSI/MACD через ewm), так что
+скрипт не требует ни pandas_ta, ни файлов с котировками. Перед замером
+проверяется, что оба варианта находят одни и те же бары.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from zrsimacd.signals import find_signals
+
+
+def make_data(n_bars, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n_bars))
+    s = pd.Series(close)
+
+    delta = s.diff()
+    gain = delta.clip(lower=0).ewm(alpha=1 / 20, min_periods=20).mean()
+    loss = (-delta.clip(upper=0)).ewm(alpha=1 / 20, min_periods=20).mean()
+    rsi = 100 * gain / (gain + loss)
+
+    macd = s.ewm(span=15, adjust=False).mean() - s.ewm(span=30, adjust=False).mean()
+    signal = macd.ewm(span=10, adjust=False).mean()
+
+    can_trade = np.ones(n_bars, dtype=int)
+    can_trade[:100] = 0
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2020-01-01', periods=n_bars, freq='4h'),
+        'close': close,
+        'RSI': rsi,
+        'MACD_Diff': macd - signal,
+        'can_trade': can_trade,
+    })
+
+
+def legacy_signal_indices(data):
+    """Исходный цикл из check_buy_signals / check_sell_signals (без расчёта выхода)."""
+    buy, sell = [], []
+    for i in range(4, len(data)):
+        if data.iloc[i].get('can_trade', 0) != 1:
+            continue
+
+        last_five = data.iloc[i - 4:i + 1]
+        current_macd_diff = last_five['MACD_Diff'].iloc[-1]
+        prev_macd_diff = last_five['MACD_Diff'][:-1]
+        current_rsi = last_five['RSI'].iloc[-1]
+        prev_rsi = last_five['RSI'][:-1]
+
+        if (prev_rsi < current_rsi).all() and current_macd_diff > 0 and (prev_macd_diff < 0).all():
+            buy.append(i)
+        if (prev_rsi > current_rsi).all() and current_macd_diff < 0 and (prev_macd_diff > 0).all():
+            sell.append(i)
+    return buy, sell
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Signal detection benchmark")
+    parser.add_argument("--bars", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    data = make_data(args.bars, args.seed)
+
+    t0 = time.perf_counter()
+    legacy_buy, legacy_sell = legacy_signal_indices(data)
+    legacy_time = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    buy_idx, sell_idx = find_signals(data)
+    vector_time = time.perf_counter() - t0
+
+    assert list(buy_idx) == legacy_buy, "BUY-сигналы не совпадают"
+    assert list(sell_idx) == legacy_sell, "SELL-сигналы не совпадают"
+
+    print(f"Баров: {args.bars}, BUY: {len(buy_idx)}, SELL: {len(sell_idx)}")
+    print(f"iloc-цикл:       {legacy_time:.3f} с")
+    print(f"векторные маски: {vector_time:.4f} с")
+    print(f"Ускорение: x{legacy_time / vector_time:,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Время запуска CLI: `zrsimacd --help` и `zrsimacd <команда> --help`.
+
+Каждый вариант запускается отдельным процессом интерпретатора несколько раз,
+печатается лучшее время и какие тяжёлые модули (pandas, numpy, tinkoff)
+оказались загружены. Для справки ни один из них не нужен.
+
+Запуск:
+    python benchmarks/bench_startup.py --repeat 5
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ("pandas", "numpy", "tinkoff")
+COMMANDS = ["fetch", "futures", "indicators", "analyze", "report", "sweep", "convert"]
+
+# Запуск CLI в дочернем процессе; после выхода печатает загруженные тяжёлые модули
+_RUNNER = """
+import json, runpy, sys
+sys.argv = ["zrsimacd"] + json.loads(sys.argv[1])
+try:
+    runpy.run_module("zrsimacd.cli", run_name="__main__")
+except SystemExit:
+    pass
+sys.stderr.write(json.dumps([m for m in %r if m in sys.modules]))
+""" % (HEAVY_MODULES,)
+
+
+def run_once(argv):
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", _RUNNER, json.dumps(argv)], capture_output=True, text=True)
+    elapsed = time.perf_counter() - t0
+    loaded = json.loads(proc.stderr.strip().splitlines()[-1]) if proc.stderr.strip() else []
+    return elapsed, loaded
+
+
+def run_once_python():
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    return time.perf_counter() - t0, []
+
+
+def measure(argv, repeat):
+    runs = [run_once(argv) for _ in range(repeat)]
+    best = min(elapsed for elapsed, _ in runs)
+    loaded = runs[-1][1]
+    label = "zrsimacd " + " ".join(argv)
+    print(f"{label:<32} {best * 1000:8.0f} мс   загружены: {', '.join(loaded) or '—'}")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time of the zrsimacd CLI")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    baseline, _ = min(run_once_python() for _ in range(args.repeat))
+    print(f"{'python -c pass':<32} {baseline * 1000:8.0f} мс")
+    measure(["--help"], args.repeat)
+    for command in COMMANDS:
+        measure([command, "--help"], args.repeat)
+
+
+if __name__ == "__main__":
+    main()
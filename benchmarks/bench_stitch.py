@@ -0,0 +1,88 @@
+"""
+Склейка непрерывного ряда (zrsimacd.continuous.stitch_contracts) по
+синтетическим контрактам (benchmarks/synthetic.py) при каждом правиле
+перехода и способе поправки.
+
+Для каждого ряда проверяется, что время строго возрастает, участки идут
+подряд и не пусты, а close на участке — это close контракта с поправкой
+участка. Отдельно проверяются переходы по объёму на первой свече участка:
+контракты, начинающиеся на одной свече (история загрузки обрезала оба), и
+более оживлённый следующий контракт сразу после перехода по экспирации.
+
+Запуск:
+    python benchmarks/bench_stitch.py --contracts 20 --bars 5000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from synthetic import START, STEP, write_contracts
+from zrsimacd.continuous import ADJUSTMENTS, ROLL_RULES, stitch_contracts
+from zrsimacd.store import read_table, table_name, table_path, write_table
+
+
+def check_series(frame, segments, paths, adjust):
+    assert frame["time"].is_monotonic_increasing and frame["time"].is_unique, "время ряда не возрастает строго"
+    assert sum(s["rows"] for s in segments) == len(frame)
+    contracts = {table_name(p): read_table(p, mmap=False).set_index("time") for p in paths}
+    for s in segments:
+        assert s["rows"] > 0, f"пустой участок {s['contract']}"
+        part = frame.iloc[s["start_row"]:s["start_row"] + s["rows"]]
+        source = contracts[s["contract"]].loc[part["time"], "close"].to_numpy()
+        expected = source * s["adjustment"] if adjust == "ratio" else source + s["adjustment"]
+        np.testing.assert_allclose(part["close"].to_numpy(), expected)
+
+
+def _contract(first, bars, volume):
+    volume = np.broadcast_to(np.asarray(volume, dtype=np.int64), bars)
+    close = 100.0 + np.arange(bars)
+    return pd.DataFrame({"time": pd.date_range(START + STEP * first, periods=bars, freq=STEP), "open": close,
+                         "high": close, "low": close, "close": close, "volume": volume})
+
+
+def check_volume_roll_edges(directory):
+    cases = {
+        # Оба контракта начинаются на одной свече, у следующего объём больше уже на ней
+        "общая первая свеча": [_contract(0, 10, 100), _contract(0, 20, 500)],
+        # Переход C0 → C1 по экспирации, C2 оживлённее C1 на первой свече после него
+        "после экспирации": [_contract(0, 10, 500), _contract(0, 20, 100), _contract(0, 30, 900)],
+    }
+    for label, frames in cases.items():
+        paths = []
+        for k, data in enumerate(frames):
+            paths.append(table_path(directory, f"{label.replace(' ', '_')}_{k}"))
+            write_table(data, paths[-1])
+        for adjust in ADJUSTMENTS:
+            frame, segments = stitch_contracts(paths, "volume", adjust)
+            check_series(frame, segments, paths, adjust)
+        print(f"  переход по объёму, {label}: участков {len(segments)}, "
+              f"строк {[s['rows'] for s in segments]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Continuous series stitching on synthetic contracts")
+    parser.add_argument("--contracts", type=int, default=20)
+    parser.add_argument("--bars", type=int, default=5000, help="4-hour bars per contract")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print("Крайние случаи:")
+        check_volume_roll_edges(tmp)
+        paths = write_contracts(os.path.join(tmp, "synthetic"), args.contracts, args.bars, "npcols")
+        print(f"\nКонтрактов: {args.contracts}, свечей: {args.contracts * args.bars:,}")
+        for rule in ROLL_RULES:
+            for adjust in ADJUSTMENTS:
+                t0 = time.perf_counter()
+                frame, segments = stitch_contracts(paths, rule, adjust)
+                seconds = time.perf_counter() - t0
+                check_series(frame, segments, paths, adjust)
+                print(f"{rule:>7} / {adjust:<5} свечей ряда: {len(frame):>9,}  участков: {len(segments):>3}  "
+                      f"{seconds * 1000:7.1f} мс")
+
+
+if __name__ == "__main__":
+    main()
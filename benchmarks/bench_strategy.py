@@ -0,0 +1,98 @@
+"""
+Варианты стратегии (zrsimacd.strategy): построчный разбор правил — как
+правили бы циклы check_buy/sell_signals и calculate_trade_profit_smart под
+каждый вариант — против масок и матрицы выходов, в которые Strategy
+компилирует те же правила.
+
+Для каждого варианта сделки обоих путей (бар входа, направление, бар
+выхода) сверяются.
+
+Запуск:
+    python benchmarks/bench_strategy.py --bars 100000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from bench_signals import make_data
+from zrsimacd.exits import BUY, SELL
+from zrsimacd.strategy import Strategy
+
+VARIANTS = {
+    "исходная": {},
+    "rsi_bars=3, tp=3": {"rsi_bars": 3, "tp_ticks": 3},
+    "монотонный RSI": {"lookback": 3, "rsi_monotonic": True},
+    "без разворота MACD": {"macd_reversal": False, "max_wait": 10},
+    "только BUY, без tp": {"directions": "buy", "tp_ticks": None, "liquidity": False},
+}
+
+
+def rowwise_trades(strategy, rsi, macd_diff, can_trade, close):
+    """Правила стратегии построчно: [(бар входа, направление, бар выхода)]."""
+    s = strategy
+    n = len(close)
+    trades = []
+    for i in range(s.lookback, n):
+        if s.liquidity and can_trade[i] != 1:
+            continue
+        for direction in (BUY, SELL):
+            if s.directions != "both" and s.directions != ("buy" if direction == BUY else "sell"):
+                continue
+            sign = direction
+            if s.rsi_monotonic:
+                rsi_ok = all(sign * (rsi[i - k + 1] - rsi[i - k]) > 0 for k in range(1, s.rsi_bars + 1))
+            else:
+                rsi_ok = all(sign * (rsi[i] - rsi[i - k]) > 0 for k in range(1, s.rsi_bars + 1))
+            macd_ok = all(sign * macd_diff[i - k] < 0 for k in range(1, s.macd_bars + 1))
+            if not (rsi_ok and macd_ok and (not s.macd_cross or sign * macd_diff[i] > 0)):
+                continue
+
+            wait = min(s.max_wait, n - i - 1)
+            exit_index, ticks = i + wait, 0
+            for step in range(1, wait + 1):
+                j = i + step
+                ticks = ticks + 1 if sign * (close[j] - close[j - 1]) > 0 else 0
+                if (s.tp_ticks is not None and ticks >= s.tp_ticks) or \
+                   (s.macd_reversal and sign * (macd_diff[j] - macd_diff[i]) < 0):
+                    exit_index = j
+                    break
+            trades.append((i, direction, exit_index))
+    return sorted(trades)
+
+
+def compiled_trades(strategy, rsi, macd_diff, can_trade, close):
+    buy, sell = strategy.masks(rsi, macd_diff, can_trade)
+    entry_idx = np.concatenate([np.flatnonzero(buy), np.flatnonzero(sell)])
+    direction = np.concatenate([np.full(buy.sum(), BUY), np.full(sell.sum(), SELL)])
+    _, _, exit_idx = strategy.exits(close, macd_diff, entry_idx, direction)
+    return entry_idx, direction, exit_idx
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Strategy variants: row-wise rules vs compiled vector kernels")
+    parser.add_argument("--bars", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    data = make_data(args.bars, args.seed)
+    columns = [data[name].to_numpy(dtype=np.float64) for name in ("RSI", "MACD_Diff", "can_trade", "close")]
+    print(f"Баров: {args.bars:,}")
+    for label, spec in VARIANTS.items():
+        strategy = Strategy.from_dict(spec)
+        t0 = time.perf_counter()
+        expected = rowwise_trades(strategy, *columns)
+        rowwise = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        entry_idx, direction, exit_idx = compiled_trades(strategy, *columns)
+        compiled = time.perf_counter() - t0
+
+        trades = sorted(zip(entry_idx.tolist(), direction.tolist(), exit_idx.tolist()))
+        assert trades == expected, f"{label}: сделки не совпадают с построчным разбором"
+        print(f"{label:<22} сделок: {len(trades):>6,}  построчно: {rowwise:7.3f} с  "
+              f"ядра: {compiled * 1e3:7.2f} мс  (x{rowwise / compiled:,.0f})")
+
+
+if __name__ == "__main__":
+    main()
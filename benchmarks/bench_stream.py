@@ -0,0 +1,58 @@
+"""
+Обработка нового бара: пересчёт пакетным путём по окну последних свечей
+(compute_indicators + frame_trades на каждом баре, как делал бы опрос
+файла) против одного шага потокового движка zrsimacd.stream.
+
+Пакетный путь на каждом баре обрабатывает --window свечей, поэтому его
+стоимость растёт с окном, а у движка — постоянна. Сделки движка по всему
+ряду сверяются с пакетным путём.
+
+Запуск:
+    python benchmarks/bench_stream.py --bars 100000 --window 2000 --polls 200
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from synthetic import make_contracts
+from zrsimacd.indicator_files import compute_indicators
+from zrsimacd.stream import LatencyStats, compare_trades, stream_table
+from zrsimacd.trades import frame_trades
+
+
+def batch_trades(data, name):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return frame_trades(compute_indicators(data, source=name), name).records()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="New-bar cost: batch recompute over a window vs the stream engine")
+    parser.add_argument("--bars", type=int, default=100_000)
+    parser.add_argument("--window", type=int, default=2000, help="Bars the batch path recomputes on every new bar")
+    parser.add_argument("--polls", type=int, default=200, help="New bars timed for the batch path")
+    args = parser.parse_args()
+
+    name, data = next(iter(make_contracts(1, args.bars).items()))
+    print(f"Свечей: {args.bars:,}, окно пакетного пути: {args.window:,}")
+
+    t0 = time.perf_counter()
+    for end in range(len(data) - args.polls, len(data)):
+        batch_trades(data.iloc[max(end + 1 - args.window, 0):end + 1], name)
+    batch = (time.perf_counter() - t0) / args.polls
+
+    latency = LatencyStats()
+    events = list(stream_table(data, name, latency))
+    trades = [{k: v for k, v in e.items() if k != "event"} for e in events if e["event"] == "exit"]
+    trades.sort(key=lambda t: (t["direction"] != "BUY", t["entry_time"]))
+    mismatches = compare_trades(trades, batch_trades(data, name))
+    assert not mismatches, f"сделок, не совпавших с пакетным путём: {mismatches}"
+
+    stream = latency.total_ns / latency.bars / 1e9
+    print(f"пакетный путь: {batch * 1e6:10.1f} мкс/бар")
+    print(f"движок:        {stream * 1e6:10.1f} мкс/бар  (x{batch / stream:.0f}), сделок: {len(trades):,}")
+    latency.report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Набор замеров стадий на синтетических данных (benchmarks/synthetic.py) с
+сохранением в JSON и сравнением с базовым результатом.
+
+Для каждого варианта «контрактов × свечей» замеряются:
+    fetch      — fetch_all против локальной заглушки API (stub_client), свечей/с;
+    indicators — compute_indicators по каждому контракту, свечей/с;
+    signals    — find_signals, свечей/с;
+    exits      — simulate_exits по всем сигналам, сделок/с;
+    report     — generate_report по всем сделкам, сделок/с.
+Берётся лучшее время из --repeat запусков.
+
+Запуск:
+    python benchmarks/bench_suite.py --preset quick --output bench.json
+    python benchmarks/bench_suite.py --output new.json --baseline bench.json --threshold 0.2
+
+С --baseline скрипт печатает изменение пропускной способности по каждой
+паре (вариант, стадия) и завершается с кодом 1, если где-то она упала
+больше чем на threshold. Базовый результат зависит от машины, поэтому в
+репозитории не хранится: его записывают тем же скриптом до изменения.
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from stub_client import StubClient
+from synthetic import make_contracts
+from zrsimacd import catalog
+from zrsimacd.exits import BUY, SELL, simulate_exits
+from zrsimacd.fetcher import fetch_all
+from zrsimacd.indicator_files import INDICATOR_COLUMNS, compute_indicators
+from zrsimacd.reports import generate_report
+from zrsimacd.signals import find_signals
+from zrsimacd.trades import trades_from_signals
+from zrsimacd.tradestore import TradeStore
+
+RESULTS_VERSION = 1
+STAGES = ("fetch", "indicators", "signals", "exits", "report")
+PRESETS = {
+    "quick": ["1x10000", "10x10000"],
+    "standard": ["1x100000", "10x100000", "100x10000"],
+    "full": ["1x1000000", "10x1000000", "100x100000"],
+}
+THRESHOLD = 0.2
+
+
+def parse_case(text):
+    contracts, bars = text.lower().split("x")
+    return int(contracts), int(bars)
+
+
+def best_time(func, repeat):
+    """Лучшее время и результат последнего запуска; вывод функции подавляется."""
+    times = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            result = func()
+            times.append(time.perf_counter() - t0)
+    return min(times), result
+
+
+def bench_fetch(n_contracts, bars, repeat):
+    def run():
+        with tempfile.TemporaryDirectory() as directory:
+            tickers_file = os.path.join(directory, "tickers.txt")
+            with open(tickers_file, "w") as f:
+                f.write("".join(f"C{k}\n" for k in range(n_contracts)))
+            fetch_all(directory, tickers_file=tickers_file, intervals=["4_hour"],
+                      history_days=math.ceil(bars / 6), max_workers=8, rate=0, client=StubClient(latency=0))
+            return sum(e["rows"] for e in catalog.load_catalog(os.path.join(directory, "4_hour")).values())
+
+    return best_time(run, repeat)
+
+
+def bench_case(n_contracts, bars, stages, repeat):
+    """[(стадия, секунды, единиц, единица)] для одного варианта."""
+    results = []
+    if "fetch" in stages:
+        seconds, candles = bench_fetch(n_contracts, bars, repeat)
+        results.append(("fetch", seconds, candles, "bars"))
+
+    contracts = make_contracts(n_contracts, bars)
+    total_bars = n_contracts * bars
+    seconds, frames = best_time(lambda: {name: compute_indicators(data, source=name)[INDICATOR_COLUMNS]
+                                         for name, data in contracts.items()}, repeat)
+    if "indicators" in stages:
+        results.append(("indicators", seconds, total_bars, "bars"))
+
+    seconds, signals = best_time(lambda: {name: find_signals(data) for name, data in frames.items()}, repeat)
+    if "signals" in stages:
+        results.append(("signals", seconds, total_bars, "bars"))
+
+    def exits():
+        for name, data in frames.items():
+            close = data["close"].to_numpy()
+            macd_diff = data["MACD_Diff"].to_numpy()
+            buy_idx, sell_idx = signals[name]
+            simulate_exits(close, macd_diff, buy_idx, BUY)
+            simulate_exits(close, macd_diff, sell_idx, SELL)
+
+    n_trades = sum(len(buy) + len(sell) for buy, sell in signals.values())
+    if "exits" in stages:
+        seconds, _ = best_time(exits, repeat)
+        results.append(("exits", seconds, n_trades, "trades"))
+
+    if "report" in stages:
+        trades = TradeStore()
+        for name, data in frames.items():
+            buy_idx, sell_idx = signals[name]
+            trades_from_signals(data, name[1:], buy_idx, "BUY", trades)
+            trades_from_signals(data, name[1:], sell_idx, "SELL", trades)
+        with tempfile.TemporaryDirectory() as directory:
+            paths = {key: os.path.join(directory, key) for key in ("fixed", "reinvest", "nondup", "quarterly")}
+            seconds, _ = best_time(lambda: generate_report(
+                trades, fixed_output_file=paths["fixed"], reinvest_output_file=paths["reinvest"],
+                nondup_fixed_output_file=paths["nondup"], quarterly_fixed_file=paths["quarterly"]), repeat)
+        results.append(("report", seconds, len(trades), "trades"))
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Печатает изменение пропускной способности; возвращает список регрессий."""
+    previous = {(r["case"], r["stage"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\nСравнение с базовым результатом ({baseline.get('created', '?')}), порог {threshold:.0%}:")
+    for r in results:
+        old = previous.get((r["case"], r["stage"]))
+        if old is None or not old["throughput"]:
+            print(f"  {r['case']:>12} {r['stage']:<10} нет в базовом результате")
+            continue
+        change = r["throughput"] / old["throughput"] - 1
+        mark = ""
+        if change < -threshold:
+            regressions.append((r["case"], r["stage"], change))
+            mark = "  ← регрессия"
+        print(f"  {r['case']:>12} {r['stage']:<10} {old['throughput']:>14,.0f} → {r['throughput']:>14,.0f} "
+              f"{r['unit']}/с ({change:+.1%}){mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stage benchmarks on synthetic candles with JSON baselines")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="standard")
+    parser.add_argument("--case", action="append", metavar="CONTRACTSxBARS",
+                        help="Contracts x bars per contract, e.g. 10x100000 (repeatable; overrides --preset)")
+    parser.add_argument("--stages", type=lambda text: [s for s in text.split(",") if s], default=list(STAGES),
+                        help=f"Comma-separated subset of {','.join(STAGES)}")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="Allowed throughput drop vs the baseline (default: 0.2 = 20%%)")
+    args = parser.parse_args()
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    results = []
+    for case in args.case or PRESETS[args.preset]:
+        n_contracts, bars = parse_case(case)
+        for stage, seconds, items, unit in bench_case(n_contracts, bars, args.stages, args.repeat):
+            throughput = items / seconds if seconds > 0 else 0.0
+            results.append({"case": case, "contracts": n_contracts, "bars": bars, "stage": stage,
+                            "seconds": seconds, "items": items, "unit": unit, "throughput": throughput})
+            print(f"{case:>12} {stage:<10} {seconds:9.3f} с  {items:>12,} {unit:<6} {throughput:>14,.0f} {unit}/с")
+
+    payload = {
+        "version": RESULTS_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(payload, f, indent=1)
+    print(f"\nРезультаты сохранены: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nРегрессий: {len(regressions)}")
+            sys.exit(1)
+        print("\nРегрессий нет")
+
+
+if __name__ == "__main__":
+    main()
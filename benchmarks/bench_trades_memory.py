@@ -0,0 +1,113 @@
+"""
+Память сделок и таблиц индикаторов: исходный список словарей сделок с
+DataFrame в конце против колонок TradeStore (zrsimacd.tradestore), и чтение
+CSV индикаторов с угадыванием типов pandas против store.read_table
+(store.COLUMN_DTYPES, can_trade — int8).
+
+Сделки набираются --copies раз по всем контрактам — как при переборе
+параметров, где сделок в разы больше, чем в одном отчёте. Результаты обоих
+путей сверяются.
+
+Запуск:
+    python benchmarks/bench_trades_memory.py --contracts 20 --bars 50000 --copies 10
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from synthetic import make_contracts
+from zrsimacd.exits import BUY, SELL, simulate_exits
+from zrsimacd.indicator_files import INDICATOR_COLUMNS, compute_indicators
+from zrsimacd.signals import find_signals
+from zrsimacd.store import read_table, table_path, write_table
+from zrsimacd.trades import REPORT_COLUMNS, trades_from_signals
+from zrsimacd.tradestore import TradeStore
+
+
+def legacy_trades(data, ticker, entry_idx, trade_type):
+    """Исходная схема: сделка — словарь с pd.Timestamp."""
+    direction = BUY if trade_type == "BUY" else SELL
+    close = data["close"].to_numpy()
+    _, profits, exit_idx = simulate_exits(close, data["MACD_Diff"].to_numpy(), entry_idx, direction)
+    entry_times = data["timestamp"].iloc[entry_idx].tolist()
+    exit_times = data["timestamp"].iloc[exit_idx].tolist()
+    open_macd_diff = data["MACD_Diff"].to_numpy()[entry_idx]
+    return [{
+        "ticker": ticker,
+        "direction": trade_type,
+        "entry_time": entry_times[k],
+        "entry_price": close[i],
+        "open_MACD_Diff": open_macd_diff[k],
+        "exit_time": exit_times[k],
+        "exit_price": close[exit_idx[k]],
+        "profit": profits[k],
+    } for k, i in enumerate(entry_idx)]
+
+
+def legacy_collect(frames, signals, copies):
+    trades = []
+    for _ in range(copies):
+        for name, data in frames.items():
+            buy_idx, sell_idx = signals[name]
+            trades += legacy_trades(data, name, buy_idx, "BUY") + legacy_trades(data, name, sell_idx, "SELL")
+    return trades, pd.DataFrame(trades)[REPORT_COLUMNS]
+
+
+def store_collect(frames, signals, copies):
+    trades = TradeStore()
+    for _ in range(copies):
+        for name, data in frames.items():
+            buy_idx, sell_idx = signals[name]
+            trades_from_signals(data, name, buy_idx, "BUY", trades)
+            trades_from_signals(data, name, sell_idx, "SELL", trades)
+    return trades, trades.to_frame(REPORT_COLUMNS)
+
+
+def measure(label, func):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<26} пик памяти: {peak / 2**20:8.1f} МБ  время: {elapsed:6.2f} с")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory of trades (list of dicts vs TradeStore) and indicator tables")
+    parser.add_argument("--contracts", type=int, default=20)
+    parser.add_argument("--bars", type=int, default=50_000)
+    parser.add_argument("--copies", type=int, default=10, help="Times the trades of all contracts are collected")
+    args = parser.parse_args()
+
+    frames = {name: compute_indicators(data, source=name)[INDICATOR_COLUMNS]
+              for name, data in make_contracts(args.contracts, args.bars).items()}
+    signals = {name: find_signals(data) for name, data in frames.items()}
+
+    legacy, legacy_frame = measure("список словарей", lambda: legacy_collect(frames, signals, args.copies))
+    store, store_frame = measure("TradeStore", lambda: store_collect(frames, signals, args.copies))
+    pd.testing.assert_frame_equal(store_frame, legacy_frame, check_dtype=False)
+    print(f"сделок: {len(store):,}, TradeStore: {store.nbytes / len(store):.0f} байт на сделку")
+    del legacy, legacy_frame, store, store_frame
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for name, data in frames.items():
+            paths.append(table_path(tmp, name, "csv"))
+            write_table(data, paths[-1])
+        default = measure("CSV, типы pandas", lambda: [pd.read_csv(p, parse_dates=["timestamp"]) for p in paths])
+        typed = measure("CSV, COLUMN_DTYPES", lambda: [read_table(p) for p in paths])
+        for a, b in zip(default, typed):
+            assert np.array_equal(a["can_trade"], b["can_trade"]) and b["can_trade"].dtype == np.int8
+        size = sum(frame.memory_usage().sum() for frame in default) / 2**20
+        typed_size = sum(frame.memory_usage().sum() for frame in typed) / 2**20
+        print(f"таблицы индикаторов в памяти: {size:.1f} МБ → {typed_size:.1f} МБ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Локальная заглушка клиента Tinkoff для офлайн-проверок и бенчмарков загрузки.
+
+Повторяет только то, что использует zrsimacd.fetcher:
+client.market_data.get_candles(instrument_id=, from_=, to=, interval=) → объект
+с полем candles, где у каждой свечи time, open/high/low/close (units + nano) и volume;
+client.instruments.find_instrument(query=) → один инструмент с uid "uid-<тикер>".
+Свечи детерминированы: зависят только от инструмента, начала окна и seed.
+"""
+import threading
+import time
+import zlib
+from datetime import timedelta, timezone
+from types import SimpleNamespace
+
+import numpy as np
+
+
+def _quotation(value):
+    units = int(np.floor(value))
+    return SimpleNamespace(units=units, nano=int(round((value - units) * 1e9)))
+
+
+class StubMarketData:
+    def __init__(self, latency=0.05, step=timedelta(hours=4), fail_every=0, seed=0):
+        self.latency = latency
+        self.step = step
+        self.fail_every = fail_every
+        self.seed = seed
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get_candles(self, instrument_id, from_, to, interval):
+        with self._lock:
+            self.calls += 1
+            call_no = self.calls
+        time.sleep(self.latency)
+        if self.fail_every and call_no % self.fail_every == 0:
+            raise RuntimeError("stub: RESOURCE_EXHAUSTED")
+
+        start = from_.replace(tzinfo=timezone.utc) if from_.tzinfo is None else from_
+        end = to.replace(tzinfo=timezone.utc) if to.tzinfo is None else to
+        n = max(int((end - start) / self.step), 0)
+        rng = np.random.default_rng([zlib.crc32(str(instrument_id).encode()), int(start.timestamp()), self.seed])
+        close = 20000 + np.cumsum(rng.normal(0, 50, n))
+        volume = rng.integers(0, 5000, n)
+        candles = [
+            SimpleNamespace(
+                time=start + k * self.step,
+                open=_quotation(close[k]),
+                high=_quotation(close[k] + 10),
+                low=_quotation(close[k] - 10),
+                close=_quotation(close[k]),
+                volume=int(volume[k]),
+            )
+            for k in range(n)
+        ]
+        return SimpleNamespace(candles=candles)
+
+
+class StubInstruments:
+    def find_instrument(self, query):
+        return SimpleNamespace(instruments=[SimpleNamespace(uid=f"uid-{query}", name=query, instrument_type="futures")])
+
+
+class StubClient:
+    def __init__(self, **kwargs):
+        self.market_data = StubMarketData(**kwargs)
+        self.instruments = StubInstruments()
@@ -0,0 +1,77 @@
+"""
+Детерминированный генератор синтетических свечей (OHLCV) для бенчмарков.
+
+Контракт k — 4-часовые свечи с 2015-01-01 + 90 дней × k (как серия
+квартальных фьючерсов), цена — логнормальное блуждание с шагом цены 1,
+open — close предыдущей свечи, high/low — с тенями. Объём в начале каждого
+контракта мал (меньше порога can_trade), дальше — логнормальный вокруг
+нескольких тысяч. Одни и те же (seed, k, bars) всегда дают одни и те же свечи.
+
+Запуск (файлы для ручных проверок):
+    python benchmarks/synthetic.py OUT_DIR --contracts 10 --bars 100000 --format npcols
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from zrsimacd.store import table_path, write_table
+
+START = pd.Timestamp("2015-01-01", tz="UTC")
+STEP = pd.Timedelta(hours=4)
+CONTRACT_SHIFT = pd.Timedelta(days=90)
+BASE_PRICE = 20000.0
+# Первые свечи контракта — с малым объёмом, торговля по ним запрещена
+THIN_BARS = 20
+
+
+def make_contract(k, bars, seed=0):
+    """Свечи контракта k: DataFrame time (UTC), open, high, low, close, volume."""
+    rng = np.random.default_rng([seed, k])
+    close = np.maximum(np.round(BASE_PRICE * np.exp(np.cumsum(rng.normal(0, 0.004, bars)))), 1.0)
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    spread = np.round(np.abs(rng.normal(0, 15, (2, bars))))
+    volume = np.round(rng.lognormal(7.5, 0.8, bars)).astype(np.int64)
+    volume[:THIN_BARS] = rng.integers(0, 1000, min(THIN_BARS, bars))
+    return pd.DataFrame({
+        "time": pd.date_range(START + CONTRACT_SHIFT * k, periods=bars, freq=STEP),
+        "open": open_,
+        "high": np.maximum(open_, close) + spread[0],
+        "low": np.minimum(open_, close) - spread[1],
+        "close": close,
+        "volume": volume,
+    })
+
+
+def make_contracts(n_contracts, bars, seed=0):
+    """{имя контракта: свечи}; имена — C0, C1, ..."""
+    return {f"C{k}": make_contract(k, bars, seed) for k in range(n_contracts)}
+
+
+def write_contracts(directory, n_contracts, bars, fmt="csv", seed=0):
+    """Пишет контракты таблицами в directory; возвращает пути."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for name, data in make_contracts(n_contracts, bars, seed).items():
+        path = table_path(directory, name, fmt)
+        write_table(data, path)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write deterministic synthetic candle tables")
+    parser.add_argument("output_dir")
+    parser.add_argument("--contracts", type=int, default=10)
+    parser.add_argument("--bars", type=int, default=10_000)
+    parser.add_argument("--format", choices=["csv", "npcols"], default="csv")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    paths = write_contracts(args.output_dir, args.contracts, args.bars, args.format, args.seed)
+    print(f"Записано таблиц: {len(paths)} по {args.bars:,} свечей → {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Дисковый кеш рассчитанных индикаторов.
+
+Ключ — sha256 от содержимого входного файла со свечами и параметров расчёта,
+поэтому повторный запуск по тем же данным с теми же настройками берёт
+готовый результат, а любое изменение свечей или параметров даёт новый ключ.
+
+Записи хранятся отдельными pickle-файлами в одном каталоге. Когда общий
+размер превышает лимит, удаляются самые давно использованные (по mtime,
+который обновляется при каждом попадании).
+
+Настройки через окружение:
+    ZRSIMACD_CACHE_DIR     — каталог кеша (по умолчанию ~/.cache/zrsimacd/indicators)
+    ZRSIMACD_CACHE_MAX_MB  — лимит размера в мегабайтах (по умолчанию 1024)
+    ZRSIMACD_CACHE=0       — отключить кеш
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+# Меняется при изменении формата записей или способа расчёта индикаторов
+CACHE_VERSION = 4
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "zrsimacd", "indicators")
+DEFAULT_MAX_MB = 1024
+
+_READ_CHUNK = 1 << 20
+
+
+def file_digest(file_path):
+    """sha256 содержимого файла (hex)."""
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(_READ_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class IndicatorCache:
+    def __init__(self, cache_dir=None, max_bytes=None, enabled=None):
+        if cache_dir is None:
+            cache_dir = os.getenv("ZRSIMACD_CACHE_DIR", DEFAULT_CACHE_DIR)
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("ZRSIMACD_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024)
+        if enabled is None:
+            enabled = os.getenv("ZRSIMACD_CACHE", "1") != "0"
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, digest, kind, **params):
+        """Ключ записи по хешу входных данных, виду результата и параметрам."""
+        payload = json.dumps(
+            {"v": CACHE_VERSION, "input": digest, "kind": kind, "params": params},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def get(self, key):
+        """Значение из кеша или None при промахе."""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+        # Отмечаем использование для LRU
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def get_or_compute(self, key, compute):
+        """Значение из кеша, а при промахе — результат compute(), сохранённый в кеш."""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def evict(self):
+        """Удаляет самые давно использованные записи, пока кеш не влезет в лимит."""
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(".pkl"):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def report(self):
+        if self.enabled:
+            print(f"Кеш индикаторов: попаданий {self.hits}, промахов {self.misses} ({self.cache_dir})")
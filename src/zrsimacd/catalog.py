@@ -0,0 +1,250 @@
+"""Каталог контрактов в каталоге таблиц (catalog.json).
+
+Для каждой таблицы хранится запись: исходный тикер, имя файла, время первой
+и последней строки, число строк, sha256 содержимого и размер/mtime файла на
+момент описания. Номер контракта (1, 2, ... после zrsimacd futures) — ключ
+записи, а исходный тикер остаётся в поле ticker, так что переименование его
+не теряет.
+
+Каталог ведут стадии, которые пишут таблицы: fetch — для свечей, indicators
+и pipeline — для индикаторов (там же source_digest — хеш свечей, по которым
+посчитаны индикаторы, и параметры расчёта). Порядок экспирации, время
+последней свечи и проверка, устарели ли индикаторы, берутся из каталога.
+Запись считается действительной, пока размер и mtime файла совпадают с
+записанными; иначе (файл изменили в обход стадий) таблица описывается
+заново — по первой и последней строке, без разбора всего файла.
+"""
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from zrsimacd.executor import map_files, report_errors
+from zrsimacd.store import (TIME_COLUMNS, candles_dir, find_table, is_store, last_row, list_tables, read_table,
+                            stat_table, table_columns, table_digest, table_name)
+
+CATALOG_FILE = "catalog.json"
+CATALOG_VERSION = 1
+
+_READ_CHUNK = 1 << 20
+
+
+def catalog_path(directory):
+    return os.path.join(directory, CATALOG_FILE)
+
+
+def load_catalog(directory):
+    """Записи каталога {имя таблицы: запись} (пустой словарь, если каталога нет)."""
+    try:
+        with open(catalog_path(directory), "r") as f:
+            payload = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if payload.get("version") != CATALOG_VERSION:
+        return {}
+    return payload["tables"]
+
+
+def save_catalog(directory, tables):
+    path = catalog_path(directory)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"version": CATALOG_VERSION, "tables": dict(sorted(tables.items()))}, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def table_stamp(path):
+    """(размер, mtime_ns) таблицы или None, если её нет: меняется при любой записи."""
+    try:
+        st = stat_table(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def is_valid(entry, path):
+    """Запись описывает текущее содержимое path (тот же файл, размер и mtime)."""
+    if entry is None or entry.get("file") != os.path.basename(path):
+        return False
+    return (entry["size"], entry["mtime_ns"]) == table_stamp(path)
+
+
+def _csv_digest_and_rows(path):
+    """sha256 и число строк данных CSV за один проход по байтам (без разбора)."""
+    h = hashlib.sha256()
+    lines = 0
+    last = b"\n"
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_READ_CHUNK), b""):
+            h.update(chunk)
+            lines += chunk.count(b"\n")
+            last = chunk[-1:]
+    if last != b"\n":
+        lines += 1
+    return h.hexdigest(), max(lines - 1, 0)
+
+
+def _time_column(path):
+    names = table_columns(path)
+    return next((c for c in TIME_COLUMNS if c in names), None)
+
+
+def _first_time(path, column):
+    if is_store(path):
+        times = read_table(path, columns=[column])[column]
+        return times.iloc[0] if len(times) else None
+    head = pd.read_csv(path, usecols=[column], nrows=1, parse_dates=[column])
+    return head[column].iloc[0] if len(head) else None
+
+
+def describe(path, ticker=None, full=True, **extra):
+    """
+    Запись каталога для таблицы path. Читаются только заголовок, первая и
+    последняя строка; при full ещё один проход по байтам для хеша и числа
+    строк CSV (колонки .npcols отображаются в память). Без full digest и
+    rows остаются None.
+    """
+    size, mtime_ns = table_stamp(path)
+    column = _time_column(path)
+    last = last_row(path) if column else None
+    first_time = _first_time(path, column) if last is not None else None
+    digest = rows = None
+    if full:
+        if is_store(path):
+            digest = table_digest(path)
+            rows = len(read_table(path, columns=table_columns(path)[:1]))
+        else:
+            digest, rows = _csv_digest_and_rows(path)
+    return {
+        "ticker": ticker or table_name(path),
+        "file": os.path.basename(path),
+        "first_time": None if first_time is None else str(first_time),
+        "last_time": None if last is None else str(last[column]),
+        "rows": rows,
+        "digest": digest,
+        "size": size,
+        "mtime_ns": mtime_ns,
+        **extra,
+    }
+
+
+def record(path, ticker=None, **extra):
+    """Описывает записанную таблицу и сохраняет запись в каталог её каталога."""
+    directory = os.path.dirname(path)
+    tables = load_catalog(directory)
+    name = table_name(path)
+    old = tables.get(name)
+    ticker = ticker or (old or {}).get("ticker")
+    tables[name] = describe(path, ticker, **extra)
+    save_catalog(directory, tables)
+    return tables[name]
+
+
+def refresh(directory, full=False, jobs=None):
+    """
+    Записи для всех таблиц каталога: действительные берутся как есть,
+    новые и изменённые описываются заново (тикер сохраняется; jobs — как в
+    executor.map_files), записи удалённых таблиц убираются. При full у всех
+    записей есть digest и rows. Каталог сохраняется, только если что-то
+    изменилось.
+    """
+    tables = load_catalog(directory)
+    paths = list_tables(directory)
+    stale = []
+    for path in paths:
+        entry = tables.get(table_name(path))
+        if not is_valid(entry, path) or (full and entry["digest"] is None):
+            stale.append(path)
+    results = map_files(describe, stale, jobs=jobs, kwargs={"full": full})
+    report_errors(results)
+
+    current = {table_name(path): tables[table_name(path)] for path in paths if path not in stale}
+    for r in results:
+        if r.result is None:
+            continue
+        name = table_name(r.path)
+        old = tables.get(name) or {}
+        # source_digest и params верны, только пока сама таблица не менялась
+        extra = {k: v for k, v in old.items() if k in ("source_digest", "params")} if is_valid(old, r.path) else {}
+        current[name] = {**r.result, "ticker": old.get("ticker", r.result["ticker"]), **extra}
+    if stale or set(current) != set(tables):
+        save_catalog(directory, current)
+    return current
+
+
+def up_to_date(entry, path, source_digest, params):
+    """Таблица path не менялась и посчитана по данным с хешем source_digest с параметрами params."""
+    return (source_digest is not None and is_valid(entry, path) and entry.get("source_digest") == source_digest
+            and entry.get("params") == params)
+
+
+def expiry_order(directory, jobs=None):
+    """
+    [(имя, запись)] таблиц с данными по возрастанию времени последней строки.
+    Одинаковое время последней строки (контракты, которые ещё торгуются, после
+    дозагрузки) — по времени первой строки, затем по тикеру и имени, а не по
+    порядку ключей каталога.
+    """
+    entries = [(name, e) for name, e in refresh(directory, jobs=jobs).items() if e["last_time"] is not None]
+    return sorted(entries, key=lambda item: (pd.Timestamp(item[1]["last_time"]), pd.Timestamp(item[1]["first_time"]),
+                                             str(item[1].get("ticker") or ""), item[0]))
+
+
+def last_time(path):
+    """Время последней строки таблицы: из каталога, а если запись устарела — по хвосту файла."""
+    entry = load_catalog(os.path.dirname(path)).get(table_name(path))
+    if not is_valid(entry, path):
+        column = _time_column(path)
+        last = last_row(path) if column else None
+        return None if last is None else last[column]
+    return None if entry["last_time"] is None else pd.Timestamp(entry["last_time"])
+
+
+def find_ticker(directory, ticker):
+    """
+    Таблица контракта ticker: файл с этим именем или, после переименования
+    zrsimacd futures, таблица, у которой в каталоге записан этот тикер.
+    """
+    path = find_table(directory, ticker)
+    if path is not None:
+        return path
+    for name, entry in load_catalog(directory).items():
+        if entry.get("ticker") == ticker:
+            path = find_table(directory, name)
+            if path is not None:
+                return path
+    return None
+
+
+def rename(directory, renames):
+    """Переносит записи после переименования таблиц: renames — {старое имя: новое имя}."""
+    tables = load_catalog(directory)
+    moved = {}
+    for old, new in renames.items():
+        entry = tables.pop(old, None)
+        if entry is not None:
+            path = find_table(directory, new)
+            moved[new] = {**entry, "file": os.path.basename(path) if path else entry["file"]}
+    for new in moved:
+        tables.pop(new, None)
+    tables.update(moved)
+    save_catalog(directory, tables)
+
+
+def show_catalog(input_dir=None, jobs=None):
+    """
+    Стадия catalog: печатает каталог таблиц input_dir (по умолчанию —
+    каталог свечей store.candles_dir), предварительно обновив его по файлам.
+    """
+    directory = input_dir or candles_dir()
+    tables = refresh(directory, full=True, jobs=jobs)
+    if not tables:
+        print(f"Таблиц не найдено: {directory}")
+        return tables
+    frame = pd.DataFrame([{"contract": name, **entry} for name, entry in tables.items()])
+    frame = frame[["contract", "ticker", "file", "first_time", "last_time", "rows", "digest"]]
+    frame["digest"] = frame["digest"].str[:12]
+    print(frame.to_string(index=False))
+    return tables
+
@@ -1,48 +1,258 @@
+"""Command line entry point: ``zrsimacd <stage> [options]``.
+
+Each stage is a plain function in the package (fetcher.fetch_all,
+futures.order_by_expiry, indicator_files.compute_directory, reports.analyze,
+trades.write_trade_report, pipeline.run_pipeline, catalog.show_catalog,
+continuous.stitch, resample.resample, stream.replay, portfolio.run_portfolio);
+the CLI only parses options and imports the stage module on dispatch. pandas,
+numpy and tinkoff are therefore never loaded for ``--help`` or for a stage
+that does not need them.
+
+The global --metrics/--summary/--memory/--profile options run the stage
+under zrsimacd.instrument (per-stage and per-file timings, counters, peak
+memory) and cProfile.
+"""
 import argparse
+import contextlib
+import functools
+import importlib
 import os
 import sys
-import runpy
-from pathlib import Path
-from dotenv import load_dotenv
-
-def _scripts_dir() -> Path:
-    # Scripts are shipped inside the package under zrsimacd/scripts
-    return Path(__file__).resolve().parent / "scripts"
-
-def _exec(script_name: str, argv=None):
-    """Execute a bundled script as if it was run directly."""
-    script_path = _scripts_dir() / script_name
-    if not script_path.exists():
-        print(f"Script not found: {script_path}", file=sys.stderr)
-        sys.exit(2)
-    # pass through arguments to the script via sys.argv
-    if argv is None:
-        argv = sys.argv[:1] + []
-    sys.argv = [str(script_path)] + (argv or [])
-    runpy.run_path(str(script_path), run_name="__main__")
-
-def main():
-    load_dotenv()  # so scripts can read env like TINKOFF_TOKEN
+
+from zrsimacd import instrument
+from zrsimacd.executor import add_jobs_argument
+
+# command -> (module, stage function)
+STAGES = {
+    "fetch": ("zrsimacd.fetcher", "fetch_all"),
+    "futures": ("zrsimacd.futures", "order_by_expiry"),
+    "indicators": ("zrsimacd.indicator_files", "compute_directory"),
+    "analyze": ("zrsimacd.reports", "analyze"),
+    "report": ("zrsimacd.trades", "write_trade_report"),
+    "pipeline": ("zrsimacd.pipeline", "run_pipeline"),
+    "catalog": ("zrsimacd.catalog", "show_catalog"),
+    "stitch": ("zrsimacd.continuous", "stitch"),
+    "resample": ("zrsimacd.resample", "resample"),
+    "replay": ("zrsimacd.stream", "replay"),
+    "portfolio": ("zrsimacd.portfolio", "run_portfolio"),
+}
+
+# Parser options that configure the CLI itself and are not passed to the stage
+GLOBAL_OPTIONS = ("cmd", "format", "data_dir", "default_interval", "metrics", "summary", "memory", "profile",
+                  "profile_sort")
+
+# Commands that parse their own arguments: module.main(argv)
+PASSTHROUGH = {
+    "sweep": "zrsimacd.sweep",
+    "convert": "zrsimacd.store",
+}
+
+
+def _add_indicator_arguments(parser):
+    # Defaults live in zrsimacd.indicators, which is not imported just for --help
+    parser.add_argument("--rsi-period", type=int, help="RSI period (default: 20)")
+    parser.add_argument("--macd-fast", type=int, help="MACD fast EMA length (default: 15)")
+    parser.add_argument("--macd-slow", type=int, help="MACD slow EMA length (default: 30)")
+    parser.add_argument("--macd-signal", type=int, help="MACD signal EMA length (default: 10)")
+
+
+def _add_strategy_argument(parser):
+    parser.add_argument("--strategy", metavar="SPEC",
+                        help="Entry/exit rules: a JSON file or comma-separated key=value pairs, e.g. "
+                             "rsi_bars=3,tp_ticks=3,directions=buy (default: the original RSI/MACD rules; "
+                             "keys are listed in zrsimacd.strategy)")
+
+
+def build_parser():
     parser = argparse.ArgumentParser(prog="zrsimacd", description="RSI/MACD toolkit & Tinkoff fetcher")
+    parser.add_argument("--data-dir",
+                        help="Data root shared by all stages: <data-dir>/<interval>/ holds candles and "
+                             "<data-dir>/<interval>/rsi_macd/ indicators "
+                             "(default: $ZRSIMACD_DATA_DIR or GAZPROM_FUTURES)")
+    parser.add_argument("--format", choices=["csv", "npcols"],
+                        help="Storage format for candle/indicator files written by the stages "
+                             "(default: $ZRSIMACD_FORMAT or csv); both formats are always accepted as input")
+    # dest differs from pipeline --interval: a subparser default would overwrite it
+    parser.add_argument("--interval", dest="default_interval",
+                        help="Candle interval (timeframe) subdirectory the stages read and write, e.g. 1_hour or a "
+                             "timeframe built by 'zrsimacd resample' (default: $ZRSIMACD_INTERVAL or 4_hour)")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="Append JSON lines with the wall time and counters (bars read, signals, trades, "
+                             "API requests) of every stage section and every file; - for stderr "
+                             "(default: $ZRSIMACD_METRICS)")
+    parser.add_argument("--summary", action="store_true",
+                        help="Print a table of section timings, counters and the slowest files at the end")
+    parser.add_argument("--memory", action="store_true",
+                        help="Also record the peak Python/NumPy memory of each section (tracemalloc, main "
+                             "process only; slows the run down)")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="Run the stage under cProfile: sorted stats to FILE, raw stats to FILE.prof "
+                             "(main process only; use --jobs 1 to include per-file work)")
+    parser.add_argument("--profile-sort", choices=instrument.PROFILE_SORT, default="cumulative",
+                        help="Sort key of the --profile stats (default: cumulative)")
     sub = parser.add_subparsers(dest="cmd", required=True)
 
-    sub.add_parser("fetch", help="Fetch candles via Tinkoff API (runs main_data_parser.py)")
-    sub.add_parser("futures", help="Futures utilities (runs futures_expire_order.py)")
-    sub.add_parser("indicators", help="Compute RSI/MACD from CSV (runs rsi_and_macd_calculation_V3.py)")
-    sub.add_parser("analyze", help="Run final RSI/MACD analysis (runs analiz_danniv_v11_Finalv1.py)")
-    sub.add_parser("report", help="Trades report utilities (runs analiz_trades_report_END.py)")
+    p = sub.add_parser("fetch", help="Fetch candles via Tinkoff API; only new candles unless --full",
+                       description="Fetch candles via Tinkoff API")
+    p.add_argument("--output-dir", dest="save_dir",
+                   help="Root directory for candle tables, one subdirectory per interval (default: data dir)")
+    p.add_argument("--tickers-file", help="File with one ticker per line (default: $TICKERS_FILE or data/tickers.txt)")
+    p.add_argument("--full", action="store_true", default=None,
+                   help="Refetch the whole 5-year range instead of only candles newer than the stored ones")
+
+    p = sub.add_parser("futures", help="Rename contract files in expiry order",
+                       description="Rename contract files in expiry order")
+    p.add_argument("--input-dir", help="Directory with contract candle tables (default: <data dir>/<interval>)")
+    add_jobs_argument(p)
+
+    p = sub.add_parser("indicators", help="Compute RSI/MACD for every candle file",
+                       description="Compute RSI/MACD for every candle file")
+    p.add_argument("--input-dir", help="Directory with candle tables (default: <data dir>/<interval>)")
+    p.add_argument("--output-dir", help="Directory for indicator tables (default: <input-dir>/rsi_macd)")
+    _add_indicator_arguments(p)
+    add_jobs_argument(p)
+
+    p = sub.add_parser("stitch", help="Build one back-adjusted continuous series from the expiring contracts",
+                       description="Stitch the contracts in expiry order into one continuous series and write a "
+                                   "roll index next to it. Run indicators/analyze/report with --input-dir on the "
+                                   "output directory; trades are mapped back to the real contracts.")
+    p.add_argument("--input-dir", help="Directory with contract candle tables (default: <data dir>/<interval>)")
+    p.add_argument("--output-dir",
+                   help="Directory for the continuous series (default: <input-dir>/continuous)")
+    p.add_argument("--roll", dest="rule", choices=["expiry", "volume"],
+                   help="Switch at the last bar of the expiring contract, or at the first common bar where "
+                        "the next contract trades more volume (default: expiry)")
+    p.add_argument("--adjust", choices=["add", "ratio", "none"],
+                   help="Back-adjust earlier contracts by the price gap, by the price ratio, or not at all "
+                        "(default: add)")
+    p.add_argument("--name", help="Table name of the series (default: continuous)")
+
+    p = sub.add_parser("resample", help="Build coarser candles (e.g. 1_day) from a finer fetched interval",
+                       description="Aggregate the candles of one interval into coarser timeframes in a single "
+                                   "vectorized pass (open first, high max, low min, close last, volume sum). "
+                                   "Periods are aligned to the FORTS trading day that starts at --session-start "
+                                   "Moscow time on the previous evening; daily candles are labelled with the "
+                                   "trading date. Run the other stages on a result with --interval.")
+    p.add_argument("--to", dest="targets", required=True, type=lambda text: [x for x in text.split(",") if x],
+                   help="Comma-separated timeframes to build, <n>_<min|hour|day>, e.g. 4_hour,1_day")
+    p.add_argument("--from", dest="source", help="Interval to aggregate (default: the global --interval)")
+    p.add_argument("--session-start", help="Trading day start, HH:MM Moscow time (default: 19:00)")
+    add_jobs_argument(p)
+
+    p = sub.add_parser("replay", help="Replay stored bars one at a time through the streaming signal engine",
+                       description="Feed every table bar by bar to the event-driven engine (incremental RSI/MACD, "
+                                   "signal ring buffer, open positions) as a live feed would, and report the trades "
+                                   "and the per-bar latency. Indicator tables are used as stored; candle tables get "
+                                   "the indicators computed on the fly. Always uses the original RSI/MACD rules "
+                                   "(--strategy is not supported).")
+    p.add_argument("--input-dir", help="Directory with candle or indicator tables (default: <data dir>/<interval>)")
+    p.add_argument("--check", action="store_true", default=None,
+                   help="Also run the batch path on each table and report trades that differ")
+    p.add_argument("--events", dest="events_file", help="Write every entry and exit event to this CSV")
+    p.add_argument("--output", dest="output_file", help="Write the trades in the report format to this CSV")
+    _add_indicator_arguments(p)
+    add_jobs_argument(p)
+
+    p = sub.add_parser("analyze", help="Run the RSI/MACD strategy report",
+                       description="Run the RSI/MACD strategy report")
+    p.add_argument("--input-dir", help="Directory with indicator tables (default: <data dir>/<interval>/rsi_macd)")
+    p.add_argument("--output-dir", help="Directory for the report CSVs (default: current directory)")
+    p.add_argument("--initial-capital", type=float, help="Starting balance (default: 500000)")
+    _add_strategy_argument(p)
+    add_jobs_argument(p)
+
+    p = sub.add_parser("portfolio", help="Simulate all contracts on one account with shared margin",
+                       description="Merge the bars of all contracts in time order and run their trades through "
+                                   "one capital pool: each position ties up margin (entry price / leverage) until "
+                                   "it exits, signals that do not fit the free capital are skipped, and the "
+                                   "mark-to-market equity is written for every timestamp")
+    p.add_argument("--input-dir", help="Directory with indicator tables (default: <data dir>/<interval>/rsi_macd)")
+    p.add_argument("--output-dir", help="Directory for the equity curve and trade CSVs (default: current directory)")
+    p.add_argument("--initial-capital", type=float, help="Starting balance (default: 500000)")
+    p.add_argument("--allocation", type=float,
+                   help="Largest share of the current equity one position may use (default: 0.1)")
+    p.add_argument("--leverage", type=float, help="Margin is entry price / leverage (default: 4.5)")
+    _add_strategy_argument(p)
+    add_jobs_argument(p)
+
+    p = sub.add_parser("report", help="Write the per-trade report", description="Write the per-trade report")
+    p.add_argument("--input-dir", help="Directory with indicator tables (default: <data dir>/<interval>/rsi_macd)")
+    p.add_argument("--output", dest="output_file", help="Report CSV (default: trade_report.csv)")
+    p.add_argument("--montecarlo", type=int, metavar="N",
+                   help="Also resample the trade P&L into N equity paths and report drawdown, final equity "
+                        "and Sharpe distributions for the fixed and reinvestment models")
+    p.add_argument("--mc-method", dest="method", choices=["bootstrap", "permute"],
+                   help="Resample with replacement or shuffle the order (default: bootstrap)")
+    p.add_argument("--seed", type=int, help="Random seed for --montecarlo")
+    p.add_argument("--mc-output", dest="montecarlo_file", help="Distribution table CSV (default: montecarlo.csv)")
+    _add_strategy_argument(p)
+    add_jobs_argument(p)
+
+    p = sub.add_parser("pipeline", help="Run fetch, contract ordering, indicators, analyze and report in one process",
+                       description="Run all stages in one process, passing candles, indicators and trades in "
+                                   "memory; only the outputs listed in --write are saved")
+    p.add_argument("--interval", help="Candle interval subdirectory (default: the global --interval)")
+    p.add_argument("--from-interval", dest="source_interval",
+                   help="Fetch this finer interval and build the --interval candles from it locally")
+    p.add_argument("--skip-fetch", dest="fetch", action="store_false", default=None,
+                   help="Use the stored candles without calling the API")
+    p.add_argument("--full", action="store_true", default=None, help="Refetch the whole history (see fetch --full)")
+    p.add_argument("--tickers-file", help="File with one ticker per line (default: $TICKERS_FILE or data/tickers.txt)")
+    _add_indicator_arguments(p)
+    p.add_argument("--initial-capital", type=float, help="Starting balance (default: 500000)")
+    p.add_argument("--write", type=lambda text: [x for x in text.split(",") if x],
+                   help="Comma-separated outputs to save: indicators, analyze, report (default: analyze,report)")
+    p.add_argument("--output-dir", help="Directory for the report CSVs (default: current directory)")
+    _add_strategy_argument(p)
+    add_jobs_argument(p)
+
+    p = sub.add_parser("catalog", help="Show the contract catalog (original ticker, time range, rows, hash)",
+                       description="Update the contract catalog of a table directory from the files and print it")
+    p.add_argument("--input-dir", help="Directory with candle or indicator tables (default: <data dir>/<interval>)")
+    add_jobs_argument(p)
+
+    sub.add_parser("sweep", help="Grid search over strategy parameters (see zrsimacd sweep --help)", add_help=False)
+    sub.add_parser("convert", help="Convert CSV directories to the columnar .npcols format (and back)",
+                   add_help=False)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, rest = parser.parse_known_args(argv)
+    if args.cmd not in PASSTHROUGH and rest:
+        parser.error(f"unrecognized arguments: {' '.join(rest)}")
+
+    from dotenv import load_dotenv
+    load_dotenv()  # so stages can read env like TINKOFF_TOKEN
+    if args.format:
+        os.environ["ZRSIMACD_FORMAT"] = args.format
+    if args.data_dir:
+        os.environ["ZRSIMACD_DATA_DIR"] = args.data_dir
+    if args.default_interval:
+        os.environ["ZRSIMACD_INTERVAL"] = args.default_interval
+
+    if args.cmd in PASSTHROUGH:
+        run = functools.partial(importlib.import_module(PASSTHROUGH[args.cmd]).main, rest)
+    else:
+        module_name, func_name = STAGES[args.cmd]
+        # Options left unset are not passed, so the stage function's defaults apply
+        options = {k: v for k, v in vars(args).items() if k not in GLOBAL_OPTIONS and v is not None}
+        run = functools.partial(getattr(importlib.import_module(module_name), func_name), **options)
 
-    args, rest = parser.parse_known_args()
+    # Without these options sections are no-ops and the stage runs as is
+    metrics = args.metrics or instrument.metrics_file()
+    if metrics or args.summary or args.memory:
+        instrument.start(metrics, memory=args.memory)
+    try:
+        with contextlib.ExitStack() as stack:
+            if args.profile:
+                stack.enter_context(instrument.profile(args.profile, args.profile_sort))
+            stack.enter_context(instrument.section(args.cmd))
+            run()
+    finally:
+        instrument.finish(summary=args.summary)
 
-    mapping = {
-        "fetch": "main_data_parser.py",
-        "futures": "futures_expire_order.py",
-        "indicators": "rsi_and_macd_calculation_V3.py",
-        "analyze": "analiz_danniv_v11_Finalv1.py",
-        "report": "analiz_trades_report_END.py",
-    }
-    script = mapping[args.cmd]
-    _exec(script, argv=rest)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""Непрерывный ряд по истекающим контрактам (стадия stitch).
+
+Контракты каталога свечей склеиваются в порядке экспирации (из каталога
+контрактов, zrsimacd.catalog) в одну таблицу, так что индикаторы и сигналы
+считаются один раз по сплошному ряду, а прогрев RSI/MACD и окна сигналов не
+теряется в начале каждого контракта.
+
+Переход на следующий контракт (roll):
+    expiry — текущий контракт берётся до его последней свечи, следующий —
+             со свечи позже неё;
+    volume — с первой общей свечи, на которой объём следующего контракта
+             больше объёма текущего (если такой нет — как expiry).
+
+Скачок цены на переходе убирается с конца (back-adjustment): последний
+контракт остаётся как есть, более ранние сдвигаются на сумму скачков (add),
+умножаются на произведение их отношений (ratio) или не меняются (none).
+Скачок — разность (отношение) close следующего и текущего контракта на
+последней свече текущего.
+
+Рядом с таблицей пишется индекс переходов <имя>.rolls.json: для каждого
+участка ряда — контракт, исходный тикер, первая и последняя свеча и
+поправка. По нему сделки на непрерывном ряду относятся к реальному
+контракту (map_trades), а цены возвращаются к ценам этого контракта.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from zrsimacd import catalog
+from zrsimacd.store import (CONTINUOUS_SUBDIR, candles_dir, continuous_dir, find_table, read_table, table_name,
+                            table_path, write_table)
+
+ROLL_RULES = ("expiry", "volume")
+ADJUSTMENTS = ("add", "ratio", "none")
+CONTINUOUS_NAME = "continuous"
+PRICE_COLUMNS = ("open", "high", "low", "close")
+
+
+def rolls_path(path):
+    """Индекс переходов рядом с таблицей непрерывного ряда."""
+    return os.path.splitext(path)[0] + ".rolls.json"
+
+
+def _contract_arrays(path):
+    """Время (int64 нс UTC) и остальные колонки контракта по возрастанию времени."""
+    data = read_table(path, mmap=False)
+    times = pd.DatetimeIndex(data["time"]).as_unit("ns")
+    order = np.argsort(times.asi8, kind="stable")
+    columns = {name: data[name].to_numpy()[order] for name in data.columns if name != "time"}
+    return times.asi8[order], columns, times.tz
+
+
+def _timestamp(ns, tz):
+    ts = pd.Timestamp(ns, tz="UTC")
+    return ts.tz_convert(tz) if tz is not None else ts.tz_localize(None)
+
+
+def _volume_roll(times, volume, next_times, next_volume, start):
+    """Первая общая свеча позже start, где объём следующего контракта больше текущего, или None.
+
+    start — первая свеча участка текущего контракта, поэтому участок не пуст.
+    """
+    common, i, j = np.intersect1d(times, next_times, assume_unique=True, return_indices=True)
+    crossed = (next_volume[j] > volume[i]) & (common > start)
+    return common[crossed.argmax()] if crossed.any() else None
+
+
+def _gap(close, times, next_close, next_times, at, adjust):
+    """Скачок при переходе: close следующего контракта (последний не позже at) против close текущего на at."""
+    current = close[np.searchsorted(times, at, side="right") - 1]
+    following = next_close[max(np.searchsorted(next_times, at, side="right") - 1, 0)]
+    return following / current if adjust == "ratio" else following - current
+
+
+def stitch_contracts(paths, rule="expiry", adjust="add"):
+    """
+    Склеивает таблицы свечей paths (в порядке экспирации). Возвращает
+    (DataFrame ряда, участки); участок — словарь contract, first_time,
+    last_time, start_row, rows и adjustment (слагаемое для add и none,
+    множитель для ratio). (None, []), если свечей нет.
+    """
+    if rule not in ROLL_RULES:
+        raise ValueError(f"Неизвестное правило перехода {rule}, ожидается одно из {ROLL_RULES}")
+    if adjust not in ADJUSTMENTS:
+        raise ValueError(f"Неизвестный способ поправки {adjust}, ожидается один из {ADJUSTMENTS}")
+
+    contracts = [(table_name(path), *_contract_arrays(path)) for path in paths]
+    contracts = [c for c in contracts if len(c[1])]
+    if not contracts:
+        return None, []
+    tz = contracts[0][3]
+
+    # Участок контракта — его свечи со временем в [start, roll); скачок — на последней свече участка
+    spans = []
+    start = np.iinfo(np.int64).min
+    current = contracts[0]
+    for following in contracts[1:]:
+        _, times, columns, _ = current
+        first = np.searchsorted(times, start)
+        if first == len(times):
+            # У текущего контракта нет свечей с start — участка нет, переходим сразу на следующий
+            current = following
+            continue
+        roll = None
+        if rule == "volume" and "volume" in columns and "volume" in following[2]:
+            roll = _volume_roll(times, columns["volume"], following[1], following[2]["volume"], times[first])
+        if roll is None:
+            roll = times[-1] + 1
+        if following[1][-1] < roll:
+            # Следующий контракт закончился не позже текущего — его свечи в ряд не попадают
+            continue
+        rows = (times >= start) & (times < roll)
+        gap = _gap(columns["close"], times, following[2]["close"], following[1], times[rows][-1], adjust)
+        spans.append((current, rows, gap))
+        start = roll
+        current = following
+    spans.append((current, current[1] >= start, None))
+
+    # Поправки с конца: последний участок без изменений
+    adjustments = []
+    adjustment = 1.0 if adjust == "ratio" else 0.0
+    for _, _, gap in reversed(spans):
+        if gap is not None and adjust == "ratio":
+            adjustment *= gap
+        elif gap is not None and adjust == "add":
+            adjustment += gap
+        adjustments.append(adjustment)
+    adjustments.reverse()
+
+    parts = {name: [] for name in ["time", *spans[0][0][2]]}
+    segments = []
+    start_row = 0
+    for ((name, times, columns, _), rows, _), adjustment in zip(spans, adjustments):
+        parts["time"].append(times[rows])
+        for column, values in columns.items():
+            values = values[rows]
+            if column in PRICE_COLUMNS:
+                values = values * adjustment if adjust == "ratio" else values + adjustment
+            parts[column].append(values)
+        count = int(rows.sum())
+        segments.append({
+            "contract": name,
+            "first_time": str(_timestamp(times[rows][0], tz)),
+            "last_time": str(_timestamp(times[rows][-1], tz)),
+            "start_row": start_row,
+            "rows": count,
+            "adjustment": float(adjustment),
+        })
+        start_row += count
+
+    frame = pd.DataFrame({name: np.concatenate(values) for name, values in parts.items()}, copy=False)
+    times = pd.to_datetime(frame["time"].to_numpy(), utc=True)
+    frame["time"] = times.tz_convert(tz) if tz is not None else times.tz_localize(None)
+    return frame, segments
+
+
+def save_rolls(path, segments, rule, adjust, tickers=None):
+    """Индекс переходов в JSON; ticker участка — исходный тикер контракта из каталога."""
+    tickers = tickers or {}
+    payload = {
+        "rule": rule,
+        "adjust": adjust,
+        "segments": [{**s, "ticker": tickers.get(s["contract"], s["contract"])} for s in segments],
+    }
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(payload, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def load_rolls(path):
+    """
+    Индекс переходов для таблицы path — рядом с ней или, для таблицы
+    индикаторов (<ряд>/rsi_macd/<имя>), рядом с рядом свечей. None, если его нет.
+    """
+    directory, file_name = os.path.split(path)
+    for candidate in (path, os.path.join(os.path.dirname(directory), file_name)):
+        try:
+            with open(rolls_path(candidate), "r") as f:
+                return json.load(f)
+        except OSError:
+            continue
+    return None
+
+
+def map_trades(trades, rolls):
+    """
+    Относит сделки непрерывного ряда (TradeStore) к реальным контрактам:
+    ticker — контракт участка, в котором открыта сделка, цены входа и выхода
+    пересчитываются в цены этого контракта (поправка участка входа),
+    прибыль — по ним. Возвращает новое хранилище.
+    """
+    segments = rolls["segments"]
+    if not len(trades) or not segments:
+        return trades
+    starts = np.array([pd.Timestamp(s["first_time"]).value for s in segments], dtype=np.int64)
+    index = np.maximum(np.searchsorted(starts, trades["entry_time"], side="right") - 1, 0)
+    adjustment = np.array([s["adjustment"] for s in segments], dtype=np.float64)[index]
+
+    mapped = trades.take(slice(None))
+    if rolls["adjust"] == "ratio":
+        entry_price, exit_price = trades["entry_price"] / adjustment, trades["exit_price"] / adjustment
+    else:
+        entry_price, exit_price = trades["entry_price"] - adjustment, trades["exit_price"] - adjustment
+    mapped["entry_price"][:] = entry_price
+    mapped["exit_price"][:] = exit_price
+    mapped["profit"][:] = np.where(trades["direction"] > 0, exit_price - entry_price, entry_price - exit_price)
+    mapped.assign_tickers([s["contract"] for s in segments], index)
+    return mapped
+
+
+def stitch(input_dir=None, output_dir=None, rule="expiry", adjust="add", name=CONTINUOUS_NAME):
+    """
+    Стадия stitch: непрерывный ряд по контрактам input_dir (по умолчанию —
+    каталог свечей store.candles_dir) в output_dir/<name> (по умолчанию
+    store.continuous_dir) и индекс переходов рядом с ним. Индикаторы и
+    сделки по ряду — обычными стадиями с --input-dir на output_dir.
+    """
+    output_dir = output_dir or (os.path.join(input_dir, CONTINUOUS_SUBDIR) if input_dir else continuous_dir())
+    input_dir = input_dir or candles_dir()
+    order = catalog.expiry_order(input_dir)
+    frame, segments = stitch_contracts([find_table(input_dir, name) for name, _ in order], rule, adjust)
+    if frame is None:
+        print(f"Нет свечей для склейки в {input_dir}")
+        return None
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_file = table_path(output_dir, name)
+    write_table(frame, output_file)
+    save_rolls(rolls_path(output_file), segments, rule, adjust, tickers={n: e["ticker"] for n, e in order})
+    for s in segments:
+        print(f"{s['contract']:>6}: {s['first_time']} – {s['last_time']}, свечей: {s['rows']}, "
+              f"поправка: {s['adjustment']:g}")
+    print(f"Непрерывный ряд сохранён: {output_file} (свечей: {len(frame)}, контрактов: {len(segments)})")
+    return output_file
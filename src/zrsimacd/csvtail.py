@@ -0,0 +1,51 @@
+"""Работа с концом CSV-файла без чтения и разбора всего файла."""
+import os
+
+_BLOCK = 64 * 1024
+
+
+def last_line_offset(path):
+    """
+    Смещение (в байтах) начала последней непустой строки файла.
+    None, если в файле нет ни одной непустой строки.
+    """
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        tail = b""
+        pos = end
+        while pos > 0:
+            step = min(_BLOCK, pos)
+            pos -= step
+            f.seek(pos)
+            tail = f.read(step) + tail
+            offset = last_line_offset_in(tail)
+            if offset is not None and (offset > 0 or pos == 0):
+                return pos + offset
+    return None
+
+
+def last_line_offset_in(data):
+    """То же, что last_line_offset, но для уже прочитанных байтов."""
+    stripped = data.rstrip(b"\r\n")
+    if not stripped:
+        return None
+    return stripped.rfind(b"\n") + 1
+
+
+def read_last_line(path):
+    """Последняя непустая строка файла (str) или None."""
+    offset = last_line_offset(path)
+    if offset is None:
+        return None
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.read().decode().rstrip("\r\n")
+
+
+def replace_tail(path, offset, text):
+    """Обрезает файл по смещению offset и дописывает text."""
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        f.truncate()
+        f.write(text.encode())
@@ -0,0 +1,112 @@
+"""Параллельная обработка независимых файлов (контрактов) в пуле процессов.
+
+Общий исполнитель для стадий indicators, futures и analyze: функция
+применяется к каждому файлу в отдельном процессе, а результаты, ошибки и
+вывод print возвращаются в порядке входного списка. Поэтому итог (например,
+all_trades) и лог не зависят от числа процессов.
+
+Функция должна быть импортируемой (лежать в модуле пакета, а не в скрипте),
+иначе её нельзя передать в процесс-воркер.
+
+Число процессов — опция --jobs или переменная окружения ZRSIMACD_JOBS
+(по умолчанию 1 — последовательно в текущем процессе; 0 — все ядра).
+
+Время и счётчики (zrsimacd.instrument) каждого файла замеряются там, где он
+обрабатывался, и передаются в instrument.file_done основного процесса.
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+import traceback
+from collections import namedtuple
+
+from zrsimacd import instrument
+
+# Результат обработки одного файла: result — значение функции (None при ошибке),
+# error — текст исключения с трассировкой или None
+FileResult = namedtuple("FileResult", ["path", "result", "error"])
+
+
+def default_jobs():
+    return int(os.getenv("ZRSIMACD_JOBS", 1))
+
+
+def resolve_jobs(jobs):
+    """None — из окружения, 0 или меньше — по числу ядер."""
+    if jobs is None:
+        jobs = default_jobs()
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+    return jobs
+
+
+def add_jobs_argument(parser):
+    parser.add_argument("--jobs", "-j", type=int, default=None,
+                        help="Worker processes for per-file work (default: $ZRSIMACD_JOBS or 1; 0 = all cores)")
+
+
+def _run(func, path, args, kwargs):
+    """func(path, ...) с перехватом исключения; возвращает ещё время и счётчики instrument этого файла."""
+    started = time.perf_counter()
+    with instrument.capture_counts() as counts:
+        try:
+            result, error = func(path, *args, **kwargs), None
+        except Exception:
+            result, error = None, traceback.format_exc()
+    return result, error, time.perf_counter() - started, dict(counts)
+
+
+def _call(func, path, args, kwargs):
+    """Вызов в процессе-воркере: перехватывает исключение и вывод print."""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        outcome = _run(func, path, args, kwargs)
+    return (*outcome, output.getvalue())
+
+
+def _file_result(path, result, error, seconds, counts):
+    instrument.add_counts(counts)
+    instrument.file_done(path, seconds, counts, error is not None)
+    return FileResult(path, result, error)
+
+
+def map_files(func, paths, jobs=None, args=(), kwargs=None):
+    """
+    Применяет func(path, *args, **kwargs) к каждому пути.
+
+    Возвращает список FileResult в порядке paths. Исключение в одном файле
+    не прерывает остальные, а записывается в его FileResult.error.
+    """
+    kwargs = kwargs or {}
+    paths = list(paths)
+    jobs = min(resolve_jobs(jobs), max(len(paths), 1))
+
+    results = []
+    if jobs == 1:
+        for path in paths:
+            results.append(_file_result(path, *_run(func, path, args, kwargs)))
+        return results
+
+    # Пул (и multiprocessing) нужен только при нескольких процессах
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(_call, func, path, args, kwargs) for path in paths]
+        for path, future in zip(paths, futures):
+            *outcome, output = future.result()
+            sys.stdout.write(output)
+            results.append(_file_result(path, *outcome))
+    return results
+
+
+def report_errors(results):
+    """Печатает ошибки по файлам; возвращает их число."""
+    failed = [r for r in results if r.error is not None]
+    if failed:
+        print(f"\nОшибки при обработке файлов ({len(failed)} из {len(results)}):")
+        for r in failed:
+            last_line = r.error.strip().splitlines()[-1]
+            print(f"  {r.path}: {last_line}")
+    return len(failed)
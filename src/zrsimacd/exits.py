@@ -0,0 +1,80 @@
+"""Пакетный расчёт выходов из сделок (векторная версия calculate_trade_profit_smart).
+
+Правила выхода те же, что и в построчной функции:
+
+  * ждём не больше max_wait баров после сигнала (и не дальше конца данных);
+  * выходим, как только набралось tp_ticks подряд благоприятных закрытий
+    (для BUY — close растёт, для SELL — падает);
+  * иначе выходим, если MACD_Diff ушёл против позиции относительно значения
+    на баре входа;
+  * если ничего не сработало — выходим на последнем доступном баре.
+
+Тейк-профит (tp_ticks=None) и выход по развороту MACD (macd_reversal=False)
+можно отключить — так варианты стратегии (zrsimacd.strategy) считаются тем
+же ядром.
+
+Все сигналы обрабатываются сразу матрицей (n_signals x max_wait), поэтому
+одно и то же ядро подходит и для отчёта, и для перебора параметров.
+"""
+import numpy as np
+
+BUY = 1
+SELL = -1
+
+MAX_WAIT = 6
+TP_TICKS = 2
+
+
+def simulate_exits(close, macd_diff, entry_idx, direction, max_wait=MAX_WAIT, tp_ticks=TP_TICKS,
+                   timestamps=None, macd_reversal=True):
+    """
+    Возвращает (exit_time, profit, exit_idx) массивами той же длины, что entry_idx.
+
+    direction — BUY/SELL (1/-1), скаляр или массив на каждый сигнал.
+    exit_time будет None, если timestamps не переданы.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    macd_diff = np.asarray(macd_diff, dtype=np.float64)
+    entry_idx = np.asarray(entry_idx, dtype=np.intp)
+    is_buy = np.broadcast_to(np.asarray(direction) > 0, entry_idx.shape)
+    n = len(close)
+
+    # Сколько баров реально можно ждать по каждому сигналу
+    wait = np.minimum(max_wait, n - entry_idx - 1)
+
+    if max_wait < 1 or len(entry_idx) == 0:
+        exit_idx = entry_idx + np.maximum(wait, 0)
+    else:
+        steps = np.arange(1, max_wait + 1)
+        valid = steps[None, :] <= wait[:, None]
+        window = np.minimum(entry_idx[:, None] + steps[None, :], n - 1)
+
+        hit = np.zeros(valid.shape, dtype=bool)
+        if tp_ticks is not None:
+            curr_close = close[window]
+            prev_close = close[window - 1]
+            favourable = np.where(is_buy[:, None], curr_close > prev_close, curr_close < prev_close) & valid
+
+            # Длина серии благоприятных тиков, заканчивающейся на каждом шаге:
+            # номер шага минус номер последнего неблагоприятного шага
+            step_grid = np.broadcast_to(steps, favourable.shape)
+            last_reset = np.maximum.accumulate(np.where(favourable, 0, step_grid), axis=1)
+            hit |= (step_grid - last_reset) >= tp_ticks
+
+        if macd_reversal:
+            open_macd = macd_diff[entry_idx][:, None]
+            curr_macd = macd_diff[window]
+            hit |= np.where(is_buy[:, None], curr_macd < open_macd, curr_macd > open_macd)
+
+        hit &= valid
+        first_hit = hit.argmax(axis=1) + 1
+        exit_idx = entry_idx + np.where(hit.any(axis=1), first_hit, wait)
+
+    entry_price = close[entry_idx]
+    exit_price = close[exit_idx]
+    profit = np.where(is_buy, exit_price - entry_price, entry_price - exit_price)
+
+    exit_time = None
+    if timestamps is not None:
+        exit_time = np.asarray(timestamps)[exit_idx]
+    return exit_time, profit, exit_idx
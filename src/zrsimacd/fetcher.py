@@ -0,0 +1,500 @@
+"""Параллельная загрузка свечей с ограничением частоты запросов.
+
+Окна запросов (по 30 дней, для мелких интервалов — короче, см.
+INTERVAL_WINDOW_DAYS) всех тикеров и интервалов отправляются в пул
+потоков; частоту ограничивает token bucket, чтобы не выходить за квоты API.
+Ответы сразу раскладываются в типизированные колонки NumPy и отдаются по
+порядку окон, так что их можно дописывать на диск частями (store.TableWriter),
+не собирая всю историю в памяти.
+От клиента нужен только client.market_data.get_candles(instrument_id=,
+from_=, to=, interval=), поэтому вместо настоящего клиента Tinkoff можно
+подставить локальную заглушку (см. benchmarks/bench_fetch.py).
+
+Стадия fetch целиком — fetch_all: для каждого тикера запрашиваются только
+свечи новее сохранённых, неудачные окна записываются в журнал и повторяются
+при следующем запуске. Пакет tinkoff импортируется только внутри fetch_all.
+
+Настройки через окружение:
+    FETCH_WORKERS — число потоков (по умолчанию 8)
+    FETCH_RATE    — запросов в секунду (по умолчанию 10, 0 — без ограничения)
+    FETCH_BURST   — сколько запросов можно отправить подряд без ожидания
+    TICKERS_FILE, TOKEN_FILE, TINKOFF_TOKEN — список тикеров и токен API
+"""
+import json
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from zrsimacd import catalog, instrument
+from zrsimacd.store import (TableWriter, data_dir, default_interval, merge_table, read_table, remove_table,
+                            table_path, write_table)
+
+FETCH_WORKERS = 8
+FETCH_RATE = 10.0
+WINDOW_DAYS = 30
+HISTORY_DAYS = 365 * 5
+
+TICKERS_FILE = "data/tickers.txt"
+TOKEN_FILE = "token.txt"
+# Имя интервала (подкаталог корня данных) → атрибут tinkoff.invest.CandleInterval.
+# Остальные таймфреймы строятся из загруженных локально (zrsimacd resample)
+INTERVALS = {
+    "1_min": "CANDLE_INTERVAL_1_MIN",
+    "5_min": "CANDLE_INTERVAL_5_MIN",
+    "15_min": "CANDLE_INTERVAL_15_MIN",
+    "1_hour": "CANDLE_INTERVAL_HOUR",
+    "4_hour": "CANDLE_INTERVAL_4_HOUR",
+    "1_day": "CANDLE_INTERVAL_DAY",
+}
+# Наибольшее окно одного запроса get_candles по интервалу, дней (у 4_hour — WINDOW_DAYS)
+INTERVAL_WINDOW_DAYS = {"1_min": 1, "5_min": 1, "15_min": 1, "1_hour": 7, "1_day": 365}
+# Окна, которые не удалось загрузить, — повторяются при следующем запуске
+FAILED_JOURNAL = "failed_windows.json"
+
+# Свечи приходят в UTC, сохраняем по Москве
+MSK_SHIFT = timedelta(hours=3)
+_MSK_SHIFT_NS = 3 * 3600 * 10**9
+
+CANDLE_COLUMNS = ("time", "open", "high", "low", "close", "volume")
+
+# Одно окно запроса свечей
+FetchWindow = namedtuple("FetchWindow", ["ticker", "uid", "interval_name", "interval", "start", "end"])
+
+
+class RateLimiter:
+    """Token bucket: в среднем rate запросов в секунду, не больше burst подряд."""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate) if rate else 0.0
+        self.burst = float(burst) if burst else max(1.0, self.rate)
+        self._tokens = self.burst
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Ждёт, пока в ведре появится токен, и забирает его."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+class FetchStats:
+    """Задержка каждого запроса и общая пропускная способность загрузки."""
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.candles = 0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, latency, candles=0, error=False):
+        with self._lock:
+            self.latencies.append(latency)
+            self.candles += candles
+            self.errors += int(error)
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        requests = len(self.latencies)
+        print(f"\nЗапросов: {requests}, ошибок: {self.errors}, свечей: {self.candles}, время: {elapsed:.1f} с")
+        if requests and elapsed > 0:
+            latencies = np.asarray(self.latencies) * 1000
+            print(f"Пропускная способность: {requests / elapsed:.1f} запр/с, {self.candles / elapsed:,.0f} свечей/с")
+            print(
+                f"Задержка, мс: средняя {latencies.mean():.1f}, p50 {np.percentile(latencies, 50):.1f}, "
+                f"p95 {np.percentile(latencies, 95):.1f}, макс {latencies.max():.1f}"
+            )
+
+
+def candle_windows(start, end, days=WINDOW_DAYS):
+    """Разбивает период [start, end) на окна не длиннее days дней."""
+    windows = []
+    while start < end:
+        stop = min(start + timedelta(days=days), end)
+        windows.append((start, stop))
+        start = stop
+    return windows
+
+
+def quotation(q):
+    return q.units + q.nano / 1e9
+
+
+def quotations(values, count):
+    """Массив Quotation → float64 одним проходом (units + nano / 1e9, как quotation)."""
+    units = np.empty(count, dtype=np.int64)
+    nano = np.empty(count, dtype=np.int64)
+    for i, q in enumerate(values):
+        units[i] = q.units
+        nano[i] = q.nano
+    return units + nano / 1e9
+
+
+def candles_to_columns(candles):
+    """
+    Ответ get_candles → типизированные колонки CANDLE_COLUMNS: время — int64 нс
+    от эпохи (уже по МСК), цены — float64, объём — int64.
+    """
+    n = len(candles)
+    times = pd.DatetimeIndex([c.time for c in candles], dtype="datetime64[ns, UTC]") if n else None
+    return {
+        "time": (times.asi8 + _MSK_SHIFT_NS) if n else np.empty(0, dtype=np.int64),
+        "open": quotations((c.open for c in candles), n),
+        "high": quotations((c.high for c in candles), n),
+        "low": quotations((c.low for c in candles), n),
+        "close": quotations((c.close for c in candles), n),
+        "volume": np.fromiter((c.volume for c in candles), dtype=np.int64, count=n),
+    }
+
+
+def columns_to_frame(columns):
+    """Колонки свечей → DataFrame в том же виде, что сохраняется на диск."""
+    frame = pd.DataFrame({name: columns[name] for name in CANDLE_COLUMNS}, copy=False)
+    frame["time"] = pd.DatetimeIndex(columns["time"].view("datetime64[ns]"), tz="UTC")
+    return frame
+
+
+def fetch_window(client, window, limiter=None, stats=None):
+    """Один запрос окна свечей. Возвращает (columns, error)."""
+    if limiter is not None:
+        limiter.acquire()
+    started = time.perf_counter()
+    try:
+        response = client.market_data.get_candles(
+            instrument_id=window.uid,
+            from_=window.start,
+            to=window.end,
+            interval=window.interval,
+        )
+        columns = candles_to_columns(response.candles)
+    except Exception as e:
+        instrument.count("api_requests")
+        instrument.count("api_errors")
+        if stats is not None:
+            stats.record(time.perf_counter() - started, error=True)
+        return None, e
+    instrument.count("api_requests")
+    instrument.count("candles_fetched", len(columns["time"]))
+    if stats is not None:
+        stats.record(time.perf_counter() - started, len(columns["time"]))
+    return columns, None
+
+
+def iter_windows(client, windows, max_workers=FETCH_WORKERS, limiter=None, stats=None, max_in_flight=None):
+    """
+    Запрашивает окна параллельно в max_workers потоках и отдаёт
+    (window, columns, error) строго в порядке windows.
+
+    Одновременно в работе не больше max_in_flight окон (по умолчанию
+    2 * max_workers): готовые окна ждут в буфере, пока не придёт их очередь,
+    поэтому в памяти держится ограниченное число ответов, сколько бы окон ни было.
+    """
+    if max_workers <= 1:
+        for w in windows:
+            yield (w, *fetch_window(client, w, limiter, stats))
+        return
+    max_in_flight = max_in_flight or 2 * max_workers
+    pending = deque()
+    windows = iter(windows)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for w in windows:
+            pending.append((w, pool.submit(fetch_window, client, w, limiter, stats)))
+            if len(pending) >= max_in_flight:
+                w, future = pending.popleft()
+                yield (w, *future.result())
+        while pending:
+            w, future = pending.popleft()
+            yield (w, *future.result())
+
+
+def fetch_windows(client, windows, max_workers=FETCH_WORKERS, limiter=None, stats=None):
+    """То же, что iter_windows, но списком (все ответы сразу в памяти)."""
+    return list(iter_windows(client, windows, max_workers, limiter, stats))
+
+
+# === Журнал неудачных окон ===
+#
+# Окна, которые не удалось загрузить, сохраняются в JSON и повторяются при
+# следующем запуске (uid и интервал восстанавливаются по тикеру и имени интервала).
+
+def load_failed_windows(path):
+    """Список словарей ticker/interval_name/start/end из журнала (пустой, если журнала нет)."""
+    try:
+        with open(path, "r") as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        return []
+    return [
+        {**entry, "start": datetime.fromisoformat(entry["start"]), "end": datetime.fromisoformat(entry["end"])}
+        for entry in entries
+    ]
+
+
+def save_failed_windows(path, entries):
+    """Перезаписывает журнал; пустой список удаляет файл."""
+    if not entries:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    payload = [
+        {
+            "ticker": e["ticker"],
+            "interval_name": e["interval_name"],
+            "start": e["start"].isoformat(),
+            "end": e["end"].isoformat(),
+        }
+        for e in entries
+    ]
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(payload, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+# === Стадия fetch ===
+
+def read_tickers(file_name):
+    """Тикеры из файла, по одному в строке."""
+    with open(file_name, "r") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def read_token(file_name):
+    """Токен API из TINKOFF_TOKEN или из файла."""
+    token = os.getenv("TINKOFF_TOKEN")
+    if token:
+        return token.strip()
+    if os.path.exists(file_name):
+        with open(file_name, "r") as f:
+            return f.read().strip()
+    raise FileNotFoundError("Provide TINKOFF_TOKEN in env or token.txt")
+
+
+def fetch_uid_for_ticker(client, ticker):
+    """UID первого инструмента, найденного по тикеру, или None."""
+    instrument.count("api_requests")
+    instruments = client.instruments.find_instrument(query=ticker).instruments
+    for found in instruments:
+        try:
+            print(f"UID: {found.uid}, Название: {found.name}, Тип: {found.instrument_type}")
+            return found.uid
+        except Exception as e:
+            print(f"Ошибка получения данных для {ticker}: {e}")
+    print(f"Для тикера {ticker} не найден подходящий UID.")
+    return None
+
+
+def fetch_candles(client, uid, interval, interval_name, output_file, history_days=HISTORY_DAYS,
+                  max_workers=FETCH_WORKERS, limiter=None):
+    """
+    Свечи одного инструмента за history_days по 30-дневным отрезкам; пишутся
+    в output_file по мере получения окон. Возвращает число свечей.
+    """
+    now = datetime.utcnow() + MSK_SHIFT
+    start = now - timedelta(days=history_days)
+    print(f"Запрашиваем данные с {start} до {now} (UTC+3) для интервала {interval_name}.")
+
+    windows = [
+        FetchWindow(None, uid, interval_name, interval, window_start, window_end)
+        for window_start, window_end in candle_windows(start, now)
+    ]
+    limiter = limiter or RateLimiter(FETCH_RATE)
+    with TableWriter(output_file) as writer:
+        for window, columns, error in iter_windows(client, windows, max_workers=max_workers, limiter=limiter):
+            if error is not None:
+                print(f"Ошибка получения данных для UID {uid} ({window.start} – {window.end}): {error}")
+                continue
+            writer.append(columns_to_frame(columns))
+    return writer.rows
+
+
+def fetch_start(output_dir, ticker, default_start, full=False):
+    """
+    Начало запроса для тикера: последняя сохранённая свеча (она
+    перезапрашивается, т.к. могла быть ещё не закрыта) или default_start,
+    если данных нет. Таблица тикера ищется и под номером после zrsimacd
+    futures, время последней свечи берётся из каталога контрактов.
+    """
+    existing = catalog.find_ticker(output_dir, ticker)
+    if full or existing is None:
+        return default_start
+    last = catalog.last_time(existing)
+    if last is None:
+        return default_start
+    # В файле время по МСК, API ждёт UTC
+    last_time = last.tz_localize(None).to_pydatetime() - MSK_SHIFT
+    return max(default_start, last_time)
+
+
+class TickerStream:
+    """
+    Загруженные свечи тикера пишутся во временную таблицу рядом с основной;
+    после последнего окна она сливается с уже сохранёнными данными по частям
+    (store.merge_table), так что память не зависит от длины истории, а запись
+    таблицы в каталоге контрактов обновляется.
+    """
+
+    def __init__(self, output_dir, ticker, interval_name):
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.ticker = ticker
+        self.interval_name = interval_name
+        self.partial_path = table_path(output_dir, f".{ticker}.part")
+        self.writer = TableWriter(self.partial_path)
+        self.ordered = True
+        self.last_time = None
+
+    def append(self, columns):
+        times = columns["time"]
+        if not len(times):
+            return
+        if (self.last_time is not None and times[0] <= self.last_time) or (np.diff(times) <= 0).any():
+            self.ordered = False
+        self.last_time = times[-1]
+        self.writer.append(columns_to_frame(columns))
+
+    def finish(self):
+        rows = self.writer.close()
+        if not rows:
+            remove_table(self.partial_path)
+            print(f"Нет новых данных для {self.ticker}.")
+            return
+        existing = catalog.find_ticker(self.output_dir, self.ticker)
+        output_file = existing or table_path(self.output_dir, self.ticker)
+        if existing is None and self.ordered:
+            os.replace(self.partial_path, output_file)
+        else:
+            if not self.ordered:
+                # Окна, повторённые по журналу, пришли не по порядку — упорядочиваем
+                # временную таблицу (в ней только свечи этой загрузки)
+                partial = read_table(self.partial_path, mmap=False)
+                write_table(partial.sort_values("time").drop_duplicates("time", keep="last"), self.partial_path)
+            merge_table(output_file, self.partial_path, key="time")
+            remove_table(self.partial_path)
+        catalog.record(output_file, ticker=self.ticker)
+        print(f"Данные сохранены: {output_file} (получено свечей: {rows})")
+
+
+def fetch_all(save_dir=None, tickers_file=None, token_file=None, intervals=None, full=False,
+              history_days=HISTORY_DAYS, max_workers=None, rate=None, burst=None, client=None):
+    """
+    Стадия fetch: свечи всех тикеров из tickers_file по интервалам intervals
+    (имена из INTERVALS, по умолчанию — store.default_interval) в
+    save_dir/<интервал>/<тикер>; save_dir по умолчанию — общий корень данных
+    (store.data_dir).
+
+    Без full запрашиваются только свечи новее сохранённых. client — готовый
+    клиент (например, заглушка); по умолчанию открывается tinkoff.invest.Client.
+    """
+    save_dir = save_dir or data_dir()
+    tickers_file = tickers_file or os.getenv("TICKERS_FILE", TICKERS_FILE)
+    token_file = token_file or os.getenv("TOKEN_FILE", TOKEN_FILE)
+    intervals = list(intervals or [default_interval()])
+    unknown = [name for name in intervals if name not in INTERVALS]
+    if unknown:
+        raise ValueError(f"Интервалы {unknown} не загружаются из API (есть {list(INTERVALS)}); "
+                         f"свечи других таймфреймов строит zrsimacd resample")
+    max_workers = max_workers or int(os.getenv("FETCH_WORKERS", FETCH_WORKERS))
+    rate = float(os.getenv("FETCH_RATE", FETCH_RATE)) if rate is None else rate
+    burst = burst or float(os.getenv("FETCH_BURST", 0)) or None
+
+    tickers = read_tickers(tickers_file)
+    for interval_name in intervals:
+        os.makedirs(os.path.join(save_dir, interval_name), exist_ok=True)
+
+    if client is None:
+        from tinkoff.invest import CandleInterval, Client
+
+        interval_values = {name: getattr(CandleInterval, INTERVALS[name]) for name in intervals}
+        with Client(read_token(token_file)) as client:
+            _fetch_with_client(client, save_dir, tickers, interval_values, full, history_days, max_workers,
+                               rate, burst)
+    else:
+        interval_values = {name: INTERVALS[name] for name in intervals}
+        _fetch_with_client(client, save_dir, tickers, interval_values, full, history_days, max_workers, rate, burst)
+
+
+def _fetch_with_client(client, save_dir, tickers, intervals, full, history_days, max_workers, rate, burst):
+    now = datetime.utcnow() + MSK_SHIFT
+    history_start = now - timedelta(days=history_days)
+    journal_path = os.path.join(save_dir, FAILED_JOURNAL)
+    journal = load_failed_windows(journal_path)
+    if journal:
+        print(f"Повторяем {len(journal)} окон, не загруженных в прошлый раз.")
+
+    with instrument.section("plan"):
+        # Окна всех тикеров и интервалов запрашиваем вместе, параллельно
+        windows = []
+        retried = set()
+        for ticker in tickers:
+            print(f"Обработка тикера: {ticker}...")
+
+            uid = fetch_uid_for_ticker(client, ticker)
+            if not uid:
+                continue
+
+            for interval_name, interval in intervals.items():
+                output_dir = os.path.join(save_dir, interval_name)
+                start = fetch_start(output_dir, ticker, history_start, full=full)
+                if start > history_start:
+                    print(f"  {interval_name}: дозагрузка с {start}")
+                ticker_windows = [
+                    FetchWindow(ticker, uid, interval_name, interval, window_start, window_end)
+                    for window_start, window_end in candle_windows(
+                        start, now, INTERVAL_WINDOW_DAYS.get(interval_name, WINDOW_DAYS))
+                ]
+                for i, entry in enumerate(journal):
+                    if entry["ticker"] == ticker and entry["interval_name"] == interval_name:
+                        ticker_windows.append(
+                            FetchWindow(ticker, uid, interval_name, interval, entry["start"], entry["end"]))
+                        retried.add(i)
+                # По времени, чтобы свечи писались на диск по порядку
+                windows.extend(sorted(ticker_windows, key=lambda w: w.start))
+
+    print(f"Запрашиваем {len(windows)} окон по {max_workers} потоков, до {rate} запр/с.")
+    with instrument.section("download"):
+        stats = FetchStats()
+        results = iter_windows(client, windows, max_workers=max_workers, limiter=RateLimiter(rate, burst),
+                               stats=stats)
+
+        # Окна тикеров, которые в этот раз не запрашивались, остаются в журнале
+        failed = [entry for i, entry in enumerate(journal) if i not in retried]
+        # Окна одного тикера и интервала идут подряд, поэтому пишем их потоком
+        stream = None
+        for window, columns, error in results:
+            if stream is None or (stream.ticker, stream.interval_name) != (window.ticker, window.interval_name):
+                if stream is not None:
+                    stream.finish()
+                stream = TickerStream(os.path.join(save_dir, window.interval_name), window.ticker,
+                                      window.interval_name)
+            if error is not None:
+                print(f"Ошибка получения данных для {window.ticker} ({window.start} – {window.end}): {error}")
+                failed.append({"ticker": window.ticker, "interval_name": window.interval_name,
+                               "start": window.start, "end": window.end})
+                continue
+            stream.append(columns)
+        if stream is not None:
+            stream.finish()
+
+    save_failed_windows(journal_path, failed)
+    if failed:
+        print(f"Не загружено окон: {len(failed)}, они будут повторены при следующем запуске ({journal_path}).")
+    stats.report()
@@ -0,0 +1,48 @@
+"""Порядок фьючерсных контрактов по дате последней свечи (экспирации).
+
+Стадия futures — order_by_expiry: файлы контрактов в каталоге
+переименовываются в 1, 2, ... по дате закрытия. Даты берутся из каталога
+контрактов (zrsimacd.catalog); исходный тикер остаётся в его записи.
+"""
+import os
+
+from zrsimacd import catalog
+from zrsimacd.store import CSV_SUFFIX, STORE_SUFFIX, candles_dir, find_table, is_store, remove_table, table_name
+
+
+def order_by_expiry(input_dir=None, jobs=None):
+    """
+    Переименовывает таблицы контрактов input_dir (по умолчанию — каталог
+    свечей store.candles_dir) в порядке закрытия: 1, 2, ...
+    """
+    input_dir = input_dir or candles_dir()
+    # [(имя, запись каталога)] по дате закрытия; файлы читаются только для новых и изменённых таблиц
+    futures_closure = catalog.expiry_order(input_dir, jobs=jobs)
+
+    # Куда переименовать каждую таблицу
+    plan = []
+    for i, (name, entry) in enumerate(futures_closure, start=1):
+        old_path = find_table(input_dir, name)
+        new_filename = f"{i}{STORE_SUFFIX if is_store(old_path) else CSV_SUFFIX}"
+        plan.append((name, entry, old_path, os.path.join(input_dir, new_filename)))
+    sources = {old_path for _, _, old_path, _ in plan}
+
+    # Два прохода: уже пронумерованные таблицы меняются именами (9 ↔ 10), поэтому сначала все
+    # переименовываемые файлы уходят во временные имена (скрытые — list_tables их не видит), потом — в новые
+    moving = [(name, entry, old_path, new_path, os.path.join(input_dir, f".{os.path.basename(old_path)}.renaming"))
+              for name, entry, old_path, new_path in plan if new_path != old_path]
+    for _, _, old_path, _, temp_path in moving:
+        os.rename(old_path, temp_path)
+
+    renames = {}
+    for name, entry, old_path, new_path, temp_path in moving:
+        # Перезаписывается только таблица, которая сама не переименовывается (например, без свечей)
+        if os.path.exists(new_path) and new_path not in sources:
+            remove_table(new_path)
+        os.rename(temp_path, new_path)
+        renames[name] = table_name(new_path)
+        print(f"✅ {os.path.basename(old_path)} → {os.path.basename(new_path)} (закрытие: {entry['last_time'][:10]}, "
+              f"тикер: {entry['ticker']})")
+    catalog.rename(input_dir, renames)
+
+    print("\n🎉 Переименование завершено.")
@@ -0,0 +1,274 @@
+"""Расчёт индикаторов для одного файла со свечами и запись результата.
+
+Расчёт по DataFrame в памяти (compute_indicators), полный пересчёт файла
+(calculate_and_save_indicators), дописывание только новых свечей по
+сохранённому состоянию (append_new_candles) и выбор между ними
+(update_indicators). Функции импортируемые, поэтому файлы можно
+обрабатывать параллельно через zrsimacd.executor.
+
+Стадия indicators целиком — compute_directory.
+"""
+import copy
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from zrsimacd import catalog, instrument
+from zrsimacd.cache import IndicatorCache
+from zrsimacd.csvtail import last_line_offset, last_line_offset_in, replace_tail
+from zrsimacd.indicators import (MACD_FAST, MACD_SIGNAL, MACD_SLOW, RSI_PERIOD, build_state, can_trade_flags, ema,
+                                 fold_state, load_state, macd, rsi, save_state, state_path)
+from zrsimacd.executor import map_files, report_errors
+from zrsimacd.store import (INDICATORS_SUBDIR, candles_dir, is_store, list_tables, read_table, table_digest, table_name,
+                            table_path, write_table)
+
+
+# Колонки таблицы с индикаторами
+INDICATOR_COLUMNS = ['timestamp', 'close', 'RSI', 'MACD', 'Signal', 'MACD_Diff', 'can_trade']
+
+
+def compute_indicators(data, rsi_period=RSI_PERIOD, macd_fast=MACD_FAST, macd_slow=MACD_SLOW,
+                       macd_signal=MACD_SIGNAL, source=""):
+    """
+    RSI, MACD и can_trade по свечам (колонка времени — time или timestamp).
+    Возвращает новый DataFrame, упорядоченный по timestamp, или None, если
+    посчитать нельзя (причина печатается; source — имя файла для сообщений).
+    """
+    data = data.rename(columns={'time': 'timestamp'})
+
+    # Проверяем наличие необходимых колонок
+    if not {'timestamp', 'close'}.issubset(data.columns):
+        print(f"Пропущены нужные колонки в {source}")
+        return None
+
+    data = data.sort_values('timestamp')
+
+    if len(data) < max(macd_slow, rsi_period):
+        print(f"Недостаточно данных в {source}")
+        return None
+
+    data['close'] = data['close'].ffill().bfill()
+
+    # Расчет RSI
+    data['RSI'] = rsi(data['close'], rsi_period)
+
+    # Расчет MACD и связанных индикаторов
+    try:
+        macd_lines = macd(data['close'], fast=macd_fast, slow=macd_slow, signal=macd_signal)
+        if macd_lines is None:
+            print("MACD не рассчитан")
+            return None
+
+        data['MACD'], data['Signal'] = macd_lines
+        data['MACD_Diff'] = data['MACD'] - data['Signal']
+    except Exception as e:
+        print(f"Ошибка при расчёте MACD: {e}")
+        return None
+
+    # Оценка возможности торговли по объему
+    # Изначально для каждой свечи ставим 0, то есть торговля невозможна
+    data['can_trade'] = np.zeros(len(data), dtype=np.int8)
+    if 'volume' in data.columns:
+        # Если нашли 3 подряд свечи с volume > 1000, начиная с третьей из них считаем, что торговать можно
+        data['can_trade'] = can_trade_flags(data['volume'])
+        if not data['can_trade'].any():
+            print(f"В файле {source} не найдено 3 подряд свечей с volume > 1000")
+    else:
+        print(f"Колонка 'volume' не найдена в {source}")
+    return data
+
+
+def calculate_and_save_indicators(file_path, output_file, rsi_period=RSI_PERIOD, macd_fast=MACD_FAST,
+                                  macd_slow=MACD_SLOW, macd_signal=MACD_SIGNAL, cache=None):
+    print(f"Обработка файла: {file_path}")
+
+    # Те же свечи с теми же параметрами уже считали — берём результат из кеша
+    if cache is not None:
+        cache_key = cache.key(table_digest(file_path), "rsi_macd", rsi_period=rsi_period, macd_fast=macd_fast,
+                              macd_slow=macd_slow, macd_signal=macd_signal)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            result, state = cached
+            write_table(result, output_file)
+            _write_state(output_file, state)
+            print(f"Сохранено (из кеша): {output_file}")
+            return
+    data = read_table(file_path)
+    data.rename(columns={'time': 'timestamp'}, inplace=True)
+
+    # Дописывать новые свечи можно, только если файл уже упорядочен по времени
+    input_sorted = 'timestamp' in data.columns and data['timestamp'].is_monotonic_increasing
+    data = compute_indicators(data, rsi_period, macd_fast, macd_slow, macd_signal, source=file_path)
+    if data is None:
+        return
+
+    # Сохраняем результат
+    write_table(data[INDICATOR_COLUMNS], output_file)
+    print(f"Сохранено: {output_file}")
+
+    # Состояние для дописывания: всё, кроме последней (возможно незакрытой) свечи.
+    # Дописывание работает по смещениям в CSV, для .npcols всегда полный пересчёт
+    state = None
+    if input_sorted and not is_store(file_path) and not is_store(output_file):
+        state = build_state(
+            data['close'].to_numpy(),
+            data['volume'].to_numpy() if 'volume' in data.columns else None,
+            ema(data['close'], min(macd_fast, macd_slow)),
+            ema(data['close'], max(macd_fast, macd_slow)),
+            data['Signal'].to_numpy(),
+            rsi_period,
+            bars=len(data) - 1,
+            rsi_line=data['RSI'].to_numpy(),
+        )
+    if state is not None:
+        state.update({
+            'params': indicator_params(rsi_period, macd_fast, macd_slow, macd_signal),
+            'last_timestamp': str(data['timestamp'].iloc[-1]),
+            'input_offset': last_line_offset(file_path),
+        })
+    _write_state(output_file, state)
+    if cache is not None:
+        cache.put(cache_key, (data[INDICATOR_COLUMNS], state))
+
+
+def indicator_params(rsi_period, macd_fast, macd_slow, macd_signal):
+    """Параметры расчёта в том виде, в каком они записываются в состояние и каталог."""
+    return {'rsi_period': rsi_period, 'macd_fast': macd_fast, 'macd_slow': macd_slow, 'macd_signal': macd_signal}
+
+
+def _write_state(output_file, state):
+    path = state_path(output_file)
+    if state is not None:
+        save_state(path, state)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def append_new_candles(file_path, output_file, state):
+    """
+    Досчитывает индикаторы только для свечей, появившихся после прошлого запуска,
+    и дописывает их в output_file. Возвращает False, если дописать нельзя
+    (файл со свечами переписан не только в конце) — тогда нужен полный пересчёт.
+    """
+    # Читаем заголовок и хвост файла, начиная с последней учтённой свечи
+    with open(file_path, 'rb') as f:
+        header = f.readline()
+        f.seek(state['input_offset'])
+        tail_bytes = f.read()
+    if not tail_bytes.strip():
+        return False
+
+    tail = pd.read_csv(io.BytesIO(header + tail_bytes), parse_dates=['time'])
+    instrument.count("bars_read", len(tail))
+    tail.rename(columns={'time': 'timestamp'}, inplace=True)
+    if (tail.empty or str(tail['timestamp'].iloc[0]) != state['last_timestamp']
+            or not tail['timestamp'].is_monotonic_increasing):
+        return False
+
+    output_offset = last_line_offset(output_file)
+    if output_offset is None:
+        return False
+
+    params = state['params']
+    tail['close'] = tail['close'].ffill().fillna(state['prev_close'])
+    volume = tail['volume'].to_numpy() if 'volume' in tail.columns else None
+
+    # Последнюю свечу считаем отдельно: состояние сохраняем до неё
+    committed, new_state = fold_state(state, tail['close'].iloc[:-1], None if volume is None else volume[:-1],
+                                      **params)
+    last, _ = fold_state(new_state, tail['close'].iloc[-1:], None if volume is None else volume[-1:], **params)
+    for column, values in committed.items():
+        tail[column] = list(values) + list(last[column])
+
+    replace_tail(output_file, output_offset, tail[INDICATOR_COLUMNS].to_csv(index=False, header=False))
+
+    new_state.update({
+        'last_timestamp': str(tail['timestamp'].iloc[-1]),
+        'input_offset': state['input_offset'] + last_line_offset_in(tail_bytes),
+    })
+    save_state(state_path(output_file), new_state)
+    print(f"Дописано свечей: {len(tail) - 1} → {output_file}")
+    return True
+
+
+def update_indicators(file_path, output_file, rsi_period=RSI_PERIOD, macd_fast=MACD_FAST,
+                      macd_slow=MACD_SLOW, macd_signal=MACD_SIGNAL, cache=None):
+    """Дописывает индикаторы для новых свечей, а если это невозможно — считает файл целиком."""
+    if os.path.exists(output_file) and not is_store(file_path) and not is_store(output_file):
+        state = load_state(state_path(output_file))
+        params = indicator_params(rsi_period, macd_fast, macd_slow, macd_signal)
+        if state is not None and state.get('params') == params:
+            if append_new_candles(file_path, output_file, state):
+                return
+    calculate_and_save_indicators(file_path, output_file, rsi_period, macd_fast, macd_slow, macd_signal,
+                                  cache=cache)
+
+
+def process_file(file_path, output_dir, rsi_period=RSI_PERIOD, macd_fast=MACD_FAST, macd_slow=MACD_SLOW,
+                 macd_signal=MACD_SIGNAL, cache=None):
+    """
+    update_indicators для одного файла со свечами; результат пишется в
+    output_dir под тем же именем. Для executor.map_files: возвращает попадания
+    и промахи кеша этого вызова (hits, misses). Считаются они на копии cache,
+    а сам cache не меняется — при jobs=1 это объект вызывающего, и прирост
+    иначе учитывался бы дважды.
+    """
+    output_file = table_path(output_dir, table_name(file_path))
+    if cache is not None:
+        cache = copy.copy(cache)
+        cache.hits = cache.misses = 0
+    update_indicators(file_path, output_file, rsi_period, macd_fast, macd_slow, macd_signal, cache=cache)
+    if cache is None:
+        return 0, 0
+    return cache.hits, cache.misses
+
+
+def compute_directory(input_dir=None, output_dir=None, rsi_period=RSI_PERIOD, macd_fast=MACD_FAST,
+                      macd_slow=MACD_SLOW, macd_signal=MACD_SIGNAL, jobs=None, cache=None):
+    """
+    Индикаторы для всех таблиц со свечами input_dir (CSV или .npcols; по
+    умолчанию store.candles_dir) в output_dir (по умолчанию input_dir/rsi_macd).
+    cache по умолчанию — дисковый IndicatorCache с настройками из окружения.
+
+    Таблицы, индикаторы которых по каталогу контрактов посчитаны по тем же
+    свечам с теми же параметрами и с тех пор не менялись, пропускаются.
+    """
+    input_dir = input_dir or candles_dir()
+    output_dir = output_dir or os.path.join(input_dir, INDICATORS_SUBDIR)
+    os.makedirs(output_dir, exist_ok=True)
+    cache = cache if cache is not None else IndicatorCache()
+    params = indicator_params(rsi_period, macd_fast, macd_slow, macd_signal)
+
+    with instrument.section("catalog"):
+        candles = catalog.refresh(input_dir, full=True, jobs=jobs)
+    indicators = catalog.load_catalog(output_dir)
+    files = []
+    for file_path in list_tables(input_dir):
+        name = table_name(file_path)
+        if not catalog.up_to_date(indicators.get(name), table_path(output_dir, name), candles[name]["digest"], params):
+            files.append(file_path)
+    before = {table_name(path): catalog.table_stamp(table_path(output_dir, table_name(path))) for path in files}
+    if len(files) < len(candles):
+        print(f"Индикаторы актуальны, пропущено таблиц: {len(candles) - len(files)}")
+
+    with instrument.section("compute"):
+        results = map_files(process_file, files, jobs=jobs, args=(output_dir,),
+                            kwargs={"rsi_period": rsi_period, "macd_fast": macd_fast, "macd_slow": macd_slow,
+                                    "macd_signal": macd_signal, "cache": cache})
+    for r in results:
+        if r.result is not None:
+            cache.hits += r.result[0]
+            cache.misses += r.result[1]
+            name = table_name(r.path)
+            output_file = table_path(output_dir, name)
+            # Если посчитать не удалось, таблица не переписана и остаётся устаревшей
+            if os.path.exists(output_file) and catalog.table_stamp(output_file) != before[name]:
+                indicators[name] = catalog.describe(output_file, candles[name]["ticker"],
+                                                    source_digest=candles[name]["digest"], params=params)
+    if results:
+        catalog.save_catalog(output_dir, indicators)
+    report_errors(results)
+
+    cache.report()
@@ -0,0 +1,305 @@
+"""Расчёт RSI/MACD и флага возможности торговли can_trade.
+
+Общие функции для скрипта индикаторов и перебора параметров: работают с
+массивами close/volume одного контракта и возвращают массивы NumPy.
+
+Расчёт по умолчанию — собственные ядра NumPy (zrsimacd.kernels). pandas_ta
+остаётся эталонной реализацией: ZRSIMACD_INDICATORS=pandas_ta (нужен
+установленный pandas-ta, pip install zrsimacd[reference]).
+
+Сделки у двух расчётов совпадают не везде. На свечах без изменения цены
+(обычное дело для цен на сетке шага фьючерса) RSI ядер точно равен
+предыдущему, и сравнение «RSI вырос/упал» на такой ничьей сигнала не даёт;
+у pandas_ta там отличие в последнем бите, и исход решает округление. На
+цене с шагом сетки это несколько процентов сигналов (ядра дают меньше), так
+что смена ZRSIMACD_INDICATORS меняет сделки. Расхождения — только на барах
+с ничьей RSI в окне сигнала (см. benchmarks/bench_indicators.py).
+"""
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from zrsimacd import kernels
+
+# Настройки индикаторов по умолчанию
+RSI_PERIOD = 20
+MACD_FAST = 15
+MACD_SLOW = 30
+MACD_SIGNAL = 10
+
+# Торговля разрешена с третьей из 3 подряд свечей с volume > 1000
+VOLUME_THRESHOLD = 1000
+VOLUME_RUN = 3
+
+BACKENDS = ("numpy", "pandas_ta")
+
+
+def backend():
+    name = os.getenv("ZRSIMACD_INDICATORS", "numpy")
+    if name not in BACKENDS:
+        raise ValueError(f"Неизвестный расчёт индикаторов ZRSIMACD_INDICATORS={name}, ожидается один из {BACKENDS}")
+    return name
+
+
+def _pandas_ta():
+    try:
+        import pandas_ta
+    except ImportError as e:
+        raise ImportError("Для ZRSIMACD_INDICATORS=pandas_ta нужен пакет pandas-ta "
+                          "(pip install zrsimacd[reference])") from e
+    return pandas_ta
+
+
+def rsi(close, period=RSI_PERIOD):
+    """RSI Уайлдера (как pandas_ta.rsi); NaN, если данных меньше period."""
+    if backend() == "numpy":
+        return kernels.rsi(close, period)
+    result = _pandas_ta().rsi(pd.Series(close, dtype=np.float64), length=period)
+    if result is None:
+        return np.full(len(close), np.nan)
+    return result.to_numpy()
+
+
+def ema(close, length):
+    """EMA с затравкой SMA (как pandas_ta.ema и внутри pandas_ta.macd)."""
+    if backend() == "numpy":
+        return kernels.ema(close, length)
+    result = _pandas_ta().ema(pd.Series(close, dtype=np.float64), length=length)
+    if result is None:
+        return np.full(len(close), np.nan)
+    return result.to_numpy()
+
+
+def macd_from_emas(fast_ema, slow_ema, signal=MACD_SIGNAL):
+    """
+    MACD и сигнальная линия по готовым быстрой и медленной EMA.
+
+    Повторяет pandas_ta.macd: сигнальная EMA считается с первого валидного
+    значения MACD. Позволяет переиспользовать одну EMA во многих комбинациях.
+    """
+    macd_line = np.asarray(fast_ema) - np.asarray(slow_ema)
+    signal_line = np.full(len(macd_line), np.nan)
+    valid = np.flatnonzero(~np.isnan(macd_line))
+    if len(valid):
+        start = valid[0]
+        signal_line[start:] = ema(macd_line[start:], signal)
+    return macd_line, signal_line
+
+
+def macd(close, fast=MACD_FAST, slow=MACD_SLOW, signal=MACD_SIGNAL):
+    """MACD и сигнальная линия (как pandas_ta.macd); None, если данных меньше max(fast, slow, signal)."""
+    if len(close) < max(fast, slow, signal):
+        return None
+    if backend() == "numpy":
+        return kernels.macd(np.asarray(close, dtype=np.float64), fast, slow, signal)
+    result = _pandas_ta().macd(pd.Series(close, dtype=np.float64), fast=fast, slow=slow, signal=signal)
+    if result is None:
+        return None
+    fast, slow = min(fast, slow), max(fast, slow)
+    macd_column = f"MACD_{fast}_{slow}_{signal}"
+    signal_column = f"MACDs_{fast}_{slow}_{signal}"
+    return result[macd_column].to_numpy(), result[signal_column].to_numpy()
+
+
+def can_trade_flags(volume, threshold=VOLUME_THRESHOLD, run=VOLUME_RUN):
+    """
+    Флаг can_trade (int8): 0 до первой серии из run свечей подряд с volume > threshold,
+    1 начиная с последней свечи этой серии и до конца.
+    """
+    volume = np.asarray(volume, dtype=np.float64)
+    n = len(volume)
+    flags = np.zeros(n, dtype=np.int8)
+    if n < run:
+        return flags
+
+    above = volume > threshold
+    window_ok = above[:n - run + 1].copy()
+    for k in range(1, run):
+        window_ok &= above[k:n - run + 1 + k]
+
+    if window_ok.any():
+        flags[window_ok.argmax() + run - 1:] = 1
+    return flags
+
+
+# === Инкрементальный расчёт для дописанных свечей ===
+#
+# Состояние хранит всё, что нужно для продолжения расчёта с того же места:
+# средние Уайлдера для RSI (как в pandas_ta.rsi — ewm с adjust=True, поэтому
+# вместе со средними хранится накопленный вес), быструю/медленную/сигнальную
+# EMA и состояние флага can_trade. Состояние фиксируется ДО последнего
+# учтённого бара: последняя свеча часто ещё не закрыта и при следующей
+# загрузке приходит обновлённой, поэтому её всегда пересчитываем.
+
+STATE_VERSION = 2
+
+
+def state_path(output_file):
+    """Файл состояния рядом с выходным CSV индикаторов."""
+    return os.path.splitext(output_file)[0] + ".state.json"
+
+
+def load_state(path):
+    try:
+        with open(path, "r") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get("version") != STATE_VERSION:
+        return None
+    return state
+
+
+def save_state(path, state):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def _float_or_none(value):
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+def build_state(close, volume, fast_ema, slow_ema, signal_line, rsi_period, bars, rsi_line=None):
+    """
+    Состояние после первых bars баров по уже рассчитанным рядам.
+    rsi_line нужен, чтобы на барах без изменения цены продолжить тем же
+    значением RSI, что и полный расчёт (см. kernels.rsi).
+
+    Возвращает None, если EMA ещё не прогреты — тогда дописывать нельзя,
+    нужен полный пересчёт.
+    """
+    if bars < 2:
+        return None
+    close = np.asarray(close, dtype=np.float64)
+    last = bars - 1
+    values = (fast_ema[last], slow_ema[last], signal_line[last])
+    if any(np.isnan(v) for v in values):
+        return None
+
+    # Средние RSI по тем же формулам, что pandas_ta (без min_periods)
+    delta = pd.Series(close[:bars]).diff()
+    alpha = 1.0 / rsi_period
+    pos_avg = delta.clip(lower=0).ewm(alpha=alpha).mean().iloc[-1]
+    neg_avg = delta.clip(upper=0).ewm(alpha=alpha).mean().iloc[-1]
+    rsi_obs = bars - 1
+    rsi_weight = (1 - (1 - alpha) ** rsi_obs) / alpha
+
+    flags = can_trade_flags(volume[:bars]) if volume is not None else np.zeros(bars, dtype=np.int8)
+    volume_run = 0
+    if volume is not None:
+        above = np.asarray(volume[:bars], dtype=np.float64) > VOLUME_THRESHOLD
+        while volume_run < VOLUME_RUN and volume_run < bars and above[last - volume_run]:
+            volume_run += 1
+
+    return {
+        "version": STATE_VERSION,
+        "bars": int(bars),
+        "prev_close": float(close[last]),
+        "rsi_pos_avg": _float_or_none(pos_avg),
+        "rsi_neg_avg": _float_or_none(neg_avg),
+        "rsi_weight": float(rsi_weight),
+        "rsi_obs": int(rsi_obs),
+        "rsi_last": None if rsi_line is None else _float_or_none(rsi_line[last]),
+        "ema_fast": float(values[0]),
+        "ema_slow": float(values[1]),
+        "ema_signal": float(values[2]),
+        "can_trade": int(flags[last]),
+        "volume_run": int(volume_run),
+    }
+
+
+def fold_state(state, close, volume, rsi_period=RSI_PERIOD, macd_fast=MACD_FAST, macd_slow=MACD_SLOW,
+               macd_signal=MACD_SIGNAL):
+    """
+    Досчитывает индикаторы для новых баров за O(len(close)).
+
+    Возвращает (columns, new_state), где columns — словарь массивов
+    RSI, MACD, Signal, MACD_Diff, can_trade для новых баров.
+    """
+    if macd_slow < macd_fast:
+        macd_fast, macd_slow = macd_slow, macd_fast
+    close = np.asarray(close, dtype=np.float64)
+    n = len(close)
+
+    alpha_rsi = 1.0 / rsi_period
+    alpha_fast = 2.0 / (macd_fast + 1)
+    alpha_slow = 2.0 / (macd_slow + 1)
+    alpha_signal = 2.0 / (macd_signal + 1)
+
+    prev_close = state["prev_close"]
+    pos_avg = state["rsi_pos_avg"] or 0.0
+    neg_avg = state["rsi_neg_avg"] or 0.0
+    weight = state["rsi_weight"]
+    obs = state["rsi_obs"]
+    last_rsi = state.get("rsi_last")
+    ema_fast = state["ema_fast"]
+    ema_slow = state["ema_slow"]
+    ema_signal = state["ema_signal"]
+    can_trade = state["can_trade"]
+    volume_run = state["volume_run"]
+
+    out_rsi = np.empty(n)
+    out_macd = np.empty(n)
+    out_signal = np.empty(n)
+    out_can_trade = np.empty(n, dtype=np.int8)
+
+    for i in range(n):
+        price = close[i]
+
+        delta = price - prev_close
+        decayed = (1 - alpha_rsi) * weight
+        pos_avg = (decayed * pos_avg + max(delta, 0.0)) / (decayed + 1)
+        neg_avg = (decayed * neg_avg + min(delta, 0.0)) / (decayed + 1)
+        weight = decayed + 1
+        obs += 1
+        denom = pos_avg + abs(neg_avg)
+        if delta == 0 and obs > rsi_period and last_rsi is not None:
+            out_rsi[i] = last_rsi
+        else:
+            out_rsi[i] = 100 * pos_avg / denom if obs >= rsi_period and denom != 0 else np.nan
+        last_rsi = None if np.isnan(out_rsi[i]) else float(out_rsi[i])
+
+        ema_fast = (1 - alpha_fast) * ema_fast + alpha_fast * price
+        ema_slow = (1 - alpha_slow) * ema_slow + alpha_slow * price
+        macd_value = ema_fast - ema_slow
+        ema_signal = (1 - alpha_signal) * ema_signal + alpha_signal * macd_value
+        out_macd[i] = macd_value
+        out_signal[i] = ema_signal
+
+        if not can_trade and volume is not None:
+            volume_run = volume_run + 1 if volume[i] > VOLUME_THRESHOLD else 0
+            if volume_run >= VOLUME_RUN:
+                can_trade = 1
+        out_can_trade[i] = can_trade
+
+        prev_close = price
+
+    new_state = dict(state)
+    new_state.update({
+        "bars": state["bars"] + n,
+        "prev_close": float(prev_close),
+        "rsi_pos_avg": float(pos_avg),
+        "rsi_neg_avg": float(neg_avg),
+        "rsi_weight": float(weight),
+        "rsi_obs": int(obs),
+        "rsi_last": last_rsi,
+        "ema_fast": float(ema_fast),
+        "ema_slow": float(ema_slow),
+        "ema_signal": float(ema_signal),
+        "can_trade": int(can_trade),
+        "volume_run": int(volume_run),
+    })
+    columns = {
+        'RSI': out_rsi,
+        'MACD': out_macd,
+        'Signal': out_signal,
+        'MACD_Diff': out_macd - out_signal,
+        'can_trade': out_can_trade,
+    }
+    return columns, new_state
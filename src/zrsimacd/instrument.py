@@ -0,0 +1,210 @@
+"""Замеры стадий: время по стадиям и файлам, счётчики, пик памяти и профиль.
+
+Стадия CLI и её крупные части выполняются внутри section(name); разделы
+вкладываются, имя вложенного раздела — через «/» (pipeline/contracts).
+executor.map_files сообщает время каждого файла (file_done), а код стадий
+увеличивает счётчики count(): прочитанные строки таблиц (bars_read),
+сигналы (signals), сделки (trades), запросы к API (api_requests, api_errors,
+candles_fetched). Счётчики файла собираются отдельно (capture_counts) и в
+процессе-воркере возвращаются в основной процесс вместе с результатом.
+
+Пока запись не начата (start), section и file_done ничего не делают, а
+count только прибавляет число в словаре, поэтому вызовы остаются в коде
+всегда. Результаты — JSON lines, по строке на файл и на раздел (zrsimacd
+--metrics FILE или $ZRSIMACD_METRICS), и/или итоговая таблица (--summary).
+С --memory у раздела есть пик памяти, выделенной Python и NumPy в основном
+процессе (tracemalloc; заметно замедляет работу).
+"""
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timezone
+
+COUNTERS = ("bars_read", "signals", "trades", "api_requests", "api_errors", "candles_fetched")
+PROFILE_SORT = ("cumulative", "tottime", "calls")
+SLOWEST_FILES = 5
+
+_counts = Counter()
+_lock = threading.Lock()
+_recorder = None
+
+
+def metrics_file():
+    return os.getenv("ZRSIMACD_METRICS") or None
+
+
+def count(name, n=1):
+    """Прибавляет n к счётчику name (можно из нескольких потоков)."""
+    with _lock:
+        _counts[name] += n
+
+
+def counts():
+    with _lock:
+        return dict(_counts)
+
+
+@contextlib.contextmanager
+def capture_counts():
+    """Счётчики, увеличенные внутри блока, — отдельно от общих; общие при этом не меняются."""
+    global _counts
+    with _lock:
+        saved = _counts
+        captured = _counts = Counter()
+    try:
+        yield captured
+    finally:
+        with _lock:
+            _counts = saved
+
+
+def add_counts(captured):
+    with _lock:
+        _counts.update(captured)
+
+
+class Recorder:
+    """Разделы и файлы одного запуска; события сразу дописываются в output (JSON lines, "-" — stderr)."""
+
+    def __init__(self, output=None, memory=False):
+        self.run = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self.memory = memory
+        self.sections = []
+        self.files = []
+        self._stack = []
+        self._output = None
+        if output:
+            self._output = sys.stderr if output == "-" else open(output, "a")
+
+    def emit(self, event):
+        if self._output is not None:
+            self._output.write(json.dumps({"run": self.run, **event}, ensure_ascii=False) + "\n")
+            self._output.flush()
+
+    def close(self):
+        if self._output is not None and self._output is not sys.stderr:
+            self._output.close()
+        self._output = None
+
+    @contextlib.contextmanager
+    def section(self, name):
+        if self.memory:
+            # Пик до вложенного раздела остаётся за внешним: tracemalloc хранит один пик
+            if self._stack:
+                self._stack[-1]["peak"] = max(self._stack[-1]["peak"], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        path = f"{self._stack[-1]['section']}/{name}" if self._stack else name
+        current = {"event": "section", "section": path, "seconds": None, "files": 0, "counts": {}, "peak": 0}
+        self.sections.append(current)
+        self._stack.append(current)
+        before = counts()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            current["seconds"] = round(time.perf_counter() - started, 6)
+            self._stack.pop()
+            current["counts"] = {k: v - before.get(k, 0) for k, v in counts().items() if v != before.get(k, 0)}
+            peak = current.pop("peak")
+            if self.memory:
+                current["peak_memory_mb"] = round(max(peak, tracemalloc.get_traced_memory()[1]) / 2 ** 20, 3)
+            self.emit(current)
+
+    def file_done(self, path, seconds, file_counts=None, error=False):
+        for s in self._stack:
+            s["files"] += 1
+        event = {"event": "file", "section": self._stack[-1]["section"] if self._stack else None, "path": path,
+                 "seconds": round(seconds, 6), "counts": dict(file_counts or {})}
+        if error:
+            event["error"] = True
+        self.files.append(event)
+        self.emit(event)
+
+
+def start(output=None, memory=False):
+    """Начинает запись замеров; output — файл JSON lines (None — только в памяти)."""
+    global _recorder
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _recorder = Recorder(output, memory)
+    return _recorder
+
+
+def finish(summary=False):
+    """Заканчивает запись; при summary печатает итоговую таблицу. Возвращает Recorder или None."""
+    global _recorder
+    recorder, _recorder = _recorder, None
+    if recorder is None:
+        return None
+    recorder.close()
+    if recorder.memory:
+        tracemalloc.stop()
+    if summary:
+        print_summary(recorder)
+    return recorder
+
+
+def section(name):
+    """Раздел замеров (контекстный менеджер); без start — пустой."""
+    if _recorder is None:
+        return contextlib.nullcontext()
+    return _recorder.section(name)
+
+
+def file_done(path, seconds, file_counts=None, error=False):
+    if _recorder is not None:
+        _recorder.file_done(path, seconds, file_counts, error)
+
+
+def print_summary(recorder):
+    """Таблица разделов в порядке начала: время, число файлов, счётчики, пик памяти; затем самые долгие файлы."""
+    sections = [s for s in recorder.sections if s["seconds"] is not None]
+    if not sections:
+        return
+    seen = {name for s in sections for name in s["counts"]}
+    columns = [c for c in COUNTERS if c in seen] + sorted(seen - set(COUNTERS))
+    width = max(len("раздел"), *(len(s["section"]) for s in sections))
+    header = f"{'раздел':<{width}} {'время, с':>10} {'файлов':>7}" + "".join(f" {c:>15}" for c in columns)
+    if recorder.memory:
+        header += f" {'пик, МБ':>10}"
+    print("\nЗамеры:")
+    print(header)
+    for s in sections:
+        line = f"{s['section']:<{width}} {s['seconds']:>10.3f} {s['files']:>7}"
+        line += "".join(f" {s['counts'].get(c, 0):>15,}" for c in columns)
+        if recorder.memory:
+            line += f" {s['peak_memory_mb']:>10.1f}"
+        print(line)
+
+    slowest = sorted(recorder.files, key=lambda f: f["seconds"], reverse=True)[:SLOWEST_FILES]
+    if slowest:
+        print("Самые долгие файлы:")
+        for f in slowest:
+            print(f"  {f['seconds']:9.3f} с  {f['path']}{'  (ошибка)' if f.get('error') else ''}")
+
+
+@contextlib.contextmanager
+def profile(path, sort="cumulative"):
+    """
+    Выполняет блок под cProfile: в path — статистика, отсортированная по
+    sort, в path.prof — сырые данные для pstats/snakeviz. Профилируется
+    только основной процесс, воркеры map_files — нет (для них --jobs 1).
+    """
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path + ".prof")
+        with open(path, "w") as f:
+            pstats.Stats(profiler, stream=f).sort_stats(sort).print_stats()
+        print(f"Профиль сохранён: {path} (сырые данные: {path}.prof)")
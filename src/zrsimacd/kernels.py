@@ -0,0 +1,165 @@
+"""Ядра RSI/EMA/MACD на NumPy (без pandas и pandas_ta).
+
+Повторяют формулы pandas_ta 0.3.14b, которые использовались раньше:
+    rsi  — средние Уайлдера: ewm(alpha=1/period, adjust=True) приростов и
+           падений, первые period значений — NaN;
+    ema  — первое значение равно SMA первых length цен, дальше
+           ewm(span=length, adjust=False);
+    macd — разница быстрой и медленной EMA, сигнальная EMA считается с
+           первого валидного значения MACD.
+
+Все функции принимают одномерный массив цен или двумерный (ряды × бары) и
+период — число или последовательность (по одному на ряд). Одномерные цены с
+последовательностью периодов дают по ряду на каждый период, так что много
+контрактов одинаковой длины или много периодов считаются одним вызовом.
+Цены должны быть без пропусков (в скриптах они заполняются ffill/bfill).
+
+Отличие от pandas_ta намеренное: на баре без изменения цены rsi возвращает
+ровно предыдущее значение (у pandas_ta — с ошибкой округления). Значения
+совпадают в пределах округления, но сигналы на ничьих RSI — нет: на ценах с
+шагом сетки ядра дают на несколько процентов меньше сигналов, чем pandas_ta
+(см. zrsimacd.indicators).
+
+Рекуррентность y[i] = decay * y[i-1] + x[i] считается блоками: внутри блока
+это кумулятивная сумма x[j] / decay**j, поэтому цикл Python идёт не по барам,
+а по блокам длиной до _MAX_BLOCK.
+"""
+import math
+
+import numpy as np
+
+_MAX_BLOCK = 1024
+# Ограничение на decay**-block, чтобы не выйти за диапазон float64
+_MAX_EXP = 300.0
+
+
+def _batch(values, param):
+    """Приводит цены к (ряды × бары), а параметр — к массиву по рядам."""
+    values = np.asarray(values, dtype=np.float64)
+    params = np.atleast_1d(np.asarray(param))
+    if values.ndim == 1:
+        if np.ndim(param) == 0:
+            return values[None, :], params, True
+        return np.broadcast_to(values, (len(params), len(values))), params, False
+    return values, np.broadcast_to(params, (values.shape[0],)), False
+
+
+def _unbatch(result, squeeze):
+    return result[0] if squeeze else result
+
+
+def linear_filter(x, decay, initial=None):
+    """
+    y[..., i] = decay * y[..., i-1] + x[..., i] по последней оси, y[..., -1] = initial (0).
+    decay — число или массив по рядам, значения в [0, 1].
+    """
+    x = np.asarray(x, dtype=np.float64)
+    decay = np.asarray(decay, dtype=np.float64)[..., None]
+    shape = np.broadcast_shapes(x.shape, decay.shape)
+    x = np.broadcast_to(x, shape)
+    n = shape[-1]
+    out = np.empty(shape)
+    carry = np.zeros(shape[:-1]) if initial is None else np.broadcast_to(np.asarray(initial, np.float64), shape[:-1])
+    if n == 0:
+        return out
+
+    smallest = float(decay.min()) if decay.size else 1.0
+    if smallest <= 0.0:
+        # decay = 0 (период 1): деление на decay**j невозможно, считаем по барам
+        for i in range(n):
+            carry = decay[..., 0] * carry + x[..., i]
+            out[..., i] = carry
+        return out
+
+    block = _MAX_BLOCK if smallest >= 1.0 else max(1, min(_MAX_BLOCK, int(_MAX_EXP / -math.log(smallest))))
+    steps = np.arange(min(block, n))
+    grow = decay ** -steps
+    shrink = decay ** steps
+    for start in range(0, n, block):
+        m = min(block, n - start)
+        sums = np.cumsum(x[..., start:start + m] * grow[..., :m], axis=-1)
+        out[..., start:start + m] = shrink[..., :m] * (decay * carry[..., None] + sums)
+        carry = out[..., start + m - 1]
+    return out
+
+
+def rsi(close, period):
+    """RSI Уайлдера; NaN для первых period баров."""
+    close, periods, squeeze = _batch(close, period)
+    rows, n = close.shape
+    periods = periods.astype(np.float64)
+    result = np.full((rows, n), np.nan)
+    if n < 2:
+        return _unbatch(result, squeeze)
+
+    delta = np.diff(close, axis=-1)
+    decay = 1.0 - 1.0 / periods
+    # Средние = суммы / общий вес; вес одинаков у приростов и падений и в RSI сокращается
+    gains = linear_filter(np.maximum(delta, 0.0), decay)
+    losses = linear_filter(np.minimum(delta, 0.0), decay)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        result[:, 1:] = 100 * gains / (gains + np.abs(losses))
+    bars = np.arange(n)[None, :]
+    result[bars < periods[:, None]] = np.nan
+
+    # На баре без изменения цены обе средние уменьшаются в одно и то же число
+    # раз, и RSI точно равен предыдущему. Берём предыдущее значение, а не
+    # пересчитанное с ошибкой округления: иначе сравнение «RSI вырос» на таких
+    # барах решал бы последний бит. Сигналы поэтому отличаются от pandas_ta
+    # на ничьих RSI (см. описание модуля).
+    recompute = np.ones((rows, n), dtype=bool)
+    recompute[:, 1:] = (delta != 0) | (bars[:, 1:] <= periods[:, None])
+    source = np.maximum.accumulate(np.where(recompute, bars, 0), axis=1)
+    result = np.take_along_axis(result, source, axis=1)
+    return _unbatch(result, squeeze)
+
+
+def _ema_rows(values, lengths, starts):
+    """
+    EMA каждого ряда начиная с бара starts[i]: на баре starts + length - 1 —
+    SMA первых length значений, раньше — NaN.
+    """
+    rows, n = values.shape
+    lengths = lengths.astype(np.int64)
+    seed_at = starts + lengths - 1
+    result = np.full((rows, n), np.nan)
+    valid = seed_at < n
+    if not valid.any():
+        return result
+
+    alpha = 2.0 / (lengths + 1)
+    x = values * alpha[:, None]
+    columns = np.arange(n)[None, :]
+    x[columns < seed_at[:, None]] = 0.0
+    for length in np.unique(lengths[valid]):
+        for start in np.unique(starts[valid & (lengths == length)]):
+            group = np.flatnonzero(valid & (lengths == length) & (starts == start))
+            x[group, start + length - 1] = values[group, start:start + length].mean(axis=1)
+    result[:] = linear_filter(x, 1.0 - alpha)
+    result[columns < seed_at[:, None]] = np.nan
+    result[~valid] = np.nan
+    return result
+
+
+def ema(close, length):
+    """EMA с затравкой SMA (как pandas_ta.ema)."""
+    close, lengths, squeeze = _batch(close, length)
+    return _unbatch(_ema_rows(close, lengths, np.zeros(len(lengths), dtype=np.int64)), squeeze)
+
+
+def macd(close, fast, slow, signal):
+    """
+    Линии MACD и сигнальная (macd, signal). fast, slow и signal — числа или
+    последовательности по рядам; если slow < fast, они меняются местами.
+    """
+    scalar = all(np.ndim(p) == 0 for p in (fast, slow, signal))
+    fast, slow, signal = np.broadcast_arrays(*(np.atleast_1d(np.asarray(p)) for p in (fast, slow, signal)))
+    close, fast, squeeze = _batch(close, fast[0] if scalar else fast)
+    rows = close.shape[0]
+    fast, slow, signal = (np.broadcast_to(p, (rows,)).astype(np.int64) for p in (fast, slow, signal))
+    fast, slow = np.minimum(fast, slow), np.maximum(fast, slow)
+    zero = np.zeros(rows, dtype=np.int64)
+
+    macd_line = _ema_rows(close, fast, zero) - _ema_rows(close, slow, zero)
+    signal_line = _ema_rows(macd_line, signal, slow - 1)
+    return _unbatch(macd_line, squeeze), _unbatch(signal_line, squeeze)
@@ -0,0 +1,110 @@
+"""Метрики модели фиксированного капитала на массивах сделок.
+
+Те же формулы, что в generate_report: число контрактов
+floor(капитал / (entry_price / плечо)), equity = капитал + накопленная
+прибыль, Sharpe по процентному изменению equity, максимальная просадка и
+profit factor. Работают с массивами NumPy, поэтому годятся для перебора
+тысяч комбинаций параметров.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+INITIAL_CAPITAL = 500000
+LEVERAGE = 4.5
+
+NS_PER_DAY = 86_400 * 10**9
+
+
+def fixed_profits(entry_price, exit_price, direction, initial_capital=INITIAL_CAPITAL, leverage=LEVERAGE):
+    """Прибыль сделок в модели фиксированного капитала (direction: 1 — BUY, -1 — SELL)."""
+    entry_price = np.asarray(entry_price, dtype=np.float64)
+    exit_price = np.asarray(exit_price, dtype=np.float64)
+    profit_per_contract = np.where(np.asarray(direction) > 0, exit_price - entry_price, entry_price - exit_price)
+    collateral = entry_price / leverage
+    contracts = np.floor(initial_capital / collateral)
+    return contracts * profit_per_contract
+
+
+def reinvest_profits(entry_price, exit_price, direction, initial_capital=INITIAL_CAPITAL, leverage=LEVERAGE):
+    """
+    Прибыль и equity сделок в модели реинвестирования: число контрактов
+    считается от текущего капитала, поэтому сделки идут по одной.
+    """
+    entry_price = np.asarray(entry_price, dtype=np.float64)
+    exit_price = np.asarray(exit_price, dtype=np.float64)
+    profit_per_contract = np.where(np.asarray(direction) > 0, exit_price - entry_price, entry_price - exit_price)
+    collateral = entry_price / leverage
+    profits = np.empty(len(entry_price))
+    equity = np.empty(len(entry_price))
+    # Рекуррентность по капиталу не векторизуется; цикл по числам Python, без pandas
+    capital = initial_capital
+    for i, (margin, per_contract) in enumerate(zip(collateral.tolist(), profit_per_contract.tolist())):
+        profit = math.floor(capital / margin) * per_contract
+        capital += profit
+        profits[i] = profit
+        equity[i] = capital
+    return profits, equity
+
+
+def max_drawdown(equity):
+    """Максимальная просадка ряда equity в абсолютном выражении."""
+    equity = np.asarray(equity, dtype=np.float64)
+    if len(equity) == 0:
+        return float('nan')
+    return float((np.maximum.accumulate(equity) - equity).max())
+
+
+def equity_stats(profits, initial_capital=INITIAL_CAPITAL):
+    """
+    Итоговые метрики по упорядоченному во времени ряду прибылей сделок:
+    num_trades, total_profit, final_equity, sharpe, max_drawdown, profit_factor.
+    """
+    profits = np.asarray(profits, dtype=np.float64)
+    equity = initial_capital + np.cumsum(profits)
+
+    returns = equity[1:] / equity[:-1] - 1
+    returns = returns[~np.isnan(returns)]
+    std = returns.std(ddof=1) if len(returns) > 1 else float('nan')
+    sharpe = returns.mean() / std if std != 0 and len(returns) > 1 else float('nan')
+
+    total_gain = profits[profits > 0].sum()
+    total_loss = abs(profits[profits < 0].sum())
+    profit_factor = total_gain / total_loss if total_loss != 0 else float('inf')
+
+    return {
+        'num_trades': len(profits),
+        'total_profit': float(profits.sum()),
+        'final_equity': float(equity[-1]) if len(equity) else float(initial_capital),
+        'sharpe': float(sharpe),
+        'max_drawdown': max_drawdown(equity),
+        'profit_factor': float(profit_factor),
+    }
+
+
+def ticker_priority(tickers):
+    """
+    Ранг каждого тикера для отбора «одна сделка в день» как в generate_report:
+    сначала больший номер контракта (числовой тикер), затем тикер по убыванию.
+    Меньший ранг — выше приоритет.
+    """
+    tickers = pd.Series(tickers, dtype=object)
+    frame = pd.DataFrame({'ticker': tickers, 'ticker_numeric': pd.to_numeric(tickers, errors='coerce')})
+    ordered = frame.sort_values(['ticker_numeric', 'ticker'], ascending=[False, False], kind='stable')
+    rank = np.empty(len(frame), dtype=np.int64)
+    rank[ordered.index.to_numpy()] = np.arange(len(frame))
+    return rank
+
+
+def nondup_order(entry_time_ns, priority):
+    """
+    Индексы сделок модели без дубликатов по дате: по одной сделке на
+    календарный день (самый приоритетный тикер, при равенстве — самая ранняя),
+    в порядке дат.
+    """
+    entry_time_ns = np.asarray(entry_time_ns, dtype=np.int64)
+    day = entry_time_ns // NS_PER_DAY
+    order = np.lexsort((entry_time_ns, np.asarray(priority), day))
+    _, first = np.unique(day[order], return_index=True)
+    return order[first]
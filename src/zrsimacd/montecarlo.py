@@ -0,0 +1,207 @@
+"""Монте-Карло по последовательности сделок (zrsimacd report --montecarlo N).
+
+Прибыль сделок из отчёта перемешивается (permute — та же выборка в другом
+порядке) или выбирается с возвращением (bootstrap), и по каждой из N
+синтетических последовательностей строятся equity моделей фиксированного
+капитала и реинвестирования — по тем же формулам, что в generate_report.
+По путям считаются распределения итоговой equity, максимальной просадки и
+Sharpe.
+
+Пути пачки идут по сделкам одновременно: на каждом шаге все пути пачки
+берут по сделке (векторы длиной в пачку), а итоговая equity, просадка и
+суммы доходностей для Sharpe накапливаются на ходу. Матрица (сделки × пути)
+не строится; для permute хранится только перестановка пачки (Фишер — Йейтс,
+по строке на шаг), её объём ограничен CHUNK_BYTES. Поэтому 100 тыс. путей
+по тысячам сделок укладываются в секунды и в десятки мегабайт.
+"""
+import numpy as np
+import pandas as pd
+
+from zrsimacd.metrics import INITIAL_CAPITAL, LEVERAGE
+from zrsimacd.tradestore import as_trade_store
+
+METHODS = ("bootstrap", "permute")
+# Путей в пачке: векторы шага пачки (по 8 байт на путь) остаются в кеше процессора
+PATH_CHUNK = 16384
+# Путей в пачке permute: перестановка пачки (сделки × пути) остаётся в кеше процессора;
+# CHUNK_BYTES — предел её объёма при большом числе сделок
+PERMUTE_CHUNK = 4096
+CHUNK_BYTES = 64 * 2**20
+PERCENTILES = (5, 25, 50, 75, 95)
+METRICS = ("final_equity", "max_drawdown", "sharpe")
+MONTECARLO_FILE = "montecarlo.csv"
+
+
+def trade_arrays(trades):
+    """Цены входа и прибыль на контракт сделок в порядке entry_time, как в generate_report."""
+    df = as_trade_store(trades).to_frame(['direction', 'entry_time', 'entry_price', 'exit_price'])
+    df = df.sort_values('entry_time').reset_index(drop=True)
+    entry_price = df['entry_price'].to_numpy(dtype=np.float64)
+    exit_price = df['exit_price'].to_numpy(dtype=np.float64)
+    per_contract = np.where(df['direction'].to_numpy() == 'BUY', exit_price - entry_price, entry_price - exit_price)
+    return entry_price, per_contract
+
+
+class _PathStats:
+    """
+    Equity пачки путей, которая меняется по шагу (очередная сделка) за раз,
+    и её итоговая equity, максимальная просадка и Sharpe. Доходность шага —
+    изменение equity к equity до него; доходности для Sharpe суммируются со
+    сдвигом на первую доходность пути, чтобы дисперсия по суммам не теряла
+    точность.
+    """
+
+    def __init__(self, size, initial_capital):
+        self.steps = 0
+        self.equity = np.full(size, float(initial_capital))
+        self.peak = np.full(size, -np.inf)
+        self.max_drawdown = np.zeros(size)
+        self.shift = np.zeros(size)
+        self.total = np.zeros(size)
+        self.squares = np.zeros(size)
+        self.buffer = np.empty(size)
+
+    def add(self, change):
+        if self.steps:
+            # Первая доходность — между первой и второй сделкой, как в generate_report
+            returns = np.divide(change, self.equity, out=self.buffer)
+            if self.steps == 1:
+                self.shift[:] = returns
+            returns -= self.shift
+            self.total += returns
+            returns *= returns
+            self.squares += returns
+        self.equity += change
+        np.maximum(self.peak, self.equity, out=self.peak)
+        np.maximum(self.max_drawdown, np.subtract(self.peak, self.equity, out=self.buffer), out=self.max_drawdown)
+        self.steps += 1
+
+    def result(self):
+        n = self.steps - 1
+        sharpe = np.full(len(self.equity), np.nan)
+        if n > 1:
+            shifted_mean = self.total / n
+            std = np.sqrt(np.maximum(self.squares - self.total * shifted_mean, 0.0) / (n - 1))
+            np.divide(shifted_mean + self.shift, std, out=sharpe, where=std != 0)
+        return {'final_equity': self.equity.copy(), 'max_drawdown': self.max_drawdown, 'sharpe': sharpe}
+
+
+def _paths(fixed, collateral, per_contract, rows, size, initial_capital):
+    """
+    Метрики обеих моделей для size путей: rows — номера сделок всех путей на
+    очередном шаге (массив длины size за шаг, например строки матрицы
+    сделки × пути).
+    """
+    stats = {'fixed': _PathStats(size, initial_capital), 'reinvest': _PathStats(size, initial_capital)}
+    reinvest = stats['reinvest']
+    contracts = np.empty(size)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for trade in rows:
+            stats['fixed'].add(fixed.take(trade))
+            # Число контрактов зависит от текущего капитала
+            np.floor(np.divide(reinvest.equity, collateral.take(trade), out=contracts), out=contracts)
+            contracts *= per_contract.take(trade)
+            reinvest.add(contracts)
+        return {model: path_stats.result() for model, path_stats in stats.items()}
+
+
+def _pick_rows(rng, n_trades, size, method):
+    """
+    Номера сделок size путей по шагам. bootstrap — с возвращением; permute —
+    перестановка Фишера — Йейтса по каждому пути: на шаге i выбирается
+    одна из ещё не взятых сделок, так что за n_trades шагов каждый путь
+    проходит все сделки по разу.
+    """
+    if method == "bootstrap":
+        for _ in range(n_trades):
+            yield rng.integers(0, n_trades, size)
+        return
+    # Ещё не взятые сделки путей: строки 0..last, столбец — путь; плоские индексы быстрее двумерных
+    dtype = np.int16 if n_trades <= np.iinfo(np.int16).max else np.int32
+    remaining = np.repeat(np.arange(n_trades, dtype=dtype)[:, None], size, axis=1)
+    flat = remaining.reshape(-1)
+    columns = np.arange(size)
+    for last in range(n_trades - 1, -1, -1):
+        cells = rng.integers(0, last + 1, size)
+        cells *= size
+        cells += columns
+        trade = flat.take(cells)
+        # На место взятой сделки — последняя из ещё не взятых
+        flat[cells] = remaining[last]
+        yield trade
+
+
+def simulate(entry_price, per_contract, n_paths, method="bootstrap", initial_capital=INITIAL_CAPITAL,
+             leverage=LEVERAGE, seed=None, chunk_bytes=CHUNK_BYTES):
+    """
+    N путей для обеих моделей. Возвращает {'fixed': {метрика: массив N},
+    'reinvest': {...}}.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Неизвестный метод {method}, ожидается один из {METHODS}")
+    entry_price = np.asarray(entry_price, dtype=np.float64)
+    per_contract = np.asarray(per_contract, dtype=np.float64)
+    n_trades = len(entry_price)
+    collateral = entry_price / leverage
+    # Модель фиксированного капитала: прибыль сделки не зависит от порядка
+    fixed = np.floor(initial_capital / collateral) * per_contract
+
+    rng = np.random.default_rng(seed)
+    chunk = PATH_CHUNK
+    if method == "permute":
+        chunk = max(1, min(chunk, chunk_bytes // (4 * max(n_trades, 1)), PERMUTE_CHUNK))
+    results = {model: {name: np.empty(n_paths) for name in METRICS} for model in ("fixed", "reinvest")}
+    for start in range(0, n_paths, chunk):
+        size = min(chunk, n_paths - start)
+        rows = _pick_rows(rng, n_trades, size, method)
+        for model, stats in _paths(fixed, collateral, per_contract, rows, size, initial_capital).items():
+            for name in METRICS:
+                results[model][name][start:start + size] = stats[name]
+    return results
+
+
+def summarize(results, observed=None):
+    """Таблица распределений: модель, метрика, среднее, перцентили и (если есть) исходное значение."""
+    rows = []
+    for model, stats in results.items():
+        for name in METRICS:
+            values = stats[name]
+            valid = values[~np.isnan(values)]
+            row = {'model': model, 'metric': name}
+            if observed is not None:
+                row['observed'] = observed[model][name]
+            row['mean'] = valid.mean() if len(valid) else np.nan
+            for p, value in zip(PERCENTILES, np.percentile(valid, PERCENTILES) if len(valid) else
+                                [np.nan] * len(PERCENTILES)):
+                row[f'p{p}'] = value
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def simulate_order(entry_price, per_contract, initial_capital=INITIAL_CAPITAL, leverage=LEVERAGE):
+    """Метрики обеих моделей для сделок в исходном порядке (один путь)."""
+    picks = np.arange(len(entry_price))[:, None]
+    collateral = np.asarray(entry_price, dtype=np.float64) / leverage
+    fixed = np.floor(initial_capital / collateral) * per_contract
+    stats = _paths(fixed, collateral, per_contract, picks, 1, initial_capital)
+    return {model: {k: float(v[0]) for k, v in values.items()} for model, values in stats.items()}
+
+
+def run_montecarlo(trades, n_paths, method="bootstrap", seed=None, initial_capital=INITIAL_CAPITAL,
+                   output_file=MONTECARLO_FILE):
+    """Распределения метрик по N путям; печатает таблицу и сохраняет её в output_file."""
+    if not trades:
+        print("Сделок не найдено.")
+        return None
+    entry_price, per_contract = trade_arrays(trades)
+    # Исходный порядок — путь «как в отчёте» для сравнения
+    observed = simulate_order(entry_price, per_contract, initial_capital)
+    results = simulate(entry_price, per_contract, n_paths, method, initial_capital, seed=seed)
+    table = summarize(results, observed)
+
+    print(f"\n=== Монте-Карло: {n_paths:,} путей ({method}), сделок: {len(entry_price):,} ===")
+    print(table.to_string(index=False, float_format=lambda x: f"{x:,.4f}"))
+    table.to_csv(output_file, index=False, float_format='%.4f')
+    print(f"Распределения сохранены в: {output_file}")
+    return table
+
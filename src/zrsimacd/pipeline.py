@@ -0,0 +1,151 @@
+"""Все стадии одним процессом (zrsimacd pipeline).
+
+fetch → порядок контрактов → индикаторы → analyze → report без
+промежуточных CSV: свечи каждого контракта читаются один раз, индикаторы и
+сделки передаются в памяти, а на диск пишутся только запрошенные результаты
+(write): индикаторы, отчёты analyze и/или отчёт по сделкам. Записанные
+индикаторы попадают в каталог контрактов (zrsimacd.catalog).
+
+Контракты, как после zrsimacd futures, получают тикеры 1, 2, ... в порядке
+даты последней свечи, но сами файлы свечей не переименовываются (иначе
+следующий fetch не нашёл бы уже загруженные данные).
+
+С source_interval свечи загружаются с этим (более мелким) интервалом, а
+свечи interval строятся из них локально (zrsimacd.resample).
+"""
+import os
+
+from zrsimacd import catalog, instrument
+from zrsimacd.executor import map_files, report_errors
+from zrsimacd.indicator_files import INDICATOR_COLUMNS, compute_indicators, indicator_params
+from zrsimacd.indicators import MACD_FAST, MACD_SIGNAL, MACD_SLOW, RSI_PERIOD
+from zrsimacd.metrics import INITIAL_CAPITAL
+from zrsimacd.reports import FIXED_FILE, NONDUP_FIXED_FILE, QUARTERLY_FIXED_FILE, REINVEST_FILE, generate_report
+from zrsimacd.resample import check_timeframes, resample_directory
+from zrsimacd.store import (candles_dir, data_dir, default_interval, indicators_dir, list_tables, read_table,
+                            table_name, table_path, write_table)
+from zrsimacd.strategy import load_strategy
+from zrsimacd.trades import REPORT_FILE, frame_trades, save_trade_report
+from zrsimacd.tradestore import TradeStore
+
+OUTPUTS = ("indicators", "analyze", "report")
+DEFAULT_OUTPUTS = ("analyze", "report")
+
+
+def contract_trades(file_path, rsi_period=RSI_PERIOD, macd_fast=MACD_FAST, macd_slow=MACD_SLOW,
+                    macd_signal=MACD_SIGNAL, keep_indicators=False, strategy=None):
+    """
+    Свечи одного контракта → индикаторы → сделки.
+
+    Возвращает (время последней свечи, сделки, таблица индикаторов или None).
+    Таблица возвращается только при keep_indicators, чтобы не гонять её между
+    процессами без надобности. Тикер в сделках — имя файла.
+    """
+    print(f"Обработка файла: {file_path}")
+    candles = read_table(file_path)
+    if candles.empty or 'time' not in candles.columns:
+        return None, TradeStore(), None
+    last_time = candles['time'].max()
+
+    data = compute_indicators(candles, rsi_period, macd_fast, macd_slow, macd_signal, source=file_path)
+    if data is None:
+        return last_time, TradeStore(), None
+    data = data[INDICATOR_COLUMNS]
+    trades = frame_trades(data, table_name(file_path), source=file_path, strategy=strategy)
+    return last_time, trades, data if keep_indicators else None
+
+
+def expiry_names(contracts):
+    """
+    Имена контрактов по порядку закрытия, как у zrsimacd futures: 1, 2, ...
+    contracts — [(имя, время последней свечи)]; без свечей имя не меняется.
+    """
+    dated = sorted((c for c in contracts if c[1] is not None), key=lambda c: c[1])
+    names = {name: str(i) for i, (name, _) in enumerate(dated, start=1)}
+    return {name: names.get(name, name) for name, _ in contracts}
+
+
+def run_pipeline(root=None, interval=None, fetch=True, full=False, tickers_file=None,
+                 rsi_period=RSI_PERIOD, macd_fast=MACD_FAST, macd_slow=MACD_SLOW, macd_signal=MACD_SIGNAL,
+                 initial_capital=INITIAL_CAPITAL, write=DEFAULT_OUTPUTS, output_dir=None, jobs=None,
+                 source_interval=None, strategy=None):
+    """
+    Стадии от загрузки до отчётов в одном процессе. Свечи — в
+    root/<interval> (root по умолчанию — store.data_dir, interval —
+    store.default_interval); индикаторы при write, содержащем "indicators", —
+    в root/<interval>/rsi_macd, отчёты — в output_dir (по умолчанию текущий
+    каталог). При source_interval загружаются свечи root/<source_interval>,
+    а свечи interval строятся из них. Сделки — по правилам strategy
+    (zrsimacd.strategy). Возвращает сделки (TradeStore).
+    """
+    root = root or data_dir()
+    interval = interval or default_interval()
+    if source_interval == interval:
+        source_interval = None
+    if source_interval:
+        check_timeframes(source_interval, interval)
+    strategy = load_strategy(strategy)
+    unknown = set(write) - set(OUTPUTS)
+    if unknown:
+        raise ValueError(f"Неизвестные результаты {sorted(unknown)}, ожидаются из {OUTPUTS}")
+
+    if fetch:
+        from zrsimacd.fetcher import fetch_all
+        with instrument.section("fetch"):
+            fetch_all(root, tickers_file=tickers_file, intervals=[source_interval or interval], full=full)
+    if source_interval:
+        with instrument.section("resample"):
+            resample_directory(candles_dir(root, source_interval), candles_dir(root, interval), interval, jobs=jobs)
+
+    keep_indicators = "indicators" in write
+    if keep_indicators:
+        # Для каталога индикаторов: тикер и хеш свечей каждого контракта
+        candles = catalog.refresh(candles_dir(root, interval), full=True, jobs=jobs)
+        indicators = catalog.load_catalog(indicators_dir(root, interval))
+    with instrument.section("contracts"):
+        results = map_files(contract_trades, list_tables(candles_dir(root, interval)), jobs=jobs,
+                            kwargs={"rsi_period": rsi_period, "macd_fast": macd_fast, "macd_slow": macd_slow,
+                                    "macd_signal": macd_signal, "keep_indicators": keep_indicators,
+                                    "strategy": strategy})
+    report_errors(results)
+    results = [r for r in results if r.result is not None]
+    names = expiry_names([(table_name(r.path), r.result[0]) for r in results])
+
+    # Сделки — в порядке файлов каталога индикаторов, как их собрал бы analyze
+    all_trades = TradeStore()
+    for r in sorted(results, key=lambda r: names[table_name(r.path)]):
+        name = names[table_name(r.path)]
+        _, trades, data = r.result
+        trades.rename_tickers({table_name(r.path): name})
+        all_trades.extend(trades)
+        if data is not None:
+            output_file = table_path(indicators_dir(root, interval), name)
+            os.makedirs(os.path.dirname(output_file), exist_ok=True)
+            write_table(data, output_file)
+            print(f"Сохранено: {output_file}")
+            source = candles[table_name(r.path)]
+            indicators[name] = catalog.describe(
+                output_file, source["ticker"], source_digest=source["digest"],
+                params=indicator_params(rsi_period, macd_fast, macd_slow, macd_signal))
+    if keep_indicators and results:
+        catalog.save_catalog(indicators_dir(root, interval), indicators)
+
+    def output(file_name):
+        return os.path.join(output_dir, file_name) if output_dir else file_name
+
+    if output_dir and ("analyze" in write or "report" in write):
+        os.makedirs(output_dir, exist_ok=True)
+    if "analyze" in write:
+        with instrument.section("analyze"):
+            generate_report(
+                all_trades,
+                fixed_output_file=output(FIXED_FILE),
+                reinvest_output_file=output(REINVEST_FILE),
+                nondup_fixed_output_file=output(NONDUP_FIXED_FILE),
+                quarterly_fixed_file=output(QUARTERLY_FIXED_FILE),
+                initial_capital=initial_capital,
+            )
+    if "report" in write and all_trades:
+        with instrument.section("report"):
+            save_trade_report(all_trades, output(REPORT_FILE))
+    return all_trades
@@ -0,0 +1,315 @@
+"""Портфель по всем контрактам с общим капиталом (стадия portfolio).
+
+generate_report считает сделки независимо друг от друга (модель без
+дубликатов лишь оставляет одну сделку в день), а здесь сделки всех
+контрактов идут через один счёт:
+
+  * свечи контрактов сливаются в один поток по времени (heapq.merge по
+    потокам контрактов — в памяти по одной свече на контракт);
+  * на каждой метке времени сначала переоцениваются открытые позиции, затем
+    закрываются выходящие (маржа возвращается, прибыль — в капитал), затем
+    открываются новые;
+  * позиция получает не больше allocation от текущей equity и не больше
+    свободного капитала (equity минус занятая маржа); контрактов —
+    floor(бюджет / (entry_price / плечо)), как в модели фиксированного
+    капитала; если не хватает даже на один — сигнал пропускается;
+  * equity (капитал плюс переоценка открытых позиций) записывается на
+    каждой метке времени по частям через store.TableWriter.
+
+Сигналы и выходы — те же, что у analyze/report (правила
+zrsimacd.strategy), по колонкам таблиц индикаторов без DataFrame на каждый
+бар. Для непрерывного ряда (zrsimacd stitch) сделки считаются в ценах ряда.
+"""
+import heapq
+import itertools
+import math
+import operator
+import os
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from zrsimacd import instrument
+from zrsimacd.executor import map_files, report_errors
+from zrsimacd.metrics import INITIAL_CAPITAL, LEVERAGE
+from zrsimacd.store import TableWriter, indicators_dir, list_tables, read_columns, table_columns, table_name
+from zrsimacd.strategy import DEFAULT_STRATEGY, load_strategy
+from zrsimacd.trades import REQUIRED_COLUMNS
+
+EQUITY_FILE = "portfolio_equity.csv"
+TRADES_FILE = "portfolio_trades.csv"
+# Доля текущей equity, которую может занять одна позиция
+ALLOCATION = 0.1
+# Строк кривой equity в памяти до сброса на диск
+CHUNK = 65536
+# Свечей контракта, переводимых в числа Python за раз: в памяти слияния — столько на каждый контракт
+MERGE_CHUNK = 4096
+TRADE_COLUMNS = ["ticker", "direction", "entry_time", "entry_price", "exit_time", "exit_price", "contracts",
+                 "margin", "profit"]
+
+
+def contract_trades(times, close, rsi, macd_diff, can_trade, strategy=None):
+    """
+    Свечи и сделки одного контракта по возрастанию времени: (times, close,
+    entry_idx, exit_idx, direction), сделки — по бару входа. times — int64 нс.
+    """
+    strategy = strategy or DEFAULT_STRATEGY
+    times = np.asarray(times, dtype=np.int64)
+    order = np.argsort(times, kind="stable") if (times[1:] < times[:-1]).any() else slice(None)
+    times = times[order]
+    close = np.asarray(close, dtype=np.float64)[order]
+    macd_diff = np.asarray(macd_diff, dtype=np.float64)[order]
+    buy, sell = strategy.masks(np.asarray(rsi, dtype=np.float64)[order], macd_diff, np.asarray(can_trade)[order])
+
+    entry_idx = np.concatenate([np.flatnonzero(buy), np.flatnonzero(sell)])
+    direction = np.concatenate([np.ones(buy.sum(), dtype=np.int8), -np.ones(sell.sum(), dtype=np.int8)])
+    _, _, exit_idx = strategy.exits(close, macd_diff, entry_idx, direction)
+    instrument.count("signals", len(entry_idx))
+    by_entry = np.argsort(entry_idx, kind="stable")
+    return times, close, entry_idx[by_entry], exit_idx[by_entry], direction[by_entry]
+
+
+def contract_stream(file_path, strategy=None):
+    """contract_trades по таблице индикаторов; None, если нужных колонок нет. Для executor.map_files."""
+    if not REQUIRED_COLUMNS.issubset(table_columns(file_path)):
+        print(f"Пропущены колонки в файле: {file_path}")
+        return None
+    columns = read_columns(file_path, sorted(REQUIRED_COLUMNS))
+    return contract_trades(columns["timestamp"], columns["close"], columns["RSI"], columns["MACD_Diff"],
+                           columns["can_trade"], strategy)
+
+
+def _bars(times, k):
+    """(время, номер контракта, номер свечи) по порядку; числа Python — по чанку за раз."""
+    for start in range(0, len(times), MERGE_CHUNK):
+        yield from zip(times[start:start + MERGE_CHUNK].tolist(), itertools.repeat(k),
+                       range(start, start + MERGE_CHUNK))
+
+
+class _Position:
+    __slots__ = ("k", "direction", "entry_time", "entry_price", "contracts", "margin")
+
+    def __init__(self, k, direction, entry_time, entry_price, contracts, margin):
+        self.k = k
+        self.direction = direction
+        self.entry_time = entry_time
+        self.entry_price = entry_price
+        self.contracts = contracts
+        self.margin = margin
+
+
+class Portfolio:
+    """
+    Общий счёт: капитал, занятая маржа и переоценка открытых позиций.
+    По каждому контракту хранится только чистая позиция (со знаком) и её
+    стоимость по ценам входа, поэтому переоценка свечи — O(1) при любом
+    числе открытых позиций.
+    """
+
+    def __init__(self, n_contracts, initial_capital=INITIAL_CAPITAL, allocation=ALLOCATION, leverage=LEVERAGE):
+        self.cash = float(initial_capital)
+        self.allocation = allocation
+        self.leverage = leverage
+        self.used_margin = 0.0
+        self.unrealized = 0.0
+        self.open_positions = 0
+        self.net = [0] * n_contracts
+        self.basis = [0.0] * n_contracts
+        self.value = [0.0] * n_contracts
+        self.price = [math.nan] * n_contracts
+
+    @property
+    def equity(self):
+        return self.cash + self.unrealized
+
+    def _revalue(self, k):
+        # При net == 0 встречные позиции закрывают друг друга, и -basis — их
+        # зафиксированный результат: он остаётся в переоценке до закрытия позиций
+        value = self.net[k] * self.price[k] - self.basis[k]
+        self.unrealized += value - self.value[k]
+        self.value[k] = value
+
+    def mark(self, k, price):
+        if not math.isnan(price):
+            self.price[k] = price
+            if self.net[k]:
+                # При нулевой чистой позиции переоценка от цены не зависит
+                self._revalue(k)
+
+    def open(self, k, direction, entry_time, price):
+        """Открывает позицию на бюджет allocation от equity; None, если капитала не хватает на контракт."""
+        margin_per_contract = price / self.leverage
+        budget = min(self.equity * self.allocation, self.equity - self.used_margin)
+        contracts = math.floor(budget / margin_per_contract) if budget > 0 else 0
+        if contracts < 1:
+            return None
+        position = _Position(k, direction, entry_time, price, contracts, contracts * margin_per_contract)
+        self.price[k] = price
+        self.used_margin += position.margin
+        self.open_positions += 1
+        self.net[k] += direction * contracts
+        self.basis[k] += direction * contracts * price
+        self._revalue(k)
+        return position
+
+    def close(self, position, price):
+        """Закрывает позицию по price; возвращает прибыль."""
+        k = position.k
+        profit = position.direction * position.contracts * (price - position.entry_price)
+        self.cash += profit
+        self.used_margin -= position.margin
+        self.open_positions -= 1
+        self.net[k] -= position.direction * position.contracts
+        self.basis[k] -= position.direction * position.contracts * position.entry_price
+        self._revalue(k)
+        if not self.open_positions:
+            # Без позиций переоценка точно нулевая — сбрасываем накопленную ошибку округления
+            self.unrealized = 0.0
+        return profit
+
+
+def _timestamps(ns):
+    return pd.to_datetime(np.asarray(ns, dtype=np.int64), utc=True)
+
+
+def simulate(streams, names, initial_capital=INITIAL_CAPITAL, allocation=ALLOCATION, leverage=LEVERAGE,
+             equity_file=EQUITY_FILE):
+    """
+    Прогоняет потоки контрактов (contract_trades) через общий счёт. Кривая
+    equity по меткам времени пишется в equity_file (если задан). Возвращает
+    (сделки портфеля, итоговые метрики).
+    """
+    portfolio = Portfolio(len(streams), initial_capital, allocation, leverage)
+    next_entry = [0] * len(streams)
+    exits = [{} for _ in streams]
+    trades = []
+    stats = {"signals": sum(len(s[2]) for s in streams), "skipped": 0, "max_open": 0, "max_margin": 0.0,
+             "max_drawdown": 0.0, "points": 0}
+    peak = portfolio.equity
+    curve = {name: array(code) for name, code in (("time", "q"), ("equity", "d"), ("cash", "d"),
+                                                   ("margin", "d"), ("open_positions", "q"))}
+    writer = TableWriter(equity_file) if equity_file else None
+
+    def flush():
+        if writer is not None:
+            chunk = {name: np.frombuffer(values, dtype=values.typecode) for name, values in curve.items()}
+            writer.append(pd.DataFrame({**chunk, "time": _timestamps(chunk["time"])}))
+        for name, values in curve.items():
+            curve[name] = array(values.typecode)
+
+    # Бар следующего входа каждого контракта (-1 — входов больше нет): проверка свечи без обращения к NumPy
+    upcoming = [int(s[2][0]) if len(s[2]) else -1 for s in streams]
+    bars = heapq.merge(*(_bars(s[0], k) for k, s in enumerate(streams)))
+    try:
+        for now, group in itertools.groupby(bars, key=operator.itemgetter(0)):
+            # Переоценка и выходы — за один проход по свечам метки, входы — после всех выходов
+            entering = []
+            for _, k, i in group:
+                if portfolio.net[k]:
+                    portfolio.mark(k, streams[k][1][i])
+                if exits[k] and i in exits[k]:
+                    price = float(streams[k][1][i])
+                    for position in exits[k].pop(i):
+                        profit = portfolio.close(position, price)
+                        trades.append((names[k], position.direction, position.entry_time, position.entry_price,
+                                       now, price, position.contracts, position.margin, profit))
+                if upcoming[k] == i:
+                    entering.append((k, i))
+            for k, i in entering:
+                _, close, entry_idx, exit_idx, direction = streams[k]
+                j = next_entry[k]
+                while j < len(entry_idx) and entry_idx[j] == i:
+                    position = portfolio.open(k, int(direction[j]), now, float(close[i]))
+                    if position is None:
+                        stats["skipped"] += 1
+                    elif exit_idx[j] == i:
+                        # Сигнал на последней свече: выход на ней же, с нулевой прибылью
+                        trades.append((names[k], position.direction, now, position.entry_price, now,
+                                       position.entry_price, position.contracts, position.margin,
+                                       portfolio.close(position, position.entry_price)))
+                    else:
+                        exits[k].setdefault(int(exit_idx[j]), []).append(position)
+                    j += 1
+                next_entry[k] = j
+                upcoming[k] = int(entry_idx[j]) if j < len(entry_idx) else -1
+
+            equity = portfolio.equity
+            peak = max(peak, equity)
+            stats["max_drawdown"] = max(stats["max_drawdown"], peak - equity)
+            stats["max_open"] = max(stats["max_open"], portfolio.open_positions)
+            stats["max_margin"] = max(stats["max_margin"], portfolio.used_margin)
+            stats["points"] += 1
+            for name, value in (("time", now), ("equity", equity), ("cash", portfolio.cash),
+                                ("margin", portfolio.used_margin), ("open_positions", portfolio.open_positions)):
+                curve[name].append(value)
+            if len(curve["time"]) >= CHUNK:
+                flush()
+        flush()
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+    if writer is not None:
+        writer.close()
+
+    # Открытых позиций не остаётся: simulate_exits выходит не дальше последней свечи контракта
+    stats["final_equity"] = portfolio.equity
+    stats["trades"] = len(trades)
+    instrument.count("trades", len(trades))
+    return trades, stats
+
+
+def print_stats(stats, trades, initial_capital):
+    profits = np.array([t[-1] for t in trades], dtype=np.float64)
+    gain = profits[profits > 0].sum()
+    loss = abs(profits[profits < 0].sum())
+    print("\n=== Портфель с общим капиталом ===")
+    print(f"Сигналов: {stats['signals']}, сделок: {stats['trades']}, пропущено (не хватило капитала): "
+          f"{stats['skipped']}")
+    print(f"Суммарная прибыль: {profits.sum():,.2f} руб.")
+    print(f"Итоговая equity: {stats['final_equity']:,.2f} руб. ({stats['final_equity'] / initial_capital - 1:+.2%})")
+    print(f"Max Drawdown (с переоценкой): {stats['max_drawdown']:,.2f} руб.")
+    print(f"Profit Factor: {gain / loss if loss else float('inf'):.4f}")
+    print(f"Одновременно открытых позиций — до {stats['max_open']}, занятой маржи — до "
+          f"{stats['max_margin']:,.2f} руб.; точек кривой equity: {stats['points']:,}")
+
+
+def run_portfolio(input_dir=None, output_dir=None, initial_capital=INITIAL_CAPITAL, allocation=ALLOCATION,
+                  leverage=LEVERAGE, jobs=None, strategy=None):
+    """
+    Стадия portfolio: сделки всех таблиц input_dir (по умолчанию
+    store.indicators_dir) по правилам strategy через общий счёт; кривая
+    equity и сделки портфеля — в output_dir (по умолчанию — текущий).
+    """
+    strategy = load_strategy(strategy)
+    if not 0 < allocation <= 1:
+        raise ValueError(f"allocation должна быть в (0, 1], получено {allocation}")
+
+    def output(name):
+        return os.path.join(output_dir, name) if output_dir else name
+
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with instrument.section("contracts"):
+        results = map_files(contract_stream, list_tables(input_dir or indicators_dir()), jobs=jobs,
+                            kwargs={"strategy": strategy})
+        report_errors(results)
+    loaded = [r for r in results if r.result is not None]
+    if not loaded:
+        print("Сделок не найдено.")
+        return None
+
+    with instrument.section("simulate"):
+        trades, stats = simulate([r.result for r in loaded], [table_name(r.path) for r in loaded],
+                                 initial_capital, allocation, leverage, output(EQUITY_FILE))
+    frame = pd.DataFrame(trades, columns=TRADE_COLUMNS)
+    frame["direction"] = np.where(frame["direction"] > 0, "BUY", "SELL")
+    frame["entry_time"] = _timestamps(frame["entry_time"])
+    frame["exit_time"] = _timestamps(frame["exit_time"])
+    frame.to_csv(output(TRADES_FILE), index=False)
+
+    print_stats(stats, trades, initial_capital)
+    print(f"\nКривая equity сохранена в: {output(EQUITY_FILE)}")
+    print(f"Сделки портфеля сохранены в: {output(TRADES_FILE)}")
+    return stats
@@ -0,0 +1,212 @@
+"""Отчёты стратегии по сделкам (стадия analyze).
+
+generate_report строит модели фиксированного капитала, реинвестирования,
+без дубликатов по дате и квартальную; analyze собирает сделки по каталогу с
+индикаторами и пишет отчёты.
+"""
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from zrsimacd import instrument
+from zrsimacd.metrics import INITIAL_CAPITAL, fixed_profits, max_drawdown, reinvest_profits
+from zrsimacd.store import indicators_dir
+from zrsimacd.strategy import load_strategy
+from zrsimacd.trades import collect_trades
+from zrsimacd.tradestore import as_trade_store
+
+FIXED_FILE = "trades_report_fixed.csv"
+REINVEST_FILE = "trades_report_reinvest.csv"
+NONDUP_FIXED_FILE = "trades_report_fixed_nondup.csv"
+QUARTERLY_FIXED_FILE = "quarterly_fixed.csv"
+
+
+def compute_max_drawdown_from_series(series: pd.Series) -> float:
+    """
+    Для данного ряда значений (equity) считает максимальную просадку (в абсолютном выражении).
+    """
+    running_max = series.cummax()
+    drawdown = running_max - series
+    return float(drawdown.max())
+
+
+def _groups(keys, times):
+    """
+    Группы строк по ключу в порядке возрастания ключа: (ключ, индексы строк).
+    Внутри группы строки упорядочены по times той же сортировкой, что
+    group.sort_values() в pandas (quicksort по исходному порядку строк группы),
+    поэтому при равном времени порядок тот же, что у прежних циклов по groupby.
+    """
+    keys = np.asarray(keys)
+    # Сортировка datetime64 в NumPy идёт другим путём, чем int64 (и иначе
+    # расставляет равные значения), поэтому время сравнивается как datetime64
+    times = np.asarray(times, dtype=np.int64).view('datetime64[ns]')
+    order = np.argsort(keys, kind='stable')
+    starts = np.flatnonzero(np.diff(keys[order])) + 1
+    for rows in np.split(order, starts):
+        yield keys[rows[0]], rows[np.argsort(times[rows], kind='quicksort')]
+
+
+def generate_report(
+        trades,
+        fixed_output_file=FIXED_FILE,
+        reinvest_output_file=REINVEST_FILE,
+        nondup_fixed_output_file=NONDUP_FIXED_FILE,
+        quarterly_fixed_file=QUARTERLY_FIXED_FILE,
+        initial_capital=INITIAL_CAPITAL
+):
+    """
+    Генерирует четыре отчёта:
+      1. Fixed Capital Model.
+      2. Reinvestment Model.
+      3. Fixed Capital Model без дубликатов по дате.
+      4. Quarterly Fixed Capital Model (CSV с квартальной статистикой).
+
+    Теперь в квартальном отчёте вместо max_profit выводится общая сумма profit за квартал.
+    """
+    if not trades:
+        print("Сделок не найдено.")
+        return
+
+    # Собираем все сделки (TradeStore или список словарей) в DataFrame и сортируем по entry_time
+    df = as_trade_store(trades).to_frame()
+    df['entry_time'] = pd.to_datetime(df['entry_time'])
+    df['exit_time'] = pd.to_datetime(df['exit_time'])
+    df = df.sort_values('entry_time').reset_index(drop=True)
+
+    # --- 1) Fixed Capital Model ---
+    entry_price = df['entry_price'].to_numpy(dtype=np.float64)
+    exit_price = df['exit_price'].to_numpy(dtype=np.float64)
+    direction = np.where(df['direction'].to_numpy() == 'BUY', 1, -1)
+    df['fixed_profit'] = fixed_profits(entry_price, exit_price, direction, initial_capital)
+    df['fixed_cum_profit'] = df['fixed_profit'].cumsum()
+    df['fixed_equity'] = initial_capital + df['fixed_cum_profit']
+    df['fixed_return'] = df['fixed_equity'].pct_change()
+
+    # --- 2) Reinvestment Model ---
+    df['reinvest_profit'], df['reinvest_equity'] = reinvest_profits(entry_price, exit_price, direction,
+                                                                    initial_capital)
+    df['reinvest_return'] = df['reinvest_equity'].pct_change()
+
+    # --- 3) Fixed Capital Model без дубликатов по дате ---
+    df['trade_date'] = df['entry_time'].dt.date
+    df['ticker_numeric'] = pd.to_numeric(df['ticker'], errors='coerce')
+
+    df_sorted = df.sort_values(
+        ['trade_date', 'ticker_numeric', 'ticker'],
+        ascending=[True, False, False]
+    )
+    df_nondup = df_sorted.drop_duplicates(subset='trade_date', keep='first').copy()
+    df_nondup.drop(columns=['ticker_numeric'], inplace=True)
+
+    # Вновь пересчитаем equity для nondup
+    df_nondup['fixed_cum_profit'] = df_nondup['fixed_profit'].cumsum()
+    df_nondup['fixed_equity'] = initial_capital + df_nondup['fixed_cum_profit']
+    df_nondup['fixed_return'] = df_nondup['fixed_equity'].pct_change()
+
+    # Метрики для nondup
+    nondup_valid_returns = df_nondup['fixed_return'].dropna()
+    nondup_sharpe = (
+        nondup_valid_returns.mean() / nondup_valid_returns.std()
+        if nondup_valid_returns.std() != 0 else float('nan')
+    )
+    nondup_rolling_max = df_nondup['fixed_equity'].cummax()
+    nondup_drawdown = nondup_rolling_max - df_nondup['fixed_equity']
+    nondup_max_drawdown = float(nondup_drawdown.max())
+    nondup_total_profit = df_nondup[df_nondup['fixed_profit'] > 0]['fixed_profit'].sum()
+    nondup_total_loss = abs(df_nondup[df_nondup['fixed_profit'] < 0]['fixed_profit'].sum())
+    nondup_profit_factor = (
+        nondup_total_profit / nondup_total_loss
+        if nondup_total_loss != 0 else float('inf')
+    )
+
+    # Годовой обзор для nondup
+    df_nondup['year'] = df_nondup['entry_time'].dt.year
+    nondup_annual = []
+    nondup_times = df_nondup['entry_time'].to_numpy(dtype=np.int64)
+    nondup_equity = df_nondup['fixed_equity'].to_numpy()
+    nondup_profit = df_nondup['fixed_profit'].to_numpy()
+    for year, rows in _groups(df_nondup['year'].to_numpy(), nondup_times):
+        group_eq = nondup_equity[rows] - nondup_equity[rows[0]]
+        nondup_annual.append({
+            'year': year,
+            'num_trades': len(rows),
+            'total_profit': float(nondup_profit[rows].sum()),
+            'max_drawdown': max_drawdown(group_eq)
+        })
+
+    # --- 4) Quarterly Fixed Capital Model ---
+    # equity-кривая для Fixed по времени выхода: кварталы — по exit_time
+    exit_times = df['exit_time']
+    equity = df['fixed_equity'].to_numpy()
+    profit = df['fixed_profit'].to_numpy()
+    quarter_key = exit_times.dt.year.to_numpy(dtype=np.int64) * 4 + exit_times.dt.quarter.to_numpy() - 1
+    quarterly_rows = []
+    for key, rows in _groups(quarter_key, exit_times.to_numpy(dtype=np.int64)):
+        quarterly_rows.append({
+            'year': key // 4,
+            'quarter': key % 4 + 1,
+            'num_trades': len(rows),  # число сделок (точек equity) в этом квартале
+            'balance_end': float(equity[rows[-1]]),
+            'profit': float(profit[np.sort(rows)].sum()),  # ИТОГОВАЯ прибыль за квартал
+            'max_drawdown': max_drawdown(equity[rows])
+        })
+
+    quarterly_df = pd.DataFrame(quarterly_rows)
+    quarterly_df.sort_values(['year', 'quarter'], inplace=True)
+
+    # Сохраняем quarterly_df в отдельный файл
+    quarterly_df.to_csv(quarterly_fixed_file, index=False, float_format='%.2f')
+
+    # ========== ПЕЧАТЬ РЕЗУЛЬТАТОВ В КОНСОЛЬ ==========
+    print("\n=== Fixed Capital Model без дубликатов по дате ===")
+    print(f"Общее число сделок: {len(df_nondup)}")
+    print(f"Суммарная прибыль: {df_nondup['fixed_profit'].sum():,.2f} руб.")
+    print(f"Итоговая equity: {df_nondup['fixed_equity'].iloc[-1]:,.2f} руб.")
+    print(f"Sharpe Ratio: {nondup_sharpe:.4f}")
+    print(f"Max Drawdown: {nondup_max_drawdown:,.2f} руб.")
+    print(f"Profit Factor: {nondup_profit_factor:.4f}")
+    print("Годовой анализ (nondup):")
+    for ann in sorted(nondup_annual, key=lambda x: x['year']):
+        print(
+            f"  {ann['year']}: {ann['num_trades']} сделок, "
+            f"прибыль {ann['total_profit']:,.2f} руб., "
+            f"макс. просадка {ann['max_drawdown']:,.2f} руб."
+        )
+
+    print(f"\nОтчёт nondup сохранён в: {nondup_fixed_output_file}")
+    # Сохраняем три CSV, как было до этого
+    df.to_csv(fixed_output_file, index=False)
+    print(f"Fixed Capital Model сохранён в: {fixed_output_file}")
+    # Обе модели — одна и та же таблица: форматируем её в CSV один раз
+    if os.path.abspath(reinvest_output_file) != os.path.abspath(fixed_output_file):
+        shutil.copyfile(fixed_output_file, reinvest_output_file)
+    print(f"Reinvestment Model сохранён в: {reinvest_output_file}")
+    print(f"Quarterly Fixed Model сохранён в: {quarterly_fixed_file}")
+
+
+def analyze(input_dir=None, output_dir=None, initial_capital=INITIAL_CAPITAL, jobs=None, strategy=None):
+    """
+    Стадия analyze: сделки по всем файлам input_dir (по умолчанию
+    store.indicators_dir) по правилам strategy (zrsimacd.strategy) и отчёты
+    в output_dir (по умолчанию — текущий).
+    """
+    strategy = load_strategy(strategy)
+    def output(name):
+        return os.path.join(output_dir, name) if output_dir else name
+
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with instrument.section("trades"):
+        trades = collect_trades(input_dir or indicators_dir(), jobs=jobs, strategy=strategy)
+    with instrument.section("report"):
+        generate_report(
+            trades,
+            fixed_output_file=output(FIXED_FILE),
+            reinvest_output_file=output(REINVEST_FILE),
+            nondup_fixed_output_file=output(NONDUP_FIXED_FILE),
+            quarterly_fixed_file=output(QUARTERLY_FIXED_FILE),
+            initial_capital=initial_capital,
+        )
@@ -0,0 +1,185 @@
+"""Свечи старших таймфреймов из младших (стадия resample).
+
+История загружается из API один раз — с самым мелким нужным интервалом, —
+а более крупные свечи строятся локально: open — первой свечи периода,
+high/low — максимум/минимум, close — последней, volume — сумма. Свечи
+контракта раскладываются по периодам за один векторный проход (границы
+периодов — одним сравнением соседних меток, агрегаты — ufunc.reduceat), без
+groupby.
+
+Таймфрейм — имя каталога интервала «<число>_<единица>» (15_min, 1_hour,
+4_hour, 1_day); период не длиннее суток и делит их нацело. Периоды
+отсчитываются от начала торгового дня срочного рынка Мосбиржи — 19:00
+предыдущего дня (вечерняя сессия относится к следующему торговому дню):
+4-часовые свечи начинаются в 19, 23, 3, 7, 11 и 15 часов, как 4-часовые
+свечи API, а дневная свеча — весь торговый день вместе с вечерней сессией
+накануне; торговый день субботы и воскресенья (вечер пятницы) относится к
+понедельнику. Внутридневная свеча помечена началом периода, дневная — датой
+торгового дня. Время в таблицах уже московское (fetcher сдвигает его при
+загрузке), поэтому границы считаются прямо по нему, а для таблиц с другим
+часовым поясом — по местному времени этого пояса.
+
+Каталог производного интервала ведётся как для индикаторов: в записи —
+хеш исходной таблицы и параметры, неизменившиеся таблицы при повторном
+запуске пропускаются. Индикаторы, analyze и report по производному
+интервалу — обычные стадии с zrsimacd --interval <таймфрейм>.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from zrsimacd import catalog
+from zrsimacd.executor import map_files, report_errors
+from zrsimacd.store import candles_dir, default_interval, list_tables, read_table, table_name, table_path, write_table
+
+UNITS = {"min": 60 * 10**9, "hour": 3600 * 10**9, "day": 86400 * 10**9}
+DAY_NS = UNITS["day"]
+# Начало торгового дня срочного рынка (МСК); после полудня — накануне торгового дня
+SESSION_START = "19:00"
+CANDLE_COLUMNS = ("time", "open", "high", "low", "close", "volume")
+_UNIT_NS = {"s": 10**9, "ms": 10**6, "us": 10**3, "ns": 1}
+
+
+def timeframe_ns(name):
+    """Длительность таймфрейма «<число>_<единица>» в наносекундах."""
+    count, _, unit = name.partition("_")
+    if not count.isdigit() or unit not in UNITS:
+        raise ValueError(f"Неизвестный таймфрейм {name}, ожидается <число>_<единица>, единица из {tuple(UNITS)}")
+    period = int(count) * UNITS[unit]
+    if period <= 0 or DAY_NS % period:
+        raise ValueError(f"Таймфрейм {name} должен делить сутки нацело")
+    return period
+
+
+def check_timeframes(source, target):
+    """Свечи target строятся из source: период target — кратный и больший период source."""
+    source_ns, target_ns = timeframe_ns(source), timeframe_ns(target)
+    if target_ns <= source_ns or target_ns % source_ns:
+        raise ValueError(f"Таймфрейм {target} нельзя получить из {source}: нужен кратный и больший период")
+
+
+def session_start_ns(text):
+    """«ЧЧ:ММ» → смещение от полуночи в наносекундах."""
+    hours, minutes = (int(part) for part in text.split(":"))
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"Некорректное начало торгового дня {text}, ожидается ЧЧ:ММ")
+    return (hours * 60 + minutes) * UNITS["min"]
+
+
+def period_starts(wall, period, session_start=SESSION_START):
+    """
+    Метка периода для каждой свечи по её местному времени wall (int64 нс):
+    начало периода для внутридневных таймфреймов, полночь даты торгового
+    дня — для дневного.
+    """
+    offset = session_start_ns(session_start)
+    if period < DAY_NS:
+        return (wall - offset) // period * period + offset
+    # Торговый день, начавшийся после полудня, — следующий календарный
+    day = (wall - offset) // DAY_NS + (offset >= DAY_NS // 2)
+    # 1970-01-01 — четверг: (day + 3) % 7 — день недели, 0 — понедельник
+    weekday = (day + 3) % 7
+    day += np.where(weekday == 5, 2, 0) + np.where(weekday == 6, 1, 0)
+    return day * DAY_NS
+
+
+def resample_columns(columns, timeframe, session_start=SESSION_START):
+    """
+    Колонки свечей {"time": int64 нс местного времени по возрастанию, open,
+    high, low, close[, volume]} → такие же колонки таймфрейма timeframe.
+    Остальные колонки отбрасываются.
+    """
+    columns = {name: np.asarray(columns[name]) for name in CANDLE_COLUMNS if name in columns}
+    period = timeframe_ns(timeframe)
+    if not len(columns["time"]):
+        return columns
+    labels = period_starts(columns["time"], period, session_start)
+    first = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    last = np.r_[first[1:] - 1, len(labels) - 1]
+
+    result = {
+        "time": labels[first],
+        "open": columns["open"][first],
+        # fmax/fmin пропускают NaN, как max/min в pandas
+        "high": np.fmax.reduceat(columns["high"], first),
+        "low": np.fmin.reduceat(columns["low"], first),
+        "close": columns["close"][last],
+    }
+    if "volume" in columns:
+        result["volume"] = np.add.reduceat(columns["volume"], first)
+    return result
+
+
+def resample_frame(data, timeframe, session_start=SESSION_START):
+    """Таблица свечей (колонка time) → таблица свечей таймфрейма timeframe с тем же часовым поясом."""
+    times = pd.DatetimeIndex(data["time"])
+    tz = times.tz
+    # Для UTC (время fetcher — московское с меткой UTC) местное время — те же числа, без пересчёта.
+    # Единицу времени (pandas читает CSV не в нс) переводим умножением — as_unit для tz-aware заметно дольше
+    local = tz is not None and str(tz) != "UTC"
+    wall = (times.tz_localize(None) if local else times).asi8 * _UNIT_NS[times.unit]
+    columns = {name: data[name].to_numpy() for name in CANDLE_COLUMNS[1:] if name in data.columns}
+    if len(wall) and (wall[1:] < wall[:-1]).any():
+        order = np.argsort(wall, kind="stable")
+        wall = wall[order]
+        columns = {name: values[order] for name, values in columns.items()}
+    result = resample_columns({"time": wall, **columns}, timeframe, session_start)
+    labels = pd.DatetimeIndex(result.pop("time").view("datetime64[ns]"))
+    if tz is not None:
+        labels = labels.tz_localize(tz) if local else labels.tz_localize("UTC").tz_convert(tz)
+    return pd.DataFrame({"time": labels, **result}, copy=False)
+
+
+def resample_file(file_path, output_dir, timeframe, session_start=SESSION_START):
+    """Свечи одного файла в таблицу output_dir/<то же имя>; для executor.map_files. Возвращает число свечей."""
+    data = read_table(file_path, mmap=False)
+    frame = resample_frame(data, timeframe, session_start)
+    output_file = table_path(output_dir, table_name(file_path))
+    write_table(frame, output_file)
+    print(f"{file_path}: свечей {len(data)} → {len(frame)} ({timeframe}), сохранено: {output_file}")
+    return len(frame)
+
+
+def resample_directory(input_dir, output_dir, timeframe, session_start=SESSION_START, jobs=None):
+    """
+    Свечи таймфрейма timeframe для всех таблиц input_dir в output_dir. Таблицы,
+    которые по каталогу output_dir уже построены из тех же свечей с теми же
+    параметрами, пропускаются. Возвращает число построенных таблиц.
+    """
+    timeframe_ns(timeframe)
+    session_start_ns(session_start)
+    os.makedirs(output_dir, exist_ok=True)
+    params = {"timeframe": timeframe, "session_start": session_start}
+
+    candles = catalog.refresh(input_dir, full=True, jobs=jobs)
+    derived = catalog.load_catalog(output_dir)
+    files = [path for path in list_tables(input_dir)
+             if not catalog.up_to_date(derived.get(table_name(path)), table_path(output_dir, table_name(path)),
+                                       candles[table_name(path)]["digest"], params)]
+    if len(files) < len(candles):
+        print(f"Свечи {timeframe} актуальны, пропущено таблиц: {len(candles) - len(files)}")
+
+    results = map_files(resample_file, files, jobs=jobs, args=(output_dir, timeframe, session_start))
+    for r in results:
+        if r.result is not None:
+            name = table_name(r.path)
+            derived[name] = catalog.describe(table_path(output_dir, name), candles[name]["ticker"],
+                                             source_digest=candles[name]["digest"], params=params)
+    if results:
+        catalog.save_catalog(output_dir, derived)
+    report_errors(results)
+    return sum(r.result is not None for r in results)
+
+
+def resample(targets, source=None, root=None, session_start=SESSION_START, jobs=None):
+    """
+    Стадия resample: свечи интервала source (по умолчанию —
+    store.default_interval) корня данных root → каталоги интервалов targets
+    того же корня.
+    """
+    source = source or default_interval()
+    for target in targets:
+        check_timeframes(source, target)
+    for target in targets:
+        resample_directory(candles_dir(root, source), candles_dir(root, target), target, session_start, jobs)
@@ -0,0 +1,112 @@
+"""Векторизованный поиск сигналов RSI/MACD.
+
+Те же условия, что и в построчных check_buy_signals / check_sell_signals:
+
+  * BUY  — RSI растёт 4 бара подряд (все 4 предыдущих значения меньше
+    текущего), MACD_Diff > 0, а 4 предыдущих MACD_Diff < 0;
+  * SELL — зеркально;
+  * сигнал учитывается только при can_trade == 1.
+
+Окно из lookback + 1 баров сравнивается целиком массивами NumPy, поэтому
+весь ряд обрабатывается за один проход без обращений к data.iloc. Число
+сравниваемых баров RSI и MACD_Diff, монотонность RSI, знак текущего
+MACD_Diff и фильтр can_trade настраиваются (правила zrsimacd.strategy);
+значения по умолчанию — условия выше.
+"""
+import numpy as np
+
+from zrsimacd import instrument
+
+LOOKBACK = 4
+DIRECTIONS = ("both", "buy", "sell")
+
+
+def signal_masks(rsi, macd_diff, can_trade, lookback=LOOKBACK, rsi_bars=None, rsi_monotonic=False, macd_bars=None,
+                 macd_cross=True, liquidity=True, directions="both"):
+    """
+    Возвращает две булевы маски (buy, sell) длины len(rsi).
+
+    Для BUY (SELL — зеркально): RSI текущего бара выше каждого из rsi_bars
+    предыдущих (при rsi_monotonic — растёт на каждом из rsi_bars шагов),
+    rsi_bars предыдущих MACD_Diff < 0 (macd_bars) и текущий MACD_Diff > 0
+    (macd_cross), can_trade == 1 (liquidity). rsi_bars и macd_bars — не
+    больше lookback, по умолчанию равны ему; сигналы — начиная с бара lookback.
+    directions — both, buy или sell: маска другого направления пустая.
+
+    Сравнения с NaN дают False, как и в исходных циклах, поэтому бары
+    прогрева индикаторов сигналов не дают.
+    """
+    rsi_bars = lookback if rsi_bars is None else rsi_bars
+    macd_bars = lookback if macd_bars is None else macd_bars
+    if not (0 <= rsi_bars <= lookback and 0 <= macd_bars <= lookback):
+        raise ValueError(f"rsi_bars ({rsi_bars}) и macd_bars ({macd_bars}) должны быть от 0 до lookback ({lookback})")
+    if directions not in DIRECTIONS:
+        raise ValueError(f"Неизвестное directions {directions}, ожидается одно из {DIRECTIONS}")
+    rsi = np.asarray(rsi, dtype=np.float64)
+    macd_diff = np.asarray(macd_diff, dtype=np.float64)
+    n = len(rsi)
+
+    buy = np.zeros(n, dtype=bool)
+    sell = np.zeros(n, dtype=bool)
+    if n <= lookback:
+        return buy, sell
+
+    # Текущие значения окна [i - lookback, i] для всех i >= lookback
+    cur_rsi = rsi[lookback:]
+    cur_macd = macd_diff[lookback:]
+
+    rsi_up = np.ones(n - lookback, dtype=bool)
+    rsi_down = np.ones(n - lookback, dtype=bool)
+    macd_neg = np.ones(n - lookback, dtype=bool)
+    macd_pos = np.ones(n - lookback, dtype=bool)
+
+    # Каждый сдвиг k — это один столбец скользящего окна
+    for k in range(1, max(rsi_bars, macd_bars) + 1):
+        if k <= rsi_bars:
+            prev_rsi = rsi[lookback - k:n - k]
+            # Монотонный рост — сравнение с соседним более поздним баром, иначе — с текущим
+            later_rsi = rsi[lookback - k + 1:n - k + 1] if rsi_monotonic else cur_rsi
+            rsi_up &= prev_rsi < later_rsi
+            rsi_down &= prev_rsi > later_rsi
+        if k <= macd_bars:
+            prev_macd = macd_diff[lookback - k:n - k]
+            macd_neg &= prev_macd < 0
+            macd_pos &= prev_macd > 0
+
+    buy[lookback:] = rsi_up & macd_neg
+    sell[lookback:] = rsi_down & macd_pos
+    if macd_cross:
+        buy[lookback:] &= cur_macd > 0
+        sell[lookback:] &= cur_macd < 0
+    if liquidity:
+        tradable = np.asarray(can_trade)[lookback:] == 1
+        buy[lookback:] &= tradable
+        sell[lookback:] &= tradable
+    if directions != "both":
+        (sell if directions == "buy" else buy)[:] = False
+    return buy, sell
+
+
+def find_signals(data, lookback=LOOKBACK, **rules):
+    """
+    Индексы (позиционные) баров с сигналами BUY и SELL для DataFrame с
+    колонками RSI, MACD_Diff и can_trade; rules — остальные параметры
+    signal_masks.
+
+    Если колонки can_trade нет, торговля считается невозможной — как
+    data.iloc[i].get('can_trade', 0) в исходных функциях.
+    """
+    if 'can_trade' in data.columns:
+        can_trade = data['can_trade'].to_numpy()
+    else:
+        can_trade = np.zeros(len(data))
+    buy, sell = signal_masks(
+        data['RSI'].to_numpy(dtype=np.float64),
+        data['MACD_Diff'].to_numpy(dtype=np.float64),
+        can_trade,
+        lookback=lookback,
+        **rules,
+    )
+    buy_idx, sell_idx = np.flatnonzero(buy), np.flatnonzero(sell)
+    instrument.count("signals", len(buy_idx) + len(sell_idx))
+    return buy_idx, sell_idx
@@ -0,0 +1,565 @@
+"""Колоночное хранилище свечей и индикаторов (вместо промежуточных CSV).
+
+Таблица хранится каталогом <имя>.npcols: по одному .npy-файлу на колонку и
+meta.json с порядком колонок и их типами. Время — int64 наносекунды от
+эпохи (часовой пояс записан в meta.json), цены — float64, объём — int64.
+Колонки читаются через np.load(mmap_mode='r'), то есть без разбора текста
+и без копирования.
+
+Все стадии принимают и CSV, и .npcols; формат записи выбирается
+переменной окружения ZRSIMACD_FORMAT (csv — по умолчанию, или npcols).
+
+Раскладка данных общая для всех стадий: <корень>/<интервал>/<тикер> —
+свечи, <корень>/<интервал>/rsi_macd/<тикер> — индикаторы,
+<корень>/<интервал>/continuous/ — непрерывный ряд (zrsimacd stitch).
+Корень задаёт ZRSIMACD_DATA_DIR (по умолчанию GAZPROM_FUTURES), интервал —
+ZRSIMACD_INTERVAL (по умолчанию 4_hour; производные интервалы строит
+zrsimacd resample).
+"""
+import argparse
+import hashlib
+import io
+import itertools
+import json
+import os
+import shutil
+from glob import glob
+
+import numpy as np
+import pandas as pd
+
+from zrsimacd import instrument
+from zrsimacd.cache import file_digest
+from zrsimacd.csvtail import last_line_offset, read_last_line, replace_tail
+
+STORE_SUFFIX = ".npcols"
+CSV_SUFFIX = ".csv"
+FORMATS = ("csv", "npcols")
+STORE_VERSION = 1
+# Строк в части при чтении и слиянии таблиц по частям (iter_table, merge_table)
+MERGE_CHUNK = 65536
+
+# Колонки времени, которые при чтении CSV разбираются как даты
+TIME_COLUMNS = ("time", "timestamp", "entry_time", "exit_time")
+
+# Типы известных колонок при чтении: без угадывания по содержимому CSV, флаги — int8.
+# Цены и индикаторы остаются float64: сигналы сравнивают соседние значения RSI, и float32 менял бы сделки
+COLUMN_DTYPES = {
+    "open": np.float64, "high": np.float64, "low": np.float64, "close": np.float64,
+    "RSI": np.float64, "MACD": np.float64, "Signal": np.float64, "MACD_Diff": np.float64,
+    "can_trade": np.int8,
+}
+
+_META = "meta.json"
+
+DATA_DIR = "GAZPROM_FUTURES"
+INTERVAL = "4_hour"
+INDICATORS_SUBDIR = "rsi_macd"
+CONTINUOUS_SUBDIR = "continuous"
+
+
+def output_format():
+    fmt = os.getenv("ZRSIMACD_FORMAT", "csv")
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат ZRSIMACD_FORMAT={fmt}, ожидается один из {FORMATS}")
+    return fmt
+
+
+def data_dir():
+    """Корень данных: ZRSIMACD_DATA_DIR или DATA_DIR."""
+    return os.getenv("ZRSIMACD_DATA_DIR", DATA_DIR)
+
+
+def default_interval():
+    """Интервал (таймфрейм) стадий: ZRSIMACD_INTERVAL или INTERVAL."""
+    return os.getenv("ZRSIMACD_INTERVAL", INTERVAL)
+
+
+def candles_dir(root=None, interval=None):
+    """Каталог свечей интервала (по умолчанию — default_interval)."""
+    return os.path.join(root or data_dir(), interval or default_interval())
+
+
+def indicators_dir(root=None, interval=None):
+    """Каталог индикаторов интервала."""
+    return os.path.join(candles_dir(root, interval), INDICATORS_SUBDIR)
+
+
+def continuous_dir(root=None, interval=None):
+    """Каталог непрерывного ряда интервала (zrsimacd stitch)."""
+    return os.path.join(candles_dir(root, interval), CONTINUOUS_SUBDIR)
+
+
+def is_store(path):
+    return str(path).endswith(STORE_SUFFIX)
+
+
+def table_name(path):
+    """Имя таблицы без каталога и расширения (тикер или номер контракта)."""
+    name = os.path.basename(str(path).rstrip("/\\"))
+    for suffix in (STORE_SUFFIX, CSV_SUFFIX):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def table_path(directory, name, fmt=None):
+    """Путь таблицы name в каталоге directory в формате fmt (по умолчанию — из окружения)."""
+    fmt = fmt or output_format()
+    return os.path.join(directory, name + (STORE_SUFFIX if fmt == "npcols" else CSV_SUFFIX))
+
+
+def list_tables(directory):
+    """
+    Все таблицы каталога (CSV и .npcols), отсортированные по имени.
+    Если есть оба варианта одной таблицы, берётся более свежий.
+    """
+    tables = {}
+    for path in glob(os.path.join(directory, "*" + CSV_SUFFIX)):
+        tables[table_name(path)] = path
+    for path in glob(os.path.join(directory, "*" + STORE_SUFFIX)):
+        if not os.path.isfile(os.path.join(path, _META)):
+            continue
+        name = table_name(path)
+        if name not in tables or _mtime(path) >= _mtime(tables[name]):
+            tables[name] = path
+    return [tables[name] for name in sorted(tables)]
+
+
+def _mtime(path):
+    return stat_table(path).st_mtime
+
+
+def stat_table(path):
+    """os.stat файла, который переписывается при любой записи таблицы (для .npcols — meta.json)."""
+    return os.stat(os.path.join(path, _META) if is_store(path) else path)
+
+
+def table_columns(path):
+    """Имена колонок таблицы без чтения данных."""
+    if is_store(path):
+        return [c["name"] for c in _read_meta(path)["columns"]]
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def find_table(directory, name):
+    """Существующая таблица name в каталоге (CSV или .npcols, более свежая) или None."""
+    candidates = [
+        path for path in (table_path(directory, name, "csv"), table_path(directory, name, "npcols"))
+        if os.path.isfile(path) or os.path.isfile(os.path.join(path, _META))
+    ]
+    if not candidates:
+        return None
+    return max(candidates, key=_mtime)
+
+
+def table_digest(path):
+    """sha256 содержимого таблицы (для кеша индикаторов)."""
+    if not is_store(path):
+        return file_digest(path)
+    h = hashlib.sha256()
+    for name in sorted(os.listdir(path)):
+        h.update(name.encode())
+        h.update(file_digest(os.path.join(path, name)).encode())
+    return h.hexdigest()
+
+
+def _read_meta(path):
+    with open(os.path.join(path, _META), "r") as f:
+        return json.load(f)
+
+
+def _csv_time_columns(path):
+    header = pd.read_csv(path, nrows=0).columns
+    return [c for c in header if c in TIME_COLUMNS]
+
+
+def read_columns(path, columns=None):
+    """
+    Колонки таблицы как словарь массивов NumPy (время — int64 нс от эпохи).
+
+    Для .npcols массивы отображаются в память без копирования.
+    """
+    if not is_store(path):
+        data = read_table(path, columns=columns)
+        result = {}
+        for name in data.columns:
+            if isinstance(data[name].dtype, pd.DatetimeTZDtype) or pd.api.types.is_datetime64_dtype(data[name]):
+                result[name] = pd.DatetimeIndex(data[name]).as_unit("ns").asi8
+            else:
+                result[name] = data[name].to_numpy()
+        return result
+
+    meta = _read_meta(path)
+    names = [c["name"] for c in meta["columns"]]
+    wanted = names if columns is None else [c for c in columns if c in names]
+    result = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in wanted}
+    instrument.count("bars_read", len(next(iter(result.values()))) if result else 0)
+    return result
+
+
+def read_table(path, columns=None, mmap=True):
+    """
+    Таблица как DataFrame. Для CSV известные колонки времени разбираются как
+    даты; для .npcols типы восстанавливаются из meta.json.
+    """
+    if not is_store(path):
+        time_columns = [c for c in _csv_time_columns(path) if columns is None or c in columns]
+        data = pd.read_csv(path, usecols=columns, parse_dates=time_columns, dtype=COLUMN_DTYPES)
+        instrument.count("bars_read", len(data))
+        return data
+
+    meta = _read_meta(path)
+    wanted = [c for c in meta["columns"] if columns is None or c["name"] in columns]
+    data = _frame(wanted, {c["name"]: np.load(os.path.join(path, f"{c['name']}.npy"), mmap_mode="r" if mmap else None)
+                           for c in wanted})
+    instrument.count("bars_read", len(data))
+    return data
+
+
+def _frame(columns, arrays):
+    """DataFrame из колонок .npcols: описания columns из meta.json и массивы arrays по именам."""
+    data = {}
+    for column in columns:
+        name = column["name"]
+        values = arrays[name]
+        if column["kind"] == "datetime":
+            times = pd.DatetimeIndex(values.view("datetime64[ns]"))
+            if column.get("tz"):
+                times = times.tz_localize("UTC").tz_convert(column["tz"])
+            data[name] = times
+        elif name in COLUMN_DTYPES and values.dtype != COLUMN_DTYPES[name]:
+            # Таблицы, записанные до сужения типов (can_trade — int64)
+            data[name] = values.astype(COLUMN_DTYPES[name])
+        else:
+            data[name] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def iter_table(path, chunk=MERGE_CHUNK):
+    """Таблица по частям — DataFrame по chunk строк; в памяти только текущая часть."""
+    if not is_store(path):
+        yield from pd.read_csv(path, parse_dates=_csv_time_columns(path), dtype=COLUMN_DTYPES, chunksize=chunk)
+        return
+    meta = _read_meta(path)
+    arrays = {c["name"]: np.load(os.path.join(path, f"{c['name']}.npy"), mmap_mode="r") for c in meta["columns"]}
+    for start in range(0, meta["rows"], chunk):
+        yield _frame(meta["columns"], {name: np.array(values[start:start + chunk]) for name, values in arrays.items()})
+
+
+def last_row(path):
+    """
+    Последняя строка таблицы (pandas.Series) или None для пустой таблицы.
+    CSV не разбирается целиком — читаются только заголовок и последняя строка.
+    """
+    if is_store(path):
+        data = read_table(path)
+        return data.iloc[-1] if len(data) else None
+
+    with open(path, "r") as f:
+        header = f.readline().rstrip("\r\n")
+    line = read_last_line(path)
+    if line is None or line == header:
+        return None
+    time_columns = [c for c in header.split(",") if c in TIME_COLUMNS]
+    return pd.read_csv(io.StringIO(header + "\n" + line), parse_dates=time_columns).iloc[0]
+
+
+def upsert_table(path, new, key="time"):
+    """
+    Добавляет строки new в таблицу, заменяя строки с тем же значением key;
+    таблица остаётся упорядоченной по key.
+
+    Если новые строки начинаются не раньше последней сохранённой (обычное
+    дописывание свежих свечей), CSV не переписывается: заменяется только
+    последняя строка и дописывается хвост. Иначе таблица сливается с new по
+    частям (merge_sorted), не загружаясь в память целиком.
+    """
+    new = new.sort_values(key).drop_duplicates(key, keep="last")
+    if not (os.path.isfile(path) or os.path.isdir(path)):
+        write_table(new, path)
+        return
+    if new.empty:
+        return
+
+    last = None if is_store(path) else last_row(path)
+    if last is not None and new[key].iloc[0] >= last[key]:
+        header = pd.read_csv(path, nrows=0).columns
+        if set(header) == set(new.columns):
+            if new[key].iloc[0] == last[key]:
+                offset = last_line_offset(path)
+                prefix = ""
+            else:
+                offset = os.path.getsize(path)
+                with open(path, "rb") as f:
+                    f.seek(max(offset - 1, 0))
+                    prefix = "" if f.read(1) in (b"\n", b"") else "\n"
+            replace_tail(path, offset, prefix + new[list(header)].to_csv(index=False, header=False))
+            return
+
+    _merge_into(path, [new], key, list(new.columns))
+
+
+def merge_table(path, new_path, key="time", chunk=MERGE_CHUNK):
+    """
+    upsert_table для новых строк из таблицы new_path (упорядочена по key, без
+    повторов): обе таблицы читаются по частям, так что память не растёт с
+    длиной истории — ни при дописывании, ни при полной перезагрузке.
+    """
+    new_chunks = (part for part in iter_table(new_path, chunk) if not part.empty)
+    first = next(new_chunks, None)
+    if first is None:
+        return
+    if not (os.path.isfile(path) or os.path.isdir(path)):
+        with TableWriter(path) as writer:
+            for part in itertools.chain([first], new_chunks):
+                writer.append(part)
+        return
+
+    last = None if is_store(path) else last_row(path)
+    if last is not None and first[key].iloc[0] >= last[key] and set(table_columns(path)) == set(first.columns):
+        # Свежие свечи после сохранённых: первая часть заменяет последнюю строку, остальные дописываются
+        upsert_table(path, first, key)
+        header = table_columns(path)
+        with open(path, "a", newline="") as f:
+            for part in new_chunks:
+                part[header].to_csv(f, header=False, index=False)
+        return
+    _merge_into(path, itertools.chain([first], new_chunks), key, list(first.columns), chunk)
+
+
+def _merge_into(path, new_chunks, key, new_columns, chunk=MERGE_CHUNK):
+    """Сливает части new_chunks с таблицей path по частям через TableWriter."""
+    columns = table_columns(path)
+    columns += [name for name in new_columns if name not in columns]
+    with TableWriter(path) as writer:
+        for part in merge_sorted(iter_table(path, chunk), new_chunks, key):
+            writer.append(part.reindex(columns=columns))
+
+
+def _next_part(chunks):
+    return next((part for part in chunks if not part.empty), None)
+
+
+def merge_sorted(old_chunks, new_chunks, key="time"):
+    """
+    Слияние двух потоков частей, упорядоченных по key без повторов, в один
+    упорядоченный поток; при равном key остаётся строка из new_chunks. В
+    памяти — не больше части каждого потока.
+    """
+    old_chunks, new_chunks = iter(old_chunks), iter(new_chunks)
+    old, new = _next_part(old_chunks), _next_part(new_chunks)
+    while old is not None and new is not None:
+        # Строки не позже limit есть в обеих частях целиком — их можно выдать
+        limit = min(old[key].iloc[-1], new[key].iloc[-1])
+        old_ready, new_ready = (old[key] <= limit).to_numpy(), (new[key] <= limit).to_numpy()
+        head = new[new_ready]
+        kept = old[old_ready & ~old[key].isin(head[key]).to_numpy()]
+        yield pd.concat([kept, head], ignore_index=True).sort_values(key, kind="stable")
+        old, new = old[~old_ready], new[~new_ready]
+        if old.empty:
+            old = _next_part(old_chunks)
+        if new.empty:
+            new = _next_part(new_chunks)
+    for rest, chunks in ((old, old_chunks), (new, new_chunks)):
+        while rest is not None:
+            yield rest
+            rest = _next_part(chunks)
+
+
+def _column_to_array(series):
+    """Типизированный массив колонки и её описание для meta.json."""
+    if isinstance(series.dtype, pd.DatetimeTZDtype) or pd.api.types.is_datetime64_dtype(series):
+        times = pd.DatetimeIndex(series).as_unit("ns")
+        tz = str(times.tz) if times.tz is not None else None
+        return times.asi8, {"kind": "datetime", "tz": tz}
+    if pd.api.types.is_bool_dtype(series):
+        return series.to_numpy(dtype=bool), {"kind": "bool"}
+    if pd.api.types.is_integer_dtype(series):
+        # Ширина целых сохраняется (can_trade — int8)
+        return series.to_numpy(), {"kind": "int"}
+    if pd.api.types.is_float_dtype(series):
+        return series.to_numpy(dtype=np.float64), {"kind": "float"}
+    return series.astype(str).to_numpy(dtype=str), {"kind": "str"}
+
+
+def write_table(data, path):
+    """Сохраняет DataFrame в CSV или .npcols — по расширению path."""
+    if not is_store(path):
+        data.to_csv(path, index=False)
+        return
+
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    meta = {"version": STORE_VERSION, "rows": len(data), "columns": []}
+    for name in data.columns:
+        values, info = _column_to_array(data[name])
+        np.save(os.path.join(tmp_path, f"{name}.npy"), values)
+        meta["columns"].append({"name": str(name), "dtype": values.dtype.str, **info})
+    with open(os.path.join(tmp_path, _META), "w") as f:
+        json.dump(meta, f, indent=1)
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+
+
+class TableWriter:
+    """
+    Запись таблицы по частям: append() принимает очередной DataFrame и сразу
+    сбрасывает его на диск, так что в памяти держится только текущий чанк.
+
+    CSV дописывается построчно; для .npcols колонки копятся в сырых .bin-файлах
+    и в close() переносятся в .npy через memmap. Таблица появляется под своим
+    именем только после close(); при исключении внутри with частичный файл удаляется.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._tmp_path = path + ".tmp"
+        self._columns = None
+        if is_store(path):
+            if os.path.exists(self._tmp_path):
+                shutil.rmtree(self._tmp_path)
+            os.makedirs(self._tmp_path)
+            self._files = {}
+        else:
+            self._file = open(self._tmp_path, "w", newline="")
+
+    def append(self, chunk):
+        if chunk.empty:
+            return
+        if not is_store(self.path):
+            chunk.to_csv(self._file, header=self._columns is None, index=False)
+            self._columns = list(chunk.columns)
+            self.rows += len(chunk)
+            return
+
+        first = self._columns is None
+        if first:
+            self._columns = []
+        for name in chunk.columns:
+            values, info = _column_to_array(chunk[name])
+            if info["kind"] == "str":
+                raise ValueError(f"Строковая колонка {name} не поддерживается при записи по частям")
+            if first:
+                self._columns.append({"name": str(name), "dtype": values.dtype.str, **info})
+                self._files[name] = open(os.path.join(self._tmp_path, f"{name}.bin"), "wb")
+            values.tofile(self._files[name])
+        self.rows += len(chunk)
+
+    def close(self):
+        """Завершает запись и возвращает число строк."""
+        if not is_store(self.path):
+            self._file.close()
+            os.replace(self._tmp_path, self.path)
+            return self.rows
+
+        for f in self._files.values():
+            f.close()
+        for column in self._columns or []:
+            raw_path = os.path.join(self._tmp_path, f"{column['name']}.bin")
+            npy_path = os.path.join(self._tmp_path, f"{column['name']}.npy")
+            dtype = np.dtype(column["dtype"])
+            if self.rows:
+                target = np.lib.format.open_memmap(npy_path, mode="w+", dtype=dtype, shape=(self.rows,))
+                target[:] = np.memmap(raw_path, dtype=dtype, mode="r", shape=(self.rows,))
+                target.flush()
+                del target
+            else:
+                np.save(npy_path, np.empty(0, dtype=dtype))
+            os.remove(raw_path)
+        meta = {"version": STORE_VERSION, "rows": self.rows, "columns": self._columns or []}
+        with open(os.path.join(self._tmp_path, _META), "w") as f:
+            json.dump(meta, f, indent=1)
+        if os.path.exists(self.path):
+            shutil.rmtree(self.path)
+        os.replace(self._tmp_path, self.path)
+        return self.rows
+
+    def abort(self):
+        if is_store(self.path):
+            for f in self._files.values():
+                f.close()
+            shutil.rmtree(self._tmp_path, ignore_errors=True)
+        else:
+            self._file.close()
+            if os.path.exists(self._tmp_path):
+                os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def remove_table(path):
+    if is_store(path):
+        shutil.rmtree(path)
+    else:
+        os.remove(path)
+
+
+def convert_directory(src_dir, dst_dir=None, fmt="npcols", recursive=False):
+    """
+    Конвертирует все таблицы каталога в формат fmt. Без dst_dir (или с
+    dst_dir = src_dir) таблица заменяется на месте: новая пишется рядом,
+    исходная удаляется — иначе остальные стадии видели бы контракт дважды.
+    Возвращает число сконвертированных таблиц.
+
+    С recursive подкаталоги берутся до записи; подкаталог, который сам
+    является dst_dir или содержит его (convert SRC SRC/npc -r), пропускается.
+    """
+    dst_dir = dst_dir or src_dir
+    subdirs = []
+    if recursive:
+        target_dir = os.path.realpath(dst_dir)
+        for entry in sorted(os.scandir(src_dir), key=lambda e: e.name):
+            if not entry.is_dir() or is_store(entry.path):
+                continue
+            source = os.path.realpath(entry.path)
+            if os.path.commonpath([source, target_dir]) != source:
+                subdirs.append(entry.name)
+    os.makedirs(dst_dir, exist_ok=True)
+    in_place = os.path.samefile(src_dir, dst_dir)
+    converted = 0
+    for path in list_tables(src_dir):
+        if is_store(path) == (fmt == "npcols"):
+            continue
+        target = table_path(dst_dir, table_name(path), fmt)
+        write_table(read_table(path, mmap=False), target)
+        if in_place:
+            remove_table(path)
+        print(f"✅ {path} → {target}")
+        converted += 1
+
+    for name in subdirs:
+        converted += convert_directory(os.path.join(src_dir, name), os.path.join(dst_dir, name), fmt, recursive)
+    return converted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="zrsimacd convert",
+                                      description="Convert candle/indicator tables between CSV and .npcols")
+    parser.add_argument("src", help="Directory with CSV (or .npcols) tables")
+    parser.add_argument("dst", nargs="?",
+                        help="Output directory (default: convert in place, replacing the source tables)")
+    parser.add_argument("--to", choices=FORMATS, default="npcols", help="Target format")
+    parser.add_argument("-r", "--recursive", action="store_true", help="Also convert subdirectories (e.g. rsi_macd)")
+    args = parser.parse_args(argv)
+
+    converted = convert_directory(args.src, args.dst, fmt=args.to, recursive=args.recursive)
+    print(f"\nСконвертировано таблиц: {converted}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Стратегия RSI/MACD декларативно: правила входа и выхода одним описанием.
+
+Правила (значения по умолчанию — исходная стратегия):
+
+    lookback       4     — окно сигнала: текущий бар и lookback предыдущих;
+    rsi_bars       =lookback — RSI текущего бара выше (BUY) / ниже (SELL)
+                           каждого из rsi_bars предыдущих;
+    rsi_monotonic  false — вместо этого RSI растёт (падает) на каждом из
+                           rsi_bars шагов подряд;
+    macd_bars      =lookback — macd_bars предыдущих MACD_Diff < 0 (BUY) / > 0 (SELL);
+    macd_cross     true  — текущий MACD_Diff > 0 (BUY) / < 0 (SELL);
+    liquidity      true  — вход только при can_trade == 1;
+    directions     both  — both, buy или sell;
+    tp_ticks       2     — выход после tp_ticks благоприятных закрытий подряд
+                           (null — без тейк-профита);
+    max_wait       6     — не дольше max_wait баров;
+    macd_reversal  true  — выход, когда MACD_Diff ушёл против позиции
+                           относительно бара входа.
+
+Описание — JSON-файл с этими ключами или строка «ключ=значение,...»
+(zrsimacd analyze --strategy rsi_bars=3,tp_ticks=3); неуказанные правила
+берутся по умолчанию. Strategy компилирует правила в параметры векторных
+ядер signals.signal_masks и exits.simulate_exits — маски по всему ряду и
+матрицу выходов, — поэтому любой вариант считается с той же скоростью, что
+и исходная стратегия. analyze, report и pipeline используют одну и ту же
+Strategy через trades.frame_trades, portfolio — через те же маски и выходы.
+
+sweep и replay описание стратегии не принимают и всегда работают по
+исходным правилам: sweep перебирает параметры индикаторов, tp_ticks и
+max_wait при исходных правилах входа, replay прогоняет бары через потоковый
+движок stream.SignalEngine, в котором правила заданы отдельно.
+"""
+import json
+import os
+
+from zrsimacd.exits import MAX_WAIT, TP_TICKS, simulate_exits
+from zrsimacd.signals import DIRECTIONS, LOOKBACK, find_signals, signal_masks
+
+
+class Strategy:
+    """Правила входа и выхода; поля — ключи описания (см. модуль)."""
+
+    def __init__(self, lookback=LOOKBACK, rsi_bars=None, rsi_monotonic=False, macd_bars=None, macd_cross=True,
+                 liquidity=True, directions="both", tp_ticks=TP_TICKS, max_wait=MAX_WAIT, macd_reversal=True):
+        self.lookback = int(lookback)
+        self.rsi_bars = self.lookback if rsi_bars is None else int(rsi_bars)
+        self.rsi_monotonic = bool(rsi_monotonic)
+        self.macd_bars = self.lookback if macd_bars is None else int(macd_bars)
+        self.macd_cross = bool(macd_cross)
+        self.liquidity = bool(liquidity)
+        self.directions = str(directions).lower()
+        self.tp_ticks = None if tp_ticks is None else int(tp_ticks)
+        self.max_wait = int(max_wait)
+        self.macd_reversal = bool(macd_reversal)
+        if self.lookback < 1:
+            raise ValueError(f"lookback должен быть положительным: {self.lookback}")
+        if not (0 <= self.rsi_bars <= self.lookback and 0 <= self.macd_bars <= self.lookback):
+            raise ValueError(f"rsi_bars и macd_bars должны быть от 0 до lookback ({self.lookback})")
+        if self.directions not in DIRECTIONS:
+            raise ValueError(f"Неизвестное directions {directions}, ожидается одно из {DIRECTIONS}")
+        if self.max_wait < 0 or (self.tp_ticks is not None and self.tp_ticks < 1):
+            raise ValueError("max_wait не может быть отрицательным, tp_ticks — меньше 1")
+
+    def __repr__(self):
+        return f"Strategy({', '.join(f'{k}={v!r}' for k, v in self.to_dict().items())})"
+
+    def __eq__(self, other):
+        return isinstance(other, Strategy) and self.to_dict() == other.to_dict()
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, spec):
+        unknown = set(spec) - set(cls().to_dict())
+        if unknown:
+            raise ValueError(f"Неизвестные правила стратегии: {', '.join(sorted(unknown))}")
+        return cls(**spec)
+
+    def signal_rules(self):
+        """Параметры signals.signal_masks / find_signals."""
+        return {"lookback": self.lookback, "rsi_bars": self.rsi_bars, "rsi_monotonic": self.rsi_monotonic,
+                "macd_bars": self.macd_bars, "macd_cross": self.macd_cross, "liquidity": self.liquidity,
+                "directions": self.directions}
+
+    def masks(self, rsi, macd_diff, can_trade):
+        """Булевы маски (buy, sell) по массивам индикаторов."""
+        return signal_masks(rsi, macd_diff, can_trade, **self.signal_rules())
+
+    def signals(self, data):
+        """Индексы баров (buy_idx, sell_idx) по таблице индикаторов, как signals.find_signals."""
+        return find_signals(data, **self.signal_rules())
+
+    def exits(self, close, macd_diff, entry_idx, direction, timestamps=None):
+        """(exit_time, profit, exit_idx) по сигналам, как exits.simulate_exits."""
+        return simulate_exits(close, macd_diff, entry_idx, direction, max_wait=self.max_wait,
+                              tp_ticks=self.tp_ticks, timestamps=timestamps, macd_reversal=self.macd_reversal)
+
+
+DEFAULT_STRATEGY = Strategy()
+
+
+def _parse_value(text):
+    # Числа, true/false/null — как в JSON, остальное — строкой (directions=buy)
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def parse_strategy(text):
+    """Описание стратегии: путь к JSON-файлу или «ключ=значение,...» → Strategy."""
+    if os.path.isfile(text):
+        with open(text, encoding="utf-8") as f:
+            return Strategy.from_dict(json.load(f))
+    spec = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"Правило стратегии {item!r}: ожидается ключ=значение или путь к JSON-файлу")
+        spec[key.strip()] = _parse_value(value.strip())
+    return Strategy.from_dict(spec)
+
+
+def load_strategy(strategy=None):
+    """Strategy из None (по умолчанию), Strategy, словаря правил или описания parse_strategy."""
+    if strategy is None:
+        return DEFAULT_STRATEGY
+    if isinstance(strategy, Strategy):
+        return strategy
+    if isinstance(strategy, dict):
+        return Strategy.from_dict(strategy)
+    return parse_strategy(strategy)
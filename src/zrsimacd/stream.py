@@ -0,0 +1,387 @@
+"""Потоковый движок сигналов: бар за баром, O(1) работы и памяти на бар.
+
+Те же правила, что у пакетного пути (check_buy_signals / check_sell_signals
+и calculate_trade_profit_smart, zrsimacd.signals и zrsimacd.exits), но
+состояние обновляется на каждом пришедшем баре, а события входа и выхода
+выдаются сразу:
+
+    IndicatorStream — RSI Уайлдера, быстрая/медленная/сигнальная EMA с
+                      затравкой SMA (прогрев как в zrsimacd.kernels) и флаг
+                      can_trade по серии объёмов;
+    SignalEngine    — кольцевой буфер последних LOOKBACK + 1 значений RSI и
+                      MACD_Diff, проверка условий входа и открытые позиции.
+                      Каждый сигнал — отдельная позиция, как в пакетном пути;
+                      позиция живёт не дольше MAX_WAIT баров, поэтому открытых
+                      одновременно не больше MAX_WAIT на направление.
+
+Пакетный расчёт EMA и RSI идёт блоками (kernels.linear_filter), потоковый —
+рекуррентно, поэтому значения индикаторов могут отличаться в последних
+битах; сделки от этого не меняются (replay --check сверяет их с пакетным
+путём). Ведущие пропуски close потоковый путь пропускает (пакетный заполняет
+их первой известной ценой — будущим для потока значением).
+
+Стадия replay прогоняет таблицы каталога через движок: таблицы свечей — с
+расчётом индикаторов, таблицы индикаторов — с готовыми RSI, MACD_Diff и
+can_trade, — и печатает задержку обработки бара.
+"""
+import math
+import os
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from zrsimacd import instrument
+from zrsimacd.continuous import load_rolls, map_trades
+from zrsimacd.executor import map_files, report_errors
+from zrsimacd.exits import MAX_WAIT, TP_TICKS
+from zrsimacd.indicator_files import compute_indicators
+from zrsimacd.indicators import MACD_FAST, MACD_SIGNAL, MACD_SLOW, RSI_PERIOD, VOLUME_RUN, VOLUME_THRESHOLD
+from zrsimacd.signals import LOOKBACK
+from zrsimacd.store import candles_dir, list_tables, read_table, table_name
+from zrsimacd.trades import frame_trades, save_trade_report
+from zrsimacd.tradestore import TradeStore
+
+INDICATOR_FIELDS = ("RSI", "MACD_Diff", "can_trade")
+EVENTS_FILE = "stream_events.csv"
+EVENT_COLUMNS = ["event", "ticker", "direction", "time", "price", "MACD_Diff", "profit"]
+# Поля сделки, которые при сверке с пакетным путём сравниваются с допуском (остальные — точно)
+_FLOAT_FIELDS = ("open_MACD_Diff",)
+
+
+class _Ema:
+    """EMA с затравкой: первое значение — SMA первых length входов, раньше — NaN."""
+
+    def __init__(self, length):
+        self.length = length
+        self.alpha = 2.0 / (length + 1)
+        self.value = math.nan
+        self._seed = []
+
+    def update(self, x):
+        if self._seed is not None:
+            self._seed.append(x)
+            if len(self._seed) < self.length:
+                return math.nan
+            # np.mean — то же суммирование, что у затравки в kernels._ema_rows
+            self.value = float(np.mean(self._seed))
+            self._seed = None
+            return self.value
+        self.value = (1 - self.alpha) * self.value + self.alpha * x
+        return self.value
+
+
+class IndicatorStream:
+    """RSI, MACD_Diff и can_trade по одному бару за раз, как compute_indicators по всему ряду."""
+
+    def __init__(self, rsi_period=RSI_PERIOD, macd_fast=MACD_FAST, macd_slow=MACD_SLOW, macd_signal=MACD_SIGNAL):
+        if macd_slow < macd_fast:
+            macd_fast, macd_slow = macd_slow, macd_fast
+        self.rsi_period = rsi_period
+        self.decay = 1.0 - 1.0 / rsi_period
+        self.bars = 0
+        self.prev_close = math.nan
+        self.gains = 0.0
+        self.losses = 0.0
+        self.rsi = math.nan
+        self.fast = _Ema(macd_fast)
+        self.slow = _Ema(macd_slow)
+        self.signal = _Ema(macd_signal)
+        self.can_trade = 0
+        self.volume_run = 0
+
+    def update(self, close, volume=None):
+        """Следующий бар; возвращает (RSI, MACD_Diff, can_trade) на нём. close без пропусков."""
+        i = self.bars
+        self.bars += 1
+        if i > 0:
+            delta = close - self.prev_close
+            self.gains = self.decay * self.gains + max(delta, 0.0)
+            self.losses = self.decay * self.losses + min(delta, 0.0)
+            # Как kernels.rsi: на баре без изменения цены после прогрева RSI не пересчитывается
+            if i < self.rsi_period:
+                self.rsi = math.nan
+            elif delta != 0 or i == self.rsi_period:
+                denom = self.gains + abs(self.losses)
+                self.rsi = 100 * self.gains / denom if denom != 0 else math.nan
+        self.prev_close = close
+
+        fast = self.fast.update(close)
+        slow = self.slow.update(close)
+        macd_diff = math.nan
+        if not math.isnan(slow):
+            macd_line = fast - slow
+            macd_diff = macd_line - self.signal.update(macd_line)
+
+        if not self.can_trade and volume is not None:
+            self.volume_run = self.volume_run + 1 if volume > VOLUME_THRESHOLD else 0
+            if self.volume_run >= VOLUME_RUN:
+                self.can_trade = 1
+        return self.rsi, macd_diff, self.can_trade
+
+
+class _Position:
+    __slots__ = ("direction", "entry_time", "entry_price", "open_macd", "steps", "run")
+
+    def __init__(self, direction, entry_time, entry_price, open_macd):
+        self.direction = direction
+        self.entry_time = entry_time
+        self.entry_price = entry_price
+        self.open_macd = open_macd
+        self.steps = 0
+        self.run = 0
+
+
+class SignalEngine:
+    """
+    Сигналы и выходы по одному бару: on_bar возвращает события этого бара —
+    сначала выходы открытых позиций, затем входы. finish закрывает
+    оставшиеся позиции на последнем баре, как пакетный путь в конце данных.
+    Событие выхода — сделка с теми же полями, что в trades_from_signals, и
+    event="exit"; событие входа — event="entry", direction, time, price,
+    MACD_Diff.
+    """
+
+    def __init__(self, ticker="", lookback=LOOKBACK, max_wait=MAX_WAIT, tp_ticks=TP_TICKS):
+        self.ticker = ticker
+        self.lookback = lookback
+        self.max_wait = max_wait
+        self.tp_ticks = tp_ticks
+        self.rsi = deque(maxlen=lookback + 1)
+        self.macd_diff = deque(maxlen=lookback + 1)
+        self.positions = []
+        self.prev_close = math.nan
+        self.last_time = None
+        self.last_close = math.nan
+
+    def _exit(self, position, exit_time, exit_price):
+        profit = exit_price - position.entry_price if position.direction == "BUY" else \
+            position.entry_price - exit_price
+        return {
+            "event": "exit",
+            "ticker": self.ticker,
+            "direction": position.direction,
+            "entry_time": position.entry_time,
+            "entry_price": position.entry_price,
+            "open_MACD_Diff": position.open_macd,
+            "exit_time": exit_time,
+            "exit_price": exit_price,
+            "profit": profit,
+        }
+
+    def on_bar(self, timestamp, close, rsi, macd_diff, can_trade):
+        events = []
+        still_open = []
+        for p in self.positions:
+            p.steps += 1
+            if (close > self.prev_close) if p.direction == "BUY" else (close < self.prev_close):
+                p.run += 1
+            else:
+                p.run = 0
+            macd_hit = macd_diff < p.open_macd if p.direction == "BUY" else macd_diff > p.open_macd
+            if p.run >= self.tp_ticks or macd_hit or p.steps >= self.max_wait:
+                events.append(self._exit(p, timestamp, close))
+            else:
+                still_open.append(p)
+        self.positions = still_open
+
+        self.rsi.append(rsi)
+        self.macd_diff.append(macd_diff)
+        if len(self.rsi) > self.lookback and can_trade == 1:
+            # Сравнения с NaN ложны — бары прогрева сигналов не дают, как в signal_masks
+            previous_rsi = list(self.rsi)[:-1]
+            previous_macd = list(self.macd_diff)[:-1]
+            direction = None
+            if macd_diff > 0 and all(r < rsi for r in previous_rsi) and all(m < 0 for m in previous_macd):
+                direction = "BUY"
+            elif macd_diff < 0 and all(r > rsi for r in previous_rsi) and all(m > 0 for m in previous_macd):
+                direction = "SELL"
+            if direction is not None:
+                self.positions.append(_Position(direction, timestamp, close, macd_diff))
+                events.append({"event": "entry", "ticker": self.ticker, "direction": direction, "time": timestamp,
+                               "price": close, "MACD_Diff": macd_diff})
+
+        self.prev_close = close
+        self.last_time = timestamp
+        self.last_close = close
+        return events
+
+    def finish(self):
+        """Выходы оставшихся позиций на последнем баре (данные кончились раньше max_wait)."""
+        events = [self._exit(p, self.last_time, self.last_close) for p in self.positions]
+        self.positions = []
+        return events
+
+
+class LatencyStats:
+    """
+    Задержка обработки бара: среднее, максимум и гистограмма с
+    логарифмическими корзинами (BUCKETS_PER_OCTAVE на удвоение), так что
+    память не растёт с числом баров, а процентили точны до ~9%.
+    """
+
+    BUCKETS_PER_OCTAVE = 8
+
+    def __init__(self):
+        self.counts = [0] * (64 * self.BUCKETS_PER_OCTAVE)
+        self.bars = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record(self, ns):
+        self.counts[int(math.log2(ns) * self.BUCKETS_PER_OCTAVE) if ns > 1 else 0] += 1
+        self.bars += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.bars += other.bars
+        self.total_ns += other.total_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+
+    def percentile(self, q):
+        """Верхняя граница корзины, в которую попадает q-я доля баров, нс."""
+        target = q / 100 * self.bars
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return 2 ** ((bucket + 1) / self.BUCKETS_PER_OCTAVE)
+        return float(self.max_ns)
+
+    def report(self):
+        if not self.bars:
+            return
+        us = 1000
+        print(f"Задержка на бар, мкс: средняя {self.total_ns / self.bars / us:.2f}, "
+              f"p50 {self.percentile(50) / us:.2f}, p99 {self.percentile(99) / us:.2f}, "
+              f"p99.9 {self.percentile(99.9) / us:.2f}, макс {self.max_ns / us:.2f} "
+              f"({self.bars:,} баров, {self.bars / (self.total_ns / 1e9):,.0f} баров/с)")
+
+
+def stream_table(data, ticker="", latency=None, rsi_period=RSI_PERIOD, macd_fast=MACD_FAST, macd_slow=MACD_SLOW,
+                 macd_signal=MACD_SIGNAL):
+    """
+    События по барам таблицы (свечи или индикаторы) по порядку времени —
+    генератор, таблица подаётся в движок по одной строке. Готовые RSI,
+    MACD_Diff и can_trade берутся как есть, иначе считаются IndicatorStream.
+    latency — LatencyStats для задержки каждого бара (необязательно).
+    """
+    data = data.rename(columns={"time": "timestamp"}).sort_values("timestamp")
+    precomputed = all(name in data.columns for name in INDICATOR_FIELDS)
+    indicators = None if precomputed else IndicatorStream(rsi_period, macd_fast, macd_slow, macd_signal)
+    engine = SignalEngine(ticker)
+    columns = ["timestamp", "close", *(INDICATOR_FIELDS if precomputed else ["volume"] if "volume" in data else [])]
+    clock = time.perf_counter_ns
+    for row in data[columns].itertuples(index=False, name=None):
+        started = clock()
+        if precomputed:
+            events = engine.on_bar(row[0], row[1], row[2], row[3], row[4])
+        elif math.isnan(row[1]) and indicators.bars == 0:
+            continue
+        else:
+            # Пропуск close — предыдущая цена (ffill, как в compute_indicators)
+            close = indicators.prev_close if math.isnan(row[1]) else row[1]
+            rsi, macd_diff, can_trade = indicators.update(close, row[2] if len(row) > 2 else None)
+            events = engine.on_bar(row[0], close, rsi, macd_diff, can_trade)
+        if latency is not None:
+            latency.record(clock() - started)
+        yield from events
+    yield from engine.finish()
+
+
+def replay_file(file_path, check=False, keep_events=False, rsi_period=RSI_PERIOD, macd_fast=MACD_FAST,
+                macd_slow=MACD_SLOW, macd_signal=MACD_SIGNAL):
+    """
+    Прогоняет таблицу через движок; для executor.map_files. Возвращает
+    (сделки TradeStore в порядке пакетного пути, LatencyStats, расхождения
+    со сделками пакетного пути или None без check, события или None без
+    keep_events).
+    """
+    params = {"rsi_period": rsi_period, "macd_fast": macd_fast, "macd_slow": macd_slow, "macd_signal": macd_signal}
+    ticker = table_name(file_path)
+    data = read_table(file_path, mmap=False)
+    latency = LatencyStats()
+    events = list(stream_table(data, ticker, latency, **params))
+    trades = [{k: v for k, v in e.items() if k != "event"} for e in events if e["event"] == "exit"]
+    # Пакетный путь отдаёт сначала все BUY, затем все SELL, каждые — по времени входа
+    trades.sort(key=lambda t: (t["direction"] != "BUY", t["entry_time"]))
+    instrument.count("trades", len(trades))
+
+    mismatches = None
+    if check:
+        if all(name in data.columns for name in INDICATOR_FIELDS):
+            expected = frame_trades(data.rename(columns={"time": "timestamp"}), ticker, source=file_path).records()
+        else:
+            indicators = compute_indicators(data, **params, source=file_path)
+            expected = [] if indicators is None else frame_trades(indicators, ticker, source=file_path).records()
+        mismatches = compare_trades(trades, expected)
+
+    trades = TradeStore.from_records(trades)
+    rolls = load_rolls(file_path)
+    if rolls is not None:
+        trades = map_trades(trades, rolls)
+    return trades, latency, mismatches, events if keep_events else None
+
+
+def compare_trades(trades, expected):
+    """Число сделок-словарей, отличающихся от expected (точно, кроме _FLOAT_FIELDS), плюс разница в их числе."""
+    mismatches = abs(len(trades) - len(expected))
+    for a, b in zip(trades, expected):
+        same = all(a[k] == b[k] for k in b if k not in _FLOAT_FIELDS)
+        same = same and all(math.isclose(a[k], b[k], rel_tol=1e-9, abs_tol=1e-9) for k in _FLOAT_FIELDS if k in b)
+        mismatches += not same
+    return mismatches
+
+
+def _event_row(event):
+    """Событие → строка журнала EVENT_COLUMNS: для выхода time и price — выхода, MACD_Diff — на входе."""
+    if event["event"] == "entry":
+        return {**event, "profit": None}
+    return {"event": "exit", "ticker": event["ticker"], "direction": event["direction"], "time": event["exit_time"],
+            "price": event["exit_price"], "MACD_Diff": event["open_MACD_Diff"], "profit": event["profit"]}
+
+
+def replay(input_dir=None, check=False, events_file=None, output_file=None, rsi_period=RSI_PERIOD,
+           macd_fast=MACD_FAST, macd_slow=MACD_SLOW, macd_signal=MACD_SIGNAL, jobs=None):
+    """
+    Стадия replay: все таблицы input_dir (по умолчанию — каталог свечей
+    store.candles_dir) через потоковый движок. Печатает число сделок и
+    задержку на бар; при check сверяет сделки с пакетным путём, events_file —
+    журнал событий, output_file — сделки в формате отчёта report.
+    """
+    input_dir = input_dir or candles_dir()
+    results = map_files(replay_file, list_tables(input_dir), jobs=jobs,
+                        kwargs={"check": check, "keep_events": events_file is not None, "rsi_period": rsi_period,
+                                "macd_fast": macd_fast, "macd_slow": macd_slow, "macd_signal": macd_signal})
+    latency = LatencyStats()
+    all_trades, all_events = TradeStore(), []
+    mismatched = 0
+    for r in results:
+        if r.result is None:
+            continue
+        trades, file_latency, mismatches, events = r.result
+        all_trades.extend(trades)
+        latency.merge(file_latency)
+        if events:
+            all_events.extend(events)
+        if mismatches:
+            mismatched += mismatches
+            print(f"{r.path}: сделок, не совпавших с пакетным путём: {mismatches}")
+    report_errors(results)
+
+    print(f"Таблиц: {len(results)}, сделок: {len(all_trades)}")
+    latency.report()
+    if check:
+        print("Сделки совпадают с пакетным путём" if not mismatched
+              else f"Не совпало сделок с пакетным путём: {mismatched}")
+    if events_file:
+        pd.DataFrame([_event_row(e) for e in all_events], columns=EVENT_COLUMNS).to_csv(events_file, index=False)
+        print(f"События сохранены: {events_file}")
+    if output_file and all_trades:
+        os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+        save_trade_report(all_trades, output_file)
+    return all_trades
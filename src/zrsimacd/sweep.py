@@ -0,0 +1,502 @@
+"""Перебор параметров стратегии RSI/MACD по сетке (zrsimacd sweep).
+
+Каждая комбинация (RSI_PERIOD, MACD_FAST/SLOW/SIGNAL, tp_ticks, max_wait,
+плечо) прогоняется по всем контрактам каталога со свечами, результат —
+таблица, отсортированная по выбранной метрике.
+
+Работа делится по наборам индикаторов и частям сетки выхода: задача пула
+процессов проверяет часть комбинаций выхода (со всеми плечами) для одного
+набора RSI/MACD. Частей столько, чтобы процессы были заняты и при одном
+наборе индикаторов; части одного набора идут подряд и попадают в один
+процесс, где его сигналы считаются один раз. RSI и EMA кешируются в каждом
+процессе по периоду, поэтому одна RSI используется всеми комбинациями MACD
+и наоборот, а между запусками они берутся из дискового кеша индикаторов
+(zrsimacd.cache). Число процессов — --jobs/-j или ZRSIMACD_JOBS, как у
+остальных стадий (zrsimacd.executor).
+
+Режим --walk-forward: история делится на скользящие окна по времени —
+train_months на подбор (in-sample) и следующие test_months на проверку
+(out-of-sample), окна сдвигаются на test_months. Индикаторы и сделки
+каждого набора параметров считаются один раз по всей истории контрактов (без
+повторного прогрева), а окна — это срезы сделок по времени входа. В каждом
+in-sample окне выбирается лучшая комбинация, её сделки из следующего
+out-of-sample окна склеиваются и проходят через generate_report.
+
+Пример:
+    zrsimacd sweep --rsi-period 14:30:2 \\
+        --macd-fast 10,15 --macd-slow 26,30 --tp-ticks 1:3 --jobs 8
+    zrsimacd sweep --walk-forward --train-months 12 --test-months 3 --rsi-period 14:30:2
+"""
+import argparse
+import itertools
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from zrsimacd import indicators
+from zrsimacd.cache import IndicatorCache
+from zrsimacd.executor import add_jobs_argument, resolve_jobs
+from zrsimacd.exits import BUY, MAX_WAIT, SELL, TP_TICKS, simulate_exits
+from zrsimacd.metrics import INITIAL_CAPITAL, LEVERAGE, equity_stats, fixed_profits, nondup_order, ticker_priority
+from zrsimacd.reports import FIXED_FILE, NONDUP_FIXED_FILE, QUARTERLY_FIXED_FILE, REINVEST_FILE, generate_report
+from zrsimacd.signals import signal_masks
+from zrsimacd.store import candles_dir, list_tables, read_table, table_digest, table_name
+from zrsimacd.tradestore import TradeStore
+
+TRAIN_MONTHS = 12
+TEST_MONTHS = 3
+
+SORT_COLUMNS = ('total_profit', 'sharpe', 'max_drawdown', 'profit_factor', 'final_equity')
+
+# Задач пула на процесс: запас, чтобы быстрые и медленные задачи выравнивались по процессам
+TASKS_PER_JOB = 4
+
+# Контракты и дисковый кеш процесса-воркера (заполняются в _init_worker)
+_CONTRACTS = []
+_CACHE = None
+
+
+def parse_values(text, cast=int):
+    """
+    Разбирает значения параметра: «20», «10,15,20» или диапазон «10:30:5»
+    (конец включительно, шаг по умолчанию 1).
+    """
+    values = []
+    for part in text.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if ':' in part:
+            bounds = [cast(x) for x in part.split(':')]
+            start, stop = bounds[0], bounds[1]
+            step = bounds[2] if len(bounds) > 2 else cast(1)
+            if step <= 0:
+                raise ValueError(f"Шаг диапазона должен быть положительным: {part}")
+            count = int(round((stop - start) / step)) + 1
+            values.extend(cast(round(start + k * step, 10)) for k in range(max(count, 0)))
+        else:
+            values.append(cast(part))
+    return sorted(set(values))
+
+
+def load_contracts(input_dir):
+    """Читает свечи всех контрактов каталога (time, close, volume)."""
+    contracts = []
+    for file_path in list_tables(input_dir):
+        try:
+            data = read_table(file_path)
+        except Exception as e:
+            print(f"Ошибка при чтении {file_path}: {e}")
+            continue
+        if not {'time', 'close'}.issubset(data.columns) or data.empty:
+            print(f"Пропущены нужные колонки в {file_path}")
+            continue
+        data.sort_values('time', inplace=True)
+        close = data['close'].ffill().bfill().to_numpy(dtype=np.float64)
+        volume = data['volume'].to_numpy() if 'volume' in data.columns else np.zeros(len(data))
+        contracts.append({
+            'ticker': table_name(file_path),
+            'digest': table_digest(file_path),
+            'time': pd.DatetimeIndex(data['time']).as_unit('ns').asi8,
+            'close': close,
+            'can_trade': indicators.can_trade_flags(volume),
+        })
+
+    priority = ticker_priority([c['ticker'] for c in contracts])
+    for contract, rank in zip(contracts, priority):
+        contract['priority'] = rank
+    return contracts
+
+
+def _init_worker(contracts):
+    global _CONTRACTS, _CACHE
+    _CONTRACTS = contracts
+    _CACHE = IndicatorCache()
+    _rsi.cache_clear()
+    _ema.cache_clear()
+    _entries.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def _rsi(contract_no, period):
+    contract = _CONTRACTS[contract_no]
+    key = _CACHE.key(contract['digest'], "rsi", period=period)
+    return _CACHE.get_or_compute(key, lambda: indicators.rsi(contract['close'], period))
+
+
+@lru_cache(maxsize=None)
+def _ema(contract_no, length):
+    contract = _CONTRACTS[contract_no]
+    key = _CACHE.key(contract['digest'], "ema", length=length)
+    return _CACHE.get_or_compute(key, lambda: indicators.ema(contract['close'], length))
+
+
+@lru_cache(maxsize=1)
+def _entries(rsi_period, fast, slow, signal):
+    """Сигналы по всем контрактам процесса для набора индикаторов: [(номер контракта, MACD_Diff, бары, направления)]."""
+    entries = []
+    for no, contract in enumerate(_CONTRACTS):
+        if len(contract['close']) < max(slow, rsi_period):
+            continue
+        macd_line, signal_line = indicators.macd_from_emas(_ema(no, fast), _ema(no, slow), signal)
+        macd_diff = macd_line - signal_line
+        buy, sell = signal_masks(_rsi(no, rsi_period), macd_diff, contract['can_trade'])
+        entry_idx = np.concatenate([np.flatnonzero(buy), np.flatnonzero(sell)])
+        if len(entry_idx) == 0:
+            continue
+        direction = np.concatenate([np.full(buy.sum(), BUY), np.full(sell.sum(), SELL)])
+        entries.append((no, macd_diff, entry_idx, direction))
+    return entries
+
+
+def _trade_arrays(entries, tp_ticks, max_wait):
+    """
+    Сделки всех контрактов одним набором массивов: entry_time, entry_price,
+    exit_price, direction, priority и для восстановления сделок — contract,
+    entry_idx, exit_idx.
+    """
+    columns = {name: [] for name in ('entry_time', 'entry_price', 'exit_price', 'direction', 'priority',
+                                     'contract', 'entry_idx', 'exit_idx')}
+    for no, macd_diff, entry_idx, direction in entries:
+        contract = _CONTRACTS[no]
+        _, _, exit_idx = simulate_exits(
+            contract['close'], macd_diff, entry_idx, direction, max_wait=max_wait, tp_ticks=tp_ticks
+        )
+        columns['entry_time'].append(contract['time'][entry_idx])
+        columns['entry_price'].append(contract['close'][entry_idx])
+        columns['exit_price'].append(contract['close'][exit_idx])
+        columns['direction'].append(direction)
+        columns['priority'].append(np.full(len(entry_idx), contract['priority']))
+        columns['contract'].append(np.full(len(entry_idx), no))
+        columns['entry_idx'].append(entry_idx)
+        columns['exit_idx'].append(exit_idx)
+    return {name: np.concatenate(parts) if parts else np.array([]) for name, parts in columns.items()}
+
+
+def _evaluate_group(task):
+    """Одна задача пула: набор индикаторов и часть комбинаций выхода со всеми плечами для него."""
+    (rsi_period, fast, slow, signal), exit_grid, leverages, initial_capital = task
+    hits, misses = _CACHE.hits, _CACHE.misses
+
+    # Сигналы по всем контрактам для этого набора индикаторов
+    entries = _entries(rsi_period, fast, slow, signal)
+
+    rows = []
+    for tp_ticks, max_wait in exit_grid:
+        trades = _trade_arrays(entries, tp_ticks, max_wait)
+        if entries:
+            selected = nondup_order(trades['entry_time'], trades['priority'])
+        else:
+            selected = np.array([], dtype=np.intp)
+
+        for leverage in leverages:
+            profits = fixed_profits(
+                trades['entry_price'][selected], trades['exit_price'][selected], trades['direction'][selected],
+                initial_capital=initial_capital, leverage=leverage,
+            )
+            stats = equity_stats(profits, initial_capital)
+            stats['num_signals'] = len(trades['entry_price'])
+            rows.append({
+                'rsi_period': rsi_period,
+                'macd_fast': fast,
+                'macd_slow': slow,
+                'macd_signal': signal,
+                'tp_ticks': tp_ticks,
+                'max_wait': max_wait,
+                'leverage': leverage,
+                **stats,
+            })
+    return rows, _CACHE.hits - hits, _CACHE.misses - misses
+
+
+def run_sweep(contracts, rsi_periods, macd_fast, macd_slow, macd_signal, tp_ticks, max_wait, leverages,
+              initial_capital=INITIAL_CAPITAL, jobs=None):
+    """
+    Прогоняет все комбинации параметров и возвращает DataFrame с метриками
+    (по модели фиксированного капитала без дубликатов по дате).
+    """
+    indicator_grid = _indicator_grid(rsi_periods, macd_fast, macd_slow, macd_signal)
+    exit_grid = list(itertools.product(tp_ticks, max_wait))
+    return pd.DataFrame(_run_tasks(_evaluate_group, indicator_grid, exit_grid, (list(leverages), initial_capital),
+                                   contracts, jobs))
+
+
+def _indicator_grid(rsi_periods, macd_fast, macd_slow, macd_signal):
+    # Соседние задачи делят RSI одного периода и EMA одной длины
+    return sorted(
+        (r, f, s, g)
+        for r, f, s, g in itertools.product(rsi_periods, macd_fast, macd_slow, macd_signal)
+        if f < s
+    )
+
+
+def _exit_chunks(exit_grid, n_indicator_sets, jobs):
+    """
+    Комбинации выхода по частям: столько, чтобы задач (набор индикаторов,
+    часть) хватило на TASKS_PER_JOB на процесс, даже если набор индикаторов один.
+    """
+    if jobs == 1 or len(exit_grid) < 2:
+        return [exit_grid]
+    parts = min(len(exit_grid), math.ceil(jobs * TASKS_PER_JOB / max(n_indicator_sets, 1)))
+    size = math.ceil(len(exit_grid) / parts)
+    return [exit_grid[start:start + size] for start in range(0, len(exit_grid), size)]
+
+
+def _run_tasks(func, indicator_grid, exit_grid, extra, contracts, jobs):
+    """
+    Задачи (набор индикаторов, часть комбинаций выхода, *extra) в пуле
+    процессов (или в текущем при jobs=1); строки результатов всех задач по
+    порядку сетки. Части одного набора идут подряд и попадают в один процесс
+    пачкой pool.map, поэтому RSI, EMA и сигналы набора считаются там один раз.
+    """
+    jobs = resolve_jobs(jobs)
+    tasks = [(key, chunk, *extra) for key in indicator_grid
+             for chunk in _exit_chunks(exit_grid, len(indicator_grid), jobs)]
+    if jobs == 1:
+        _init_worker(contracts)
+        results = [func(task) for task in tasks]
+    else:
+        chunksize = max(1, len(tasks) // (jobs * TASKS_PER_JOB))
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(contracts,)) as pool:
+            results = list(pool.map(func, tasks, chunksize=chunksize))
+
+    cache = IndicatorCache()
+    cache.hits = sum(hits for _, hits, _ in results)
+    cache.misses = sum(misses for _, _, misses in results)
+    cache.report()
+    return [row for rows, _, _ in results for row in rows]
+
+
+# === Walk-forward ===
+
+def walk_forward_windows(contracts, train_months=TRAIN_MONTHS, test_months=TEST_MONTHS):
+    """
+    Окна (начало in-sample, начало out-of-sample, конец out-of-sample) в
+    наносекундах. Первое окно начинается с первой свечи, окна сдвигаются на
+    test_months, последнее out-of-sample окно может быть неполным.
+    """
+    if not contracts:
+        return []
+    first = pd.Timestamp(min(c['time'][0] for c in contracts)).normalize()
+    last = pd.Timestamp(max(c['time'][-1] for c in contracts))
+    windows = []
+    while True:
+        is_start = first + pd.DateOffset(months=len(windows) * test_months)
+        oos_start = is_start + pd.DateOffset(months=train_months)
+        if oos_start > last:
+            return windows
+        windows.append((is_start.value, oos_start.value, (oos_start + pd.DateOffset(months=test_months)).value))
+
+
+def _in_window(trades, start, end):
+    """Индексы сделок с входом в [start, end), по одной в день, в порядке дат."""
+    inside = np.flatnonzero((trades['entry_time'] >= start) & (trades['entry_time'] < end))
+    return inside[nondup_order(trades['entry_time'][inside], trades['priority'][inside])]
+
+
+def _evaluate_windows(task):
+    """Задача пула для walk-forward: метрики набора индикаторов в каждом in-sample окне."""
+    (rsi_period, fast, slow, signal), exit_grid, windows, initial_capital = task
+    hits, misses = _CACHE.hits, _CACHE.misses
+    entries = _entries(rsi_period, fast, slow, signal)
+
+    rows = []
+    for tp_ticks, max_wait in exit_grid:
+        trades = _trade_arrays(entries, tp_ticks, max_wait)
+        for window, (is_start, oos_start, _) in enumerate(windows):
+            selected = _in_window(trades, is_start, oos_start)
+            profits = fixed_profits(trades['entry_price'][selected], trades['exit_price'][selected],
+                                    trades['direction'][selected], initial_capital=initial_capital)
+            rows.append({
+                'window': window,
+                'rsi_period': rsi_period,
+                'macd_fast': fast,
+                'macd_slow': slow,
+                'macd_signal': signal,
+                'tp_ticks': tp_ticks,
+                'max_wait': max_wait,
+                **equity_stats(profits, initial_capital),
+            })
+    return rows, _CACHE.hits - hits, _CACHE.misses - misses
+
+
+def _window_trades(params, start, end):
+    """Сделки (TradeStore, как у file_trades) набора параметров с входом в [start, end); контракты — в _CONTRACTS."""
+    entries = _entries(params['rsi_period'], params['macd_fast'], params['macd_slow'], params['macd_signal'])
+    macd_diffs = {no: macd_diff for no, macd_diff, _, _ in entries}
+    trades = _trade_arrays(entries, params['tp_ticks'], params['max_wait'])
+    inside = np.flatnonzero((trades['entry_time'] >= start) & (trades['entry_time'] < end))
+
+    # Сделки контракта в _trade_arrays идут подряд: добавляем их пачкой на контракт, порядок сохраняется
+    result = TradeStore(capacity=len(inside), tz='UTC')
+    contract_no = trades['contract'][inside]
+    for no in dict.fromkeys(contract_no.tolist()):
+        rows = inside[contract_no == no]
+        contract = _CONTRACTS[no]
+        entry_idx, exit_idx = trades['entry_idx'][rows], trades['exit_idx'][rows]
+        direction = trades['direction'][rows]
+        entry_price, exit_price = contract['close'][entry_idx], contract['close'][exit_idx]
+        result.append(contract['ticker'], direction, contract['time'][entry_idx], entry_price,
+                      macd_diffs[no][entry_idx], contract['time'][exit_idx], exit_price,
+                      np.where(direction == BUY, exit_price - entry_price, entry_price - exit_price))
+    return result
+
+
+def run_walk_forward(contracts, rsi_periods, macd_fast, macd_slow, macd_signal, tp_ticks, max_wait,
+                     train_months=TRAIN_MONTHS, test_months=TEST_MONTHS, sort_by='total_profit',
+                     initial_capital=INITIAL_CAPITAL, jobs=None):
+    """
+    Walk-forward подбор параметров. Возвращает (таблица окон с лучшей
+    комбинацией in-sample и итогом out-of-sample, склеенные out-of-sample сделки).
+    """
+    windows = walk_forward_windows(contracts, train_months, test_months)
+    indicator_grid = _indicator_grid(rsi_periods, macd_fast, macd_slow, macd_signal)
+    if not windows or not indicator_grid:
+        return pd.DataFrame(), TradeStore()
+    exit_grid = list(itertools.product(tp_ticks, max_wait))
+    scores = pd.DataFrame(_run_tasks(_evaluate_windows, indicator_grid, exit_grid, (windows, initial_capital),
+                                     contracts, jobs))
+
+    # Лучшая комбинация каждого окна; при равенстве — первая в порядке сетки
+    ascending = sort_by == 'max_drawdown'
+    best = scores.sort_values(['window', sort_by], ascending=[True, ascending], kind='stable')
+    best = best.groupby('window', sort=True).head(1)
+
+    _init_worker(contracts)
+    summary, oos_trades = [], TradeStore(tz='UTC')
+    for (is_start, oos_start, oos_end), params in zip(windows, best.to_dict('records')):
+        trades = _window_trades(params, oos_start, oos_end)
+        oos_trades.extend(trades)
+        summary.append({
+            'window': params['window'],
+            'is_start': pd.Timestamp(is_start).date(),
+            'oos_start': pd.Timestamp(oos_start).date(),
+            'oos_end': pd.Timestamp(oos_end).date(),
+            **{name: params[name] for name in ('rsi_period', 'macd_fast', 'macd_slow', 'macd_signal',
+                                               'tp_ticks', 'max_wait')},
+            f'is_{sort_by}': params[sort_by],
+            'is_trades': params['num_trades'],
+            'oos_signals': len(trades),
+        })
+    return pd.DataFrame(summary), oos_trades
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="zrsimacd sweep",
+                                     description="Grid search over RSI/MACD strategy parameters with the original "
+                                                 "entry rules (--strategy is not supported)")
+    parser.add_argument("--input-dir", default=None,
+                        help="Directory with candle tables (default: <data dir>/4_hour)")
+    parser.add_argument("--rsi-period", default=str(indicators.RSI_PERIOD), help="e.g. 20 | 14,20 | 10:30:2")
+    parser.add_argument("--macd-fast", default=str(indicators.MACD_FAST))
+    parser.add_argument("--macd-slow", default=str(indicators.MACD_SLOW))
+    parser.add_argument("--macd-signal", default=str(indicators.MACD_SIGNAL))
+    parser.add_argument("--tp-ticks", default=str(TP_TICKS))
+    parser.add_argument("--max-wait", default=str(MAX_WAIT))
+    parser.add_argument("--leverage", default=str(LEVERAGE), help="Collateral divisor, e.g. 4.5 | 3:6:0.5")
+    parser.add_argument("--initial-capital", type=float, default=INITIAL_CAPITAL)
+    add_jobs_argument(parser)
+    parser.add_argument("--sort-by", choices=SORT_COLUMNS, default="total_profit")
+    parser.add_argument("--output", default=None,
+                        help="Results CSV (default: sweep_results.csv, or walkforward_windows.csv with --walk-forward)")
+    parser.add_argument("--top", type=int, default=10, help="Rows to print")
+    parser.add_argument("--walk-forward", action="store_true",
+                        help="Pick the best combination on rolling in-sample windows and report the stitched "
+                             "out-of-sample trades")
+    parser.add_argument("--train-months", type=int, default=TRAIN_MONTHS, help="In-sample window length")
+    parser.add_argument("--test-months", type=int, default=TEST_MONTHS,
+                        help="Out-of-sample window length and the step between windows")
+    parser.add_argument("--report-dir", default="walkforward",
+                        help="Directory for the out-of-sample generate_report CSVs (walk-forward only)")
+    args = parser.parse_args(argv)
+    args.input_dir = args.input_dir or candles_dir()
+    if args.walk_forward and parse_values(args.leverage, cast=float) != [LEVERAGE]:
+        parser.error(f"--leverage is fixed to {LEVERAGE} with --walk-forward (the report models use it)")
+
+    contracts = load_contracts(args.input_dir)
+    if not contracts:
+        print(f"Нет данных в {args.input_dir}")
+        return
+    if args.walk_forward:
+        walk_forward_main(args, contracts)
+        return
+    args.output = args.output or "sweep_results.csv"
+
+    started = time.perf_counter()
+    results = run_sweep(
+        contracts,
+        rsi_periods=parse_values(args.rsi_period),
+        macd_fast=parse_values(args.macd_fast),
+        macd_slow=parse_values(args.macd_slow),
+        macd_signal=parse_values(args.macd_signal),
+        tp_ticks=parse_values(args.tp_ticks),
+        max_wait=parse_values(args.max_wait),
+        leverages=parse_values(args.leverage, cast=float),
+        initial_capital=args.initial_capital,
+        jobs=args.jobs,
+    )
+    elapsed = time.perf_counter() - started
+
+    if results.empty:
+        print("Нет допустимых комбинаций параметров (нужно MACD_FAST < MACD_SLOW).")
+        return
+
+    # Для просадки лучше меньшее значение, для остальных метрик — большее
+    ascending = args.sort_by == 'max_drawdown'
+    results.sort_values(args.sort_by, ascending=ascending, inplace=True, kind='stable')
+    results.insert(0, 'rank', np.arange(1, len(results) + 1))
+    results.to_csv(args.output, index=False, float_format='%.4f')
+
+    print(f"Комбинаций: {len(results)}, контрактов: {len(contracts)}, время: {elapsed:.1f} с")
+    if args.top:
+        print(results.head(args.top).to_string(index=False))
+    print(f"\nРезультаты сохранены в: {args.output}")
+
+
+def walk_forward_main(args, contracts):
+    started = time.perf_counter()
+    summary, trades = run_walk_forward(
+        contracts,
+        rsi_periods=parse_values(args.rsi_period),
+        macd_fast=parse_values(args.macd_fast),
+        macd_slow=parse_values(args.macd_slow),
+        macd_signal=parse_values(args.macd_signal),
+        tp_ticks=parse_values(args.tp_ticks),
+        max_wait=parse_values(args.max_wait),
+        train_months=args.train_months,
+        test_months=args.test_months,
+        sort_by=args.sort_by,
+        initial_capital=args.initial_capital,
+        jobs=args.jobs,
+    )
+    elapsed = time.perf_counter() - started
+    if summary.empty:
+        print(f"Нет ни одного окна: история короче {args.train_months} мес. "
+              f"или нет допустимых комбинаций параметров (нужно MACD_FAST < MACD_SLOW).")
+        return
+
+    output = args.output or "walkforward_windows.csv"
+    summary.to_csv(output, index=False, float_format='%.4f')
+    print(f"Окон: {len(summary)}, контрактов: {len(contracts)}, время: {elapsed:.1f} с")
+    print(summary.to_string(index=False))
+    print(f"\nОкна сохранены в: {output}")
+
+    # Склеенные out-of-sample сделки — через те же отчёты, что и analyze
+    os.makedirs(args.report_dir, exist_ok=True)
+    generate_report(
+        trades,
+        fixed_output_file=os.path.join(args.report_dir, FIXED_FILE),
+        reinvest_output_file=os.path.join(args.report_dir, REINVEST_FILE),
+        nondup_fixed_output_file=os.path.join(args.report_dir, NONDUP_FIXED_FILE),
+        quarterly_fixed_file=os.path.join(args.report_dir, QUARTERLY_FIXED_FILE),
+        initial_capital=args.initial_capital,
+    )
+
+
+if __name__ == "__main__":
+    main()
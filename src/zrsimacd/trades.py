@@ -0,0 +1,131 @@
+"""Сделки по файлу с индикаторами: сигналы входа и расчёт выходов.
+
+Общие функции для analyze и report; file_trades обрабатывает один файл и
+подходит для параллельного запуска через zrsimacd.executor. Стадия report —
+write_trade_report. Правила входа и выхода — zrsimacd.strategy.Strategy
+(strategy=None — исходная стратегия).
+"""
+import pandas as pd
+
+from zrsimacd import instrument
+from zrsimacd.continuous import load_rolls, map_trades
+from zrsimacd.executor import map_files, report_errors
+from zrsimacd.exits import BUY, SELL, simulate_exits
+from zrsimacd.montecarlo import MONTECARLO_FILE, run_montecarlo
+from zrsimacd.signals import find_signals
+from zrsimacd.store import indicators_dir, list_tables, read_table, table_name
+from zrsimacd.strategy import DEFAULT_STRATEGY, load_strategy
+from zrsimacd.tradestore import TradeStore, as_trade_store
+
+# Файл отчёта по сделкам по умолчанию
+REPORT_FILE = "trade_report.csv"
+REPORT_COLUMNS = ['ticker', 'direction', 'entry_time', 'entry_price', 'exit_time', 'exit_price', 'profit']
+
+REQUIRED_COLUMNS = {'timestamp', 'RSI', 'MACD_Diff', 'close', 'can_trade'}
+
+
+def calculate_trade_profit_smart(data, signal_index, trade_type, tp_ticks=2):
+    """Выход по одному сигналу; пачку сигналов считает zrsimacd.exits.simulate_exits."""
+    direction = BUY if trade_type == 'BUY' else SELL
+    _, profit, exit_index = simulate_exits(
+        data['close'].to_numpy(), data['MACD_Diff'].to_numpy(), [signal_index], direction, tp_ticks=tp_ticks
+    )
+    exit_index = exit_index[0]
+    return data.iloc[exit_index]['timestamp'], profit[0], exit_index
+
+
+def trades_from_signals(data, ticker, entry_idx, trade_type, store=None, strategy=None):
+    """
+    Сделки по индексам сигналов, все выходы — одной пачкой по правилам
+    strategy. Добавляет их в store (TradeStore) или в новое хранилище и
+    возвращает его.
+    """
+    direction = BUY if trade_type == 'BUY' else SELL
+    close = data['close'].to_numpy()
+    macd_diff = data['MACD_Diff'].to_numpy()
+    _, profits, exit_idx = (strategy or DEFAULT_STRATEGY).exits(close, macd_diff, entry_idx, direction)
+    timestamps = pd.DatetimeIndex(data['timestamp'])
+
+    store = TradeStore(capacity=len(entry_idx)) if store is None else store
+    store.append(ticker, direction, timestamps[entry_idx], close[entry_idx], macd_diff[entry_idx],
+                 timestamps[exit_idx], close[exit_idx], profits)
+    instrument.count("trades", len(entry_idx))
+    return store
+
+
+def check_buy_signals(data, ticker):
+    """
+    Ищет сигналы на покупку (BUY) в данных и возвращает сделки (TradeStore).
+    Сделка рассматривается только если на момент сигнала значение can_trade == 1.
+    """
+    buy_idx, _ = find_signals(data)
+    return trades_from_signals(data, ticker, buy_idx, 'BUY')
+
+
+def check_sell_signals(data, ticker):
+    """
+    Ищет сигналы на продажу (SELL) в данных и возвращает сделки (TradeStore).
+    Сделка рассматривается только если на момент сигнала значение can_trade == 1.
+    """
+    _, sell_idx = find_signals(data)
+    return trades_from_signals(data, ticker, sell_idx, 'SELL')
+
+
+def frame_trades(data, ticker, source="", strategy=None):
+    """Все сделки (BUY, затем SELL) по таблице индикаторов одного контракта по правилам strategy."""
+    if not REQUIRED_COLUMNS.issubset(data.columns):
+        print(f"Пропущены колонки в файле: {source}")
+        return TradeStore()
+    strategy = strategy or DEFAULT_STRATEGY
+    data = data.sort_values('timestamp')
+    # Сигналы обоих направлений — за один проход (check_buy/sell_signals ищут их каждый заново)
+    buy_idx, sell_idx = strategy.signals(data)
+    store = TradeStore(capacity=len(buy_idx) + len(sell_idx))
+    store = trades_from_signals(data, ticker, buy_idx, 'BUY', store, strategy)
+    return trades_from_signals(data, ticker, sell_idx, 'SELL', store, strategy)
+
+
+def file_trades(file_path, strategy=None):
+    """
+    Все сделки по одному файлу с индикаторами; тикер — имя файла, а для
+    непрерывного ряда (zrsimacd stitch) — реальный контракт по индексу переходов.
+    """
+    trades = frame_trades(read_table(file_path), table_name(file_path), source=file_path, strategy=strategy)
+    rolls = load_rolls(file_path)
+    return map_trades(trades, rolls) if rolls is not None else trades
+
+
+def collect_trades(input_dir, jobs=None, strategy=None):
+    """Сделки (TradeStore) по всем таблицам input_dir; файлы считаются параллельно, сделки — в порядке файлов."""
+    results = map_files(file_trades, list_tables(input_dir), jobs=jobs, kwargs={"strategy": strategy})
+    all_trades = TradeStore()
+    for r in results:
+        if r.result is not None:
+            all_trades.extend(r.result)
+    report_errors(results)
+    return all_trades
+
+
+def write_trade_report(input_dir=None, output_file=REPORT_FILE, jobs=None, montecarlo=0, method="bootstrap",
+                       seed=None, montecarlo_file=MONTECARLO_FILE, strategy=None):
+    """
+    Стадия report: все сделки по каталогу с индикаторами (по умолчанию
+    store.indicators_dir) в один CSV. При montecarlo > 0 по сделкам строятся
+    ещё распределения метрик на montecarlo синтетических путях. strategy —
+    Strategy или её описание (zrsimacd.strategy.load_strategy).
+    """
+    strategy = load_strategy(strategy)
+    with instrument.section("trades"):
+        trades = collect_trades(input_dir or indicators_dir(), jobs=jobs, strategy=strategy)
+    with instrument.section("save"):
+        save_trade_report(trades, output_file)
+    if montecarlo > 0:
+        with instrument.section("montecarlo"):
+            run_montecarlo(trades, montecarlo, method=method, seed=seed, output_file=montecarlo_file)
+
+
+def save_trade_report(trades, output_file=REPORT_FILE):
+    """Сделки (TradeStore или список словарей) в CSV с колонками REPORT_COLUMNS."""
+    df = as_trade_store(trades).to_frame(REPORT_COLUMNS)
+    df.to_csv(output_file, index=False)
+    print(f"Trade report saved to: {output_file}")
@@ -0,0 +1,216 @@
+"""Компактное хранилище сделок: колонки NumPy вместо списка словарей.
+
+Сделка в списке словарей — словарь, строка тикера и два pd.Timestamp, около
+килобайта на сделку; при переборе параметров и на минутных свечах сделок
+миллионы. TradeStore хранит те же поля колонками заранее выделенных
+массивов (struct-of-arrays), около 50 байт на сделку:
+
+    ticker          int32 — код тикера в списке tickers (как pd.Categorical);
+    direction       int8  — BUY / SELL (1 / -1, как в zrsimacd.exits);
+    entry_time,
+    exit_time       int64 — нс UTC, часовой пояс — один на хранилище (tz);
+    entry_price,
+    exit_price,
+    open_MACD_Diff,
+    profit          float64 — цены не сужаются до float32: прибыль и отчёты
+                    должны совпадать с расчётом по исходным float64.
+
+Сигналы и выходы (trades.trades_from_signals), перенос на контракты
+(continuous.map_trades) и отчёты (generate_report, save_trade_report,
+Монте-Карло) работают с TradeStore; DataFrame и словари сделок
+(to_frame, records) строятся только на границе — для CSV и сверок.
+"""
+import numpy as np
+import pandas as pd
+
+from zrsimacd.exits import BUY, SELL
+
+# Поле → dtype; порядок — порядок колонок сделки в отчётах
+FIELDS = {
+    "ticker": np.int32,
+    "direction": np.int8,
+    "entry_time": np.int64,
+    "entry_price": np.float64,
+    "open_MACD_Diff": np.float64,
+    "exit_time": np.int64,
+    "exit_price": np.float64,
+    "profit": np.float64,
+}
+# Начальная ёмкость при первом добавлении; дальше ёмкость удваивается
+MIN_CAPACITY = 64
+_UNIT_NS = {"s": 10**9, "ms": 10**6, "us": 10**3, "ns": 1}
+
+
+def _time_ns(values):
+    """Время (Timestamp, DatetimeIndex, Series, datetime64 или int64 нс) → int64 нс UTC и часовой пояс."""
+    if isinstance(values, np.ndarray) and values.dtype.kind in "iu":
+        return values.astype(np.int64, copy=False), None
+    times = pd.DatetimeIndex(pd.Series(values) if isinstance(values, list) else values)
+    # pandas читает CSV не в нс; единицу переводим умножением — as_unit для tz-aware заметно дольше
+    return times.asi8 * _UNIT_NS[times.unit], times.tz
+
+
+class TradeStore:
+    """
+    Сделки колонками. Колонки — свойства-срезы по числу сделок (store["profit"]);
+    append добавляет пачку сделок одного тикера массивами, extend — другое
+    хранилище. Часовой пояс времени входа и выхода — tz (None — без пояса).
+    """
+
+    def __init__(self, capacity=0, tz=None):
+        self.tickers = []
+        self._codes = {}
+        self.tz = tz
+        self._size = 0
+        self._columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in FIELDS.items()}
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, name):
+        return self._columns[name][:self._size]
+
+    def __getstate__(self):
+        # В процесс-воркер и обратно — без незанятой ёмкости
+        return {**self.__dict__, "_columns": {name: self[name].copy() for name in FIELDS}}
+
+    @property
+    def nbytes(self):
+        return sum(values.nbytes for values in self._columns.values())
+
+    def ticker_code(self, ticker):
+        ticker = str(ticker)
+        code = self._codes.get(ticker)
+        if code is None:
+            code = self._codes[ticker] = len(self.tickers)
+            self.tickers.append(ticker)
+        return code
+
+    def reserve(self, n):
+        """Ёмкость не меньше len + n (с удвоением, чтобы добавление по одной сделке было O(1) в среднем)."""
+        needed = self._size + n
+        capacity = len(self._columns["profit"])
+        if needed <= capacity:
+            return
+        capacity = max(needed, 2 * capacity, MIN_CAPACITY)
+        for name, values in self._columns.items():
+            grown = np.empty(capacity, dtype=values.dtype)
+            grown[:self._size] = values[:self._size]
+            self._columns[name] = grown
+
+    def _check_tz(self, tz):
+        if self._size == 0 and self.tz is None:
+            self.tz = tz
+        elif str(tz) != str(self.tz):
+            raise ValueError(f"Сделки с разными часовыми поясами в одном хранилище: {self.tz} и {tz}")
+
+    def append(self, ticker, direction, entry_time, entry_price, open_macd_diff, exit_time, exit_price, profit):
+        """
+        Пачка сделок массивами одной длины. ticker — тикер всех сделок пачки
+        (или массив тикеров), direction — 1/-1 или "BUY"/"SELL", время — как
+        принимает pd.DatetimeIndex, или int64 нс UTC.
+        """
+        entry_ns, tz = _time_ns(entry_time)
+        exit_ns, _ = _time_ns(exit_time)
+        n = len(entry_ns)
+        if n == 0:
+            return
+        # int64 нс уже в поясе хранилища
+        if not (isinstance(entry_time, np.ndarray) and entry_time.dtype.kind in "iu"):
+            self._check_tz(tz)
+        if isinstance(ticker, (str, int, np.integer)):
+            codes = self.ticker_code(ticker)
+        else:
+            names, inverse = np.unique(np.asarray(ticker, dtype=str), return_inverse=True)
+            codes = np.array([self.ticker_code(name) for name in names], dtype=np.int32)[inverse]
+        direction = np.asarray(direction)
+        if direction.dtype.kind in "UO":
+            direction = np.where(direction == "BUY", BUY, SELL)
+
+        self.reserve(n)
+        end = self._size + n
+        for name, values in (("ticker", codes), ("direction", direction), ("entry_time", entry_ns),
+                             ("entry_price", entry_price), ("open_MACD_Diff", open_macd_diff),
+                             ("exit_time", exit_ns), ("exit_price", exit_price), ("profit", profit)):
+            self._columns[name][self._size:end] = values
+        self._size = end
+
+    def extend(self, other):
+        """Добавляет сделки другого хранилища (коды тикеров пересчитываются)."""
+        if len(other) == 0:
+            return
+        self._check_tz(other.tz)
+        remap = np.array([self.ticker_code(name) for name in other.tickers], dtype=np.int32)
+        self.reserve(len(other))
+        end = self._size + len(other)
+        for name in FIELDS:
+            values = other[name]
+            self._columns[name][self._size:end] = remap[values] if name == "ticker" else values
+        self._size = end
+
+    def take(self, rows):
+        """Новое хранилище из сделок rows (индексы или маска) в их порядке."""
+        result = TradeStore(tz=self.tz)
+        result.tickers = list(self.tickers)
+        result._codes = dict(self._codes)
+        result._columns = {name: self[name][rows] for name in FIELDS}
+        result._size = len(result._columns["profit"])
+        return result
+
+    def rename_tickers(self, mapping):
+        """Переименовывает тикеры (mapping: старое имя → новое); одинаковые новые имена сливаются."""
+        if self.tickers:
+            self.assign_tickers([mapping.get(name, name) for name in self.tickers], self["ticker"].copy())
+
+    def assign_tickers(self, names, index):
+        """Тикер каждой сделки заново: names[index[i]]."""
+        self.tickers, self._codes = [], {}
+        codes = np.array([self.ticker_code(name) for name in names], dtype=np.int32)
+        self._columns["ticker"][:self._size] = codes[index]
+
+    def ticker_names(self):
+        """Тикеры сделок строками (object), как колонка ticker списка словарей."""
+        return np.array(self.tickers, dtype=object)[self["ticker"]] if self.tickers else np.array([], dtype=object)
+
+    def times(self, name):
+        """Колонка времени как DatetimeIndex в поясе хранилища."""
+        times = pd.DatetimeIndex(self[name].view("datetime64[ns]"))
+        return times.tz_localize("UTC").tz_convert(self.tz) if self.tz is not None else times
+
+    def to_frame(self, columns=None):
+        """DataFrame с теми же колонками и значениями, что pd.DataFrame(список словарей сделок)."""
+        columns = list(FIELDS) if columns is None else columns
+        data = {}
+        for name in columns:
+            if name == "ticker":
+                data[name] = self.ticker_names()
+            elif name == "direction":
+                data[name] = np.where(self["direction"] > 0, "BUY", "SELL").astype(object)
+            elif name in ("entry_time", "exit_time"):
+                data[name] = self.times(name)
+            else:
+                data[name] = self[name]
+        return pd.DataFrame(data, columns=columns)
+
+    def records(self):
+        """Сделки словарями, как их собирали до TradeStore (для сверок и построчного кода)."""
+        return self.to_frame().to_dict("records")
+
+    @classmethod
+    def from_records(cls, trades):
+        """TradeStore из списка словарей сделок (поля FIELDS)."""
+        store = cls(capacity=len(trades))
+        if trades:
+            frame = pd.DataFrame(trades)
+            store.append(frame["ticker"].astype(str).to_numpy(), frame["direction"].to_numpy(),
+                         frame["entry_time"], frame["entry_price"].to_numpy(dtype=np.float64),
+                         frame["open_MACD_Diff"].to_numpy(dtype=np.float64) if "open_MACD_Diff" in frame
+                         else np.full(len(frame), np.nan),
+                         frame["exit_time"], frame["exit_price"].to_numpy(dtype=np.float64),
+                         frame["profit"].to_numpy(dtype=np.float64))
+        return store
+
+
+def as_trade_store(trades):
+    """TradeStore как есть, список словарей — в TradeStore."""
+    return trades if isinstance(trades, TradeStore) else TradeStore.from_records(list(trades))